@@ -24,14 +24,27 @@ WININST_DIR = os.path.join(PKGDATADIR, "commands", "wininst")
 _PICKLED_PARSETAB = os.path.join(PKGDATADIR, "parsetab")
 _OPTIMIZE_LEX = 0
 _DEBUG_YACC = 0
+# Use the frozen parser tables and the fast lexer (never writes to disk)
+_FAST_PARSER = True
 
 # Use subdist bento to avoid clashing with distutils ATM
 _SUB_BUILD_DIR = "bento"
 
 CONFIGURED_STATE_DUMP = os.path.join(_SUB_BUILD_DIR, ".config.bin")
 DB_FILE = os.path.join(_SUB_BUILD_DIR, "cache.db")
+# Signatures of the inputs of the last successful run of some commands
+CMD_SIGNATURES = os.path.join(_SUB_BUILD_DIR, "cmd_signatures.db")
 DISTCHECK_DIR = os.path.join(_SUB_BUILD_DIR, "distcheck")
 IPKG_PATH = os.path.join(_SUB_BUILD_DIR, "ipkg.info")
+# sha256 and crc32 of the files put in archives, reused until they change
+FILE_DIGESTS = os.path.join(_SUB_BUILD_DIR, "digests.bin")
+# Snapshot of the source tree directories (bentomaker --dir-snapshot)
+DIR_SNAPSHOT = os.path.join(_SUB_BUILD_DIR, "dir_snapshot.bin")
+# Unix socket of the bentomaker daemon (bentomaker --daemon), which logs to
+# daemon.log next to it
+DAEMON_SOCKET = os.path.join(_SUB_BUILD_DIR, "daemon.sock")
+# Marshalled code objects of byte-compiled modules, keyed by source content
+BYTECODE_CACHE_DIR = os.path.join(_SUB_BUILD_DIR, "bytecode")
 
 BENTO_SCRIPT = "bento.info"
 
@@ -1,8 +1,17 @@
+import os
+import sys
+import multiprocessing
+
 import os.path as op
 
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
 from bento.utils.utils \
     import \
-        extract_exception
+        extract_exception, pprint
 from bento.core.node_package \
     import \
         translate_name
@@ -12,6 +21,9 @@ from bento.core.subpackage \
 from bento.commands.command_contexts \
     import \
         ConfigureContext, BuildContext
+from bento.commands.configure \
+    import \
+        CONFIGURE_ENV_VARS, _package_files
 from bento.errors \
     import \
         ConfigurationError
@@ -21,6 +33,13 @@ from bento.backends.core \
 
 import yaku.context
 import yaku.errors
+import yaku.task_cache
+import yaku.trace
+import yaku.jobserver
+import yaku.graph_cache
+import yaku.conf_cache
+import yaku.environment
+import yaku._config
 
 class ConfigureYakuContext(ConfigureContext):
     def __init__(self, global_context, cmd_argv, options_context, pkg, run_node):
@@ -29,6 +48,25 @@ class ConfigureYakuContext(ConfigureContext):
         source_path = run_node._ctx.srcnode.path_from(run_node)
         self.yaku_context = yaku.context.get_cfg(src_path=source_path, build_path=build_path)
 
+        o, a = options_context.parser.parse_args(cmd_argv)
+        if o.conf_cache_dir:
+            conf_cache = yaku.conf_cache.ConfCache(o.conf_cache_dir)
+            if o.reset_conf_cache:
+                conf_cache.clear()
+            self.yaku_context.conf_cache = conf_cache
+        if o.jobs:
+            self.yaku_context.jobs = o.jobs
+
+    @classmethod
+    def toolchain_signature(cls, build_node):
+        default_env = build_node.find_node(yaku._config.DEFAULT_ENV)
+        build_config = build_node.find_node(yaku._config.BUILD_CONFIG)
+        if default_env is None or build_config is None:
+            return ""
+        env = yaku.environment.Environment()
+        env.load(default_env.abspath())
+        return "%s\n%s" % (yaku.conf_cache.toolchain_fingerprint(env), build_config.read())
+
     def configure(self):
         extensions = get_extensions(self.pkg, self.run_node)
         libraries = get_compiled_libraries(self.pkg, self.run_node)
@@ -45,6 +83,9 @@ class ConfigureYakuContext(ConfigureContext):
     def finish(self):
         super(ConfigureYakuContext, self).finish()
         self.yaku_context.store()
+        conf_cache = self.yaku_context.conf_cache
+        if conf_cache is not None and (conf_cache.hits or conf_cache.misses):
+            pprint("PINK", "Configure cache: %s" % conf_cache.summary())
 
     def pre_recurse(self, local_node):
         super(ConfigureYakuContext, self).pre_recurse(local_node)
@@ -60,17 +101,33 @@ class BuildYakuContext(BuildContext):
         from bento.commands.build_yaku import build_extension, build_compiled_library
 
         super(BuildYakuContext, self).__init__(global_context, cmd_argv, options_context, pkg, run_node)
-        build_path = run_node._ctx.bldnode.path_from(run_node)
-        source_path = run_node._ctx.srcnode.path_from(run_node)
-        self.yaku_context = yaku.context.get_bld(src_path=source_path, build_path=build_path)
 
         o, a = options_context.parser.parse_args(cmd_argv)
-        if o.jobs:
+        if o.jobs == "auto":
+            jobs = multiprocessing.cpu_count()
+        elif o.jobs:
             jobs = int(o.jobs)
         else:
             jobs = 1
         self.verbose = o.verbose
         self.jobs = jobs
+        if o.memory_limit:
+            self.memory_limit = int(o.memory_limit) * 1024 ** 2
+        else:
+            self.memory_limit = None
+        if o.max_load:
+            self.max_load = float(o.max_load)
+        else:
+            self.max_load = None
+        self.hash_content = o.hash_content
+        self.trace_file = o.trace
+        self.watch = o.watch
+        self._options = o
+
+        # The yaku context (build configuration, tools, build cache) is only
+        # loaded when needed, which is not the case of no-op builds
+        self._yaku_context = None
+        self._old_path = None
 
         def _builder_factory(category, builder):
             def _build(extension, include_dirs=None, **kw):
@@ -97,17 +154,111 @@ class BuildYakuContext(BuildContext):
         self.builder_registry.register_category("compiled_libraries",
             _builder_factory("compiled_libraries", build_compiled_library))
 
+    @property
+    def yaku_context(self):
+        if self._yaku_context is None:
+            self._yaku_context = self._create_yaku_context()
+        return self._yaku_context
+
+    def _create_yaku_context(self):
+        o = self._options
+        build_path = self.build_node.path_from(self.run_node)
+        source_path = self.top_node.path_from(self.run_node)
+        yaku_context = yaku.context.get_bld(src_path=source_path, build_path=build_path)
+
+        # Share the job slots of an outer make -jN if any, and with the
+        # compilers and sub-builds otherwise
+        yaku_context.jobserver = yaku.jobserver.get_jobserver(self.jobs)
+        yaku_context.jobs = self.jobs
+        yaku_context.node_sigs.use_stat = not o.hash_content
+
+        if o.cache_dir:
+            if o.cache_max_size:
+                max_size = o.cache_max_size * 1024 ** 2
+            else:
+                max_size = None
+            yaku_context.task_cache = yaku.task_cache.TaskCache(o.cache_dir,
+                    max_size=max_size, use_hardlinks=o.cache_hardlinks)
+
+        if o.trace:
+            yaku_context.tracer = yaku.trace.Tracer()
+
+        if self.local_node is not None:
+            self._enter_local_node(yaku_context)
+        return yaku_context
+
     def finish(self):
         super(BuildYakuContext, self).finish()
-        self.yaku_context.store()
+        if self._yaku_context is not None:
+            self._yaku_context.store()
+            if self._yaku_context.jobserver is not None:
+                self._yaku_context.jobserver.close()
+
+    def graph_key(self):
+        """Return a digest of what the yaku task graph is created from: the
+        build arguments, the bento and hook files, the sources of the
+        extensions and compiled libraries (once globs are expanded), the
+        configure arguments and environment, and the yaku build
+        configuration."""
+        m = md5()
+        def _update(s):
+            m.update(s.encode("utf-8"))
+        def _update_file(node, name):
+            n = node.find_node(name)
+            if n is None:
+                _update("%s: missing\n" % name)
+            else:
+                _update("%s: " % name)
+                m.update(n.read("rb"))
+
+        _update("%r\n" % (self.command_argv,))
+        if self._global_context is not None:
+            _update("%r\n" % (self._global_context.retrieve_command_argv("configure"),))
+        _update("%s\n%s\n" % (sys.executable, sys.version))
+        for k in CONFIGURE_ENV_VARS:
+            _update("%s=%r\n" % (k, os.environ.get(k, None)))
+        for f in _package_files(self.pkg):
+            _update_file(self.top_node, f)
+        # files matching the Sources globs may have been added or removed
+        for category in ["extensions", "compiled_libraries"]:
+            for name, item in sorted(self._node_pkg.iter_category(category)):
+                _update("%s %s:\n" % (category, name))
+                for n in item.nodes + getattr(item, "unity_exclude_nodes", []):
+                    _update("  %s\n" % n.path_from(self.top_node))
+        for f in [yaku._config.DEFAULT_ENV, yaku._config.BUILD_CONFIG,
+                  yaku._config.HOOK_DUMP]:
+            _update_file(self.build_node, f)
+        return m.hexdigest()
 
     def compile(self):
         super(BuildYakuContext, self).compile()
 
-        import yaku.task_manager
+        # No-op build: the outputs registered by the extension and library
+        # builders are restored from the task graph of the last build,
+        # without creating any task
+        build_path = self.build_node.abspath()
+        if self.hash_content:
+            key = None
+        else:
+            key = self.graph_key()
+            if self.watch:
+                # the tasks are needed to rebuild the changed files
+                registered = None
+            else:
+                registered = yaku.graph_cache.load_graph(build_path, key)
+            if registered is not None:
+                for category, name, paths, from_path, target_dir in registered:
+                    nodes = [self.build_node.make_node(p) for p in paths]
+                    self.outputs_registry.register_outputs(category, name, nodes,
+                            self.build_node.make_node(from_path), target_dir)
+                return
+        yaku.graph_cache.clear_graph(build_path)
+
         bld = self.yaku_context
         bld.env["VERBOSE"] = self.verbose
 
+        previous = set([(category, name) for category, name, nodes, from_node, target_dir \
+                        in self.outputs_registry.iter_over_category()])
         reg = self.builder_registry
 
         for category in ["extensions", "compiled_libraries"]:
@@ -120,26 +271,92 @@ class BuildYakuContext(BuildContext):
                 finally:
                     self.post_recurse()
 
-        task_manager = yaku.task_manager.TaskManager(bld.tasks)
+        self._run_tasks(bld, bld.tasks)
+
+        if key is not None:
+            registered = []
+            for category, name, nodes, from_node, target_dir in self.outputs_registry.iter_over_category():
+                if not (category, name) in previous:
+                    registered.append((category, name,
+                                       [n.path_from(self.build_node) for n in nodes],
+                                       from_node.path_from(self.build_node), target_dir))
+            yaku.graph_cache.save_graph(bld, key, registered)
+
+        # TODO: inplace support
+
+    def _run_tasks(self, bld, tasks):
+        import yaku.task_manager
+
+        task_manager = yaku.task_manager.TaskManager(tasks)
         if self.jobs < 2:
             runner = yaku.scheduler.SerialRunner(bld, task_manager)
         else:
-            runner = yaku.scheduler.ParallelRunner(bld, task_manager, self.jobs)
+            runner = yaku.scheduler.DependencyRunner(bld, task_manager, self.jobs,
+                    self.memory_limit, self.max_load)
         runner.start()
-        runner.run()
+        try:
+            runner.run()
+        finally:
+            if bld.task_cache is not None:
+                pprint("PINK", "Task cache: %s" % bld.task_cache.summary())
+            if bld.tracer is not None:
+                bld.tracer.write(self.trace_file)
+                pprint("PINK", bld.tracer.summary())
+                pprint("PINK", "Task timeline written in %r" % self.trace_file)
 
-        # TODO: inplace support
+    def watched_files(self):
+        files = super(BuildYakuContext, self).watched_files()
+        if self._yaku_context is not None:
+            for t in self._yaku_context.tasks:
+                # the sources of some tasks may have been removed since the
+                # last build, and cannot be scanned anymore
+                deps = [n for n in t.inputs + t.deps if op.isfile(n.abspath())]
+                if t.scan is not None and len(deps) == len(t.inputs + t.deps):
+                    deps = deps + t.scan(t)
+                files.update([n.abspath() for n in deps])
+        return files
+
+    def compile_changed(self, paths):
+        import yaku.task_manager
+
+        if self._yaku_context is None:
+            return
+        bld = self._yaku_context
+        tasks = yaku.task_manager.affected_tasks(bld.tasks, paths)
+        if not tasks:
+            return
+        for t in tasks:
+            # forget the signature computed before the change
+            t.cache = None
+
+        # the jobserver of the build was closed by finish
+        bld.jobserver = yaku.jobserver.get_jobserver(self.jobs)
+        try:
+            self._run_tasks(bld, tasks)
+        finally:
+            bld.store()
+            if bld.jobserver is not None:
+                bld.jobserver.close()
+                bld.jobserver = None
 
     def pre_recurse(self, local_node):
         super(BuildYakuContext, self).pre_recurse(local_node)
-        self._old_path = self.yaku_context.path
+        if self._yaku_context is None:
+            # done when the yaku context is created
+            self._old_path = None
+        else:
+            self._enter_local_node(self._yaku_context)
+
+    def _enter_local_node(self, yaku_context):
+        self._old_path = yaku_context.path
         # FIXME: we should not modify yaku context, but add current node +
         # recurse support to yaku instead
         # Gymnastic to make a *yaku* node from a *bento* node
-        self.yaku_context.path = self.yaku_context.path.make_node(self.local_node.path_from(self.top_node))
+        yaku_context.path = yaku_context.path.make_node(self.local_node.path_from(self.top_node))
 
     def post_recurse(self):
-        self.yaku_context.path = self._old_path
+        if self._old_path is not None:
+            self.yaku_context.path = self._old_path
         super(BuildYakuContext, self).post_recurse()
 
 class YakuBackend(AbstractBackend):
@@ -39,11 +39,35 @@ Usage:   bentomaker build [OPTIONS]."""
                         + [Option("-i", "--inplace",
                                   help="Build extensions in place", action="store_true"),
                            Option("-j", "--jobs",
-                                  help="Parallel builds (yaku build only - EXPERIMENTAL)",
+                                  help="Parallel builds, 'auto' for the number of CPUs (yaku build only - EXPERIMENTAL)",
                                   dest="jobs"),
+                           Option("--memory-limit",
+                                  help="Memory budget of parallel builds in MB, based on the memory used by each task in previous builds (yaku build only) [default: available memory]",
+                                  dest="memory_limit"),
+                           Option("--max-load",
+                                  help="Do not start new tasks in parallel builds while the load average is above this value (yaku build only)",
+                                  dest="max_load"),
                            Option("-v", "--verbose",
                                   help="Verbose output (yaku build only)",
-                                  action="store_true")]
+                                  action="store_true"),
+                           Option("--cache-dir",
+                                  help="Directory of the task output cache shared between builds (yaku build only)",
+                                  dest="cache_dir"),
+                           Option("--cache-max-size",
+                                  help="Size cap of the task output cache, in MB (default: 1024)",
+                                  type="int", dest="cache_max_size"),
+                           Option("--cache-hardlinks",
+                                  help="Restore outputs from the task output cache through hard links",
+                                  action="store_true", dest="cache_hardlinks"),
+                           Option("--hash-content",
+                                  help="Rehash the content of every input, even if its mtime/size/inode did not change (yaku build only)",
+                                  action="store_true", dest="hash_content"),
+                           Option("--trace",
+                                  help="Write a timeline of the task execution in the given file, in the trace event format of chrome://tracing (yaku build only)",
+                                  dest="trace"),
+                           Option("--watch",
+                                  help="Keep running, and rebuild what depends on the files of the source tree each time they change",
+                                  action="store_true", dest="watch")]
 
     def run(self, ctx):
         p = ctx.options_context.parser
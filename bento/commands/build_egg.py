@@ -1,27 +1,38 @@
 import os
+import sys
 import warnings
+import multiprocessing
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
 
 from bento._config \
     import \
-        IPKG_PATH
+        IPKG_PATH, BYTECODE_CACHE_DIR
 from bento.commands.core \
     import \
         Command, Option
 from bento.commands.egg_utils \
     import \
         EggInfo, egg_filename
-from bento.utils.utils import pprint, extract_exception
+from bento.utils.utils import pprint, extract_exception, cpu_count
+from bento.utils.zip_writer \
+    import \
+        ParallelZipFile
 from bento.core \
     import \
         PackageMetadata
 from bento.private.bytecode \
     import \
-        bcompile, PyCompileError
+        compile_code, pyc_header, PyCompileError
 from bento.installed_package_description \
     import \
         BuildManifest, iter_files
 
 import bento.compat.api as compat
+import bento.utils.io2
 import bento.utils.path
 
 class BuildEggCommand(Command):
@@ -33,7 +44,13 @@ Usage:   bentomaker build_egg [OPTIONS]"""
                         + [Option("--output-dir",
                                   help="Output directory", default="dist"),
                            Option("--output-file",
-                                  help="Output filename")]
+                                  help="Output filename"),
+                           Option("-j", "--jobs",
+                                  help="Number of byte-compilation processes and compression threads (default: number of CPUs)",
+                                  type="int", dest="jobs"),
+                           Option("--no-bytecode-cache",
+                                  help="Do not reuse bytecode compiled by previous builds",
+                                  action="store_false", dest="bytecode_cache", default=True)]
 
     def run(self, ctx):
         argv = ctx.command_argv
@@ -47,9 +64,113 @@ Usage:   bentomaker build_egg [OPTIONS]"""
 
         n = ctx.build_node.make_node(IPKG_PATH)
         build_manifest = BuildManifest.from_file(n.abspath())
-        build_egg(build_manifest, ctx.build_node, ctx.build_node, output_dir, output_file)
+        build_egg(build_manifest, ctx.build_node, ctx.build_node, output_dir, output_file,
+                  jobs=o.jobs, bytecode_cache=o.bytecode_cache)
+
+# Below this number of modules to compile, starting worker processes costs more
+# than it saves
+_POOL_THRESHOLD = 32
+
+class BytecodeCache(object):
+    """Directory of marshalled code objects, keyed by the python version, the
+    source filename and its content (the header of .pyc files depends on the
+    source mtime, and is not cached).
+
+    Entry names start with a tag of the python version, so that the entries
+    of several interpreters coexist: pruning only touches the entries of the
+    current one."""
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.prefix = md5(sys.version.encode("utf-8")).hexdigest()[:8] + "-"
+        self._used = set()
+
+    def key(self, filename):
+        fid = open(filename, "rb")
+        try:
+            content = fid.read()
+        finally:
+            fid.close()
+        m = md5(filename.encode("utf-8"))
+        m.update(content)
+        return self.prefix + m.hexdigest()
+
+    def get(self, key):
+        self._used.add(key)
+        try:
+            fid = open(os.path.join(self.cache_dir, key), "rb")
+        except IOError:
+            return None
+        try:
+            return fid.read()
+        finally:
+            fid.close()
+
+    def set(self, key, code):
+        self._used.add(key)
+        def _writer(fid):
+            fid.write(code)
+        target = os.path.join(self.cache_dir, key)
+        bento.utils.path.ensure_dir(target)
+        bento.utils.io2.safe_write(target, _writer)
+
+    def prune(self):
+        """Remove the entries of the current python version which were not
+        used since this instance was created."""
+        if os.path.isdir(self.cache_dir):
+            for f in os.listdir(self.cache_dir):
+                # entries without tag were written by older versions of bento
+                if not f in self._used and (f.startswith(self.prefix) or not "-" in f):
+                    os.remove(os.path.join(self.cache_dir, f))
+
+def _compile(filename):
+    # Executed in worker processes: compilation errors are returned as
+    # messages
+    try:
+        return compile_code(filename), None
+    except PyCompileError:
+        e = extract_exception()
+        return None, e.msg
 
-def build_egg(build_manifest, build_node, source_root, output_dir=None, output_file=None):
+def compile_python_files(filenames, jobs=None, cache=None):
+    """Byte-compile the given python files, in a pool of jobs processes.
+
+    Return a dictionary {filename: marshalled code} of the successfully
+    compiled files (without .pyc header). A warning is emitted for every file
+    which failed to compile."""
+    if jobs is None:
+        jobs = cpu_count()
+
+    ret = {}
+    keys = {}
+    if cache is not None:
+        for filename in filenames:
+            keys[filename] = key = cache.key(filename)
+            code = cache.get(key)
+            if code is not None:
+                ret[filename] = code
+    missing = [f for f in filenames if not f in ret]
+
+    if jobs > 1 and len(missing) >= _POOL_THRESHOLD:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = pool.map(_compile, missing, max(1, len(missing) // (4 * jobs)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_compile(f) for f in missing]
+
+    for filename, (code, msg) in zip(missing, results):
+        if code is None:
+            warnings.warn("Error byte-compiling %r (%s)" % (filename, msg))
+        else:
+            ret[filename] = code
+            if cache is not None:
+                cache.set(keys[filename], code)
+    return ret
+
+def build_egg(build_manifest, build_node, source_root, output_dir=None, output_file=None,
+              jobs=None, bytecode_cache=True):
     meta = PackageMetadata.from_ipkg(build_manifest)
     egg_info = EggInfo.from_ipkg(build_manifest, build_node)
 
@@ -70,22 +191,33 @@ def build_egg(build_manifest, build_node, source_root, output_dir=None, output_f
                   "eprefix": source_root.abspath(),
                   "sitedir": source_root.abspath()}
 
-    zid = compat.ZipFile(egg, "w", compat.ZIP_DEFLATED)
+    built_files = [(kind, source.abspath(), target.path_from(source_root)) for kind, source, target
+                   in build_manifest.iter_built_files(source_root, egg_scheme)]
+
+    if bytecode_cache:
+        cache = BytecodeCache(build_node.make_node(BYTECODE_CACHE_DIR).abspath())
+    else:
+        cache = None
+    # Python files are compiled once, before being compressed alongside the
+    # other files
+    bytecodes = compile_python_files([source for kind, source, target in built_files
+                                      if kind == "pythonfiles"], jobs, cache)
+    if cache is not None:
+        cache.prune()
+
+    zid = ParallelZipFile(egg, jobs)
     try:
         for filename, cnt in egg_info.iter_meta(build_node):
+            if not isinstance(cnt, bytes):
+                cnt = cnt.encode("utf-8")
             zid.writestr(os.path.join("EGG-INFO", filename), cnt)
 
-        for kind, source, target in build_manifest.iter_built_files(source_root, egg_scheme):
+        for kind, source, target in built_files:
             if not kind in ["executables"]:
-                zid.write(source.abspath(), target.path_from(source_root))
-            if kind == "pythonfiles":
-                try:
-                    bytecode = bcompile(source.abspath())
-                except PyCompileError:
-                    e = extract_exception()
-                    warnings.warn("Error byte-compiling %r" % source.abspath())
-                else:
-                    zid.writestr("%sc" % target.path_from(source_root), bcompile(source.abspath()))
+                zid.write(source, target)
+            if source in bytecodes:
+                st = os.stat(source)
+                zid.writestr("%sc" % target, pyc_header(st.st_mtime, st.st_size) + bytecodes[source])
     finally:
         zid.close()
 
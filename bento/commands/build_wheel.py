@@ -1,12 +1,15 @@
 import os
 import warnings
 import hashlib
-import cStringIO
 import csv
 
+from six.moves \
+    import \
+        cStringIO
+
 from bento._config \
     import \
-        IPKG_PATH
+        IPKG_PATH, FILE_DIGESTS
 from bento.commands.core \
     import \
         Command, Option
@@ -14,6 +17,9 @@ from bento.commands.wheel_utils \
     import \
         WheelInfo, wheel_filename, urlsafe_b64encode
 from bento.utils.utils import pprint, extract_exception
+from bento.utils.zip_writer \
+    import \
+        ParallelZipFile, DigestCache
 from bento.core \
     import \
         PackageMetadata
@@ -36,7 +42,10 @@ Usage:   bentomaker build_wheel [OPTIONS]"""
                         + [Option("--output-dir",
                                   help="Output directory", default="dist"),
                            Option("--output-file",
-                                  help="Output filename")]
+                                  help="Output filename"),
+                           Option("-j", "--jobs",
+                                  help="Number of compression threads (default: number of CPUs)",
+                                  type="int", dest="jobs")]
 
     def run(self, ctx):
         argv = ctx.command_argv
@@ -50,8 +59,9 @@ Usage:   bentomaker build_wheel [OPTIONS]"""
 
         n = ctx.build_node.make_node(IPKG_PATH)
         build_manifest = BuildManifest.from_file(n.abspath())
-        build_wheel(build_manifest, ctx.build_node, ctx.build_node, output_dir, output_file)
-        
+        build_wheel(build_manifest, ctx.build_node, ctx.build_node, output_dir, output_file,
+                    jobs=o.jobs)
+
 def hash_and_length(filename, hash=hashlib.sha256):
     """Return the (hash, length) of the named file."""
     h = hash()
@@ -64,7 +74,16 @@ def hash_and_length(filename, hash=hashlib.sha256):
             block = f.read(1<<20)
     return (h.digest(), l)
 
-def build_wheel(build_manifest, build_node, source_root, output_dir=None, output_file=None):
+def _to_bytes(data):
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    return data
+
+def _record_digest(hash):
+    return "sha256=" + urlsafe_b64encode(hash).decode("ascii")
+
+def build_wheel(build_manifest, build_node, source_root, output_dir=None, output_file=None,
+                jobs=None):
     meta = PackageMetadata.from_ipkg(build_manifest)
     egg_info = WheelInfo.from_ipkg(build_manifest, build_node)
     
@@ -87,40 +106,47 @@ def build_wheel(build_manifest, build_node, source_root, output_dir=None, output
                   "eprefix": source_root.abspath(),
                   "sitedir": source_root.abspath()}
     
-    record = []
+    digests = DigestCache(build_node.make_node(FILE_DIGESTS).abspath())
+    # Files are hashed while being compressed, unless their digest is known
+    # from a previous build
+    stat_keys = {}
 
-    zid = compat.ZipFile(egg, "w", compat.ZIP_DEFLATED)
+    zid = ParallelZipFile(egg, jobs)
     try:        
         for kind, source, target in build_manifest.iter_built_files(source_root, egg_scheme):
             if not kind in ["executables"]:
                 abspath = source.abspath()
                 target_path = target.path_from(source_root).replace(os.path.sep, '/')
-                zid.write(abspath, target_path)
-                hash, length = hash_and_length(abspath)
-                digest = "sha256="+urlsafe_b64encode(hash)
-                record.append((target_path, digest, length))
+                stat_keys[target_path] = (abspath, digests.stat(abspath))
+                sha256, crc = digests.get(abspath)
+                zid.write(abspath, target_path, sha256, crc)
                 
         for filename, cnt in egg_info.iter_meta(build_node):            
             name = '/'.join((meta.fullname + ".dist-info", filename))
-            digest = "sha256="+urlsafe_b64encode(hashlib.sha256(cnt).digest())
-            zid.writestr(name, cnt)
-            record.append((name, digest, len(cnt)))
+            zid.writestr(name, _to_bytes(cnt))
         
         name = '/'.join((meta.fullname + ".dist-info", "WHEEL"))
         wheelfile = b'Wheel-Version: 0.1\nGenerator: bento\nRoot-Is-Purelib: true\n\n'
         zid.writestr(name, wheelfile)
-        digest = "sha256="+urlsafe_b64encode(hashlib.sha256(wheelfile).digest())
-        record.append((name, digest, len(wheelfile)))
+
+        zid.flush()
+        record = []
+        for arcname, sha256, length, crc in zid.members():
+            record.append((arcname, _record_digest(sha256), length))
+            if arcname in stat_keys:
+                abspath, key = stat_keys[arcname]
+                digests.set(abspath, key, sha256, crc)
         
         name = '/'.join((meta.fullname + ".dist-info", "RECORD"))
-        sio = cStringIO.StringIO()
+        sio = cStringIO()
         writer = csv.writer(sio)
         for row in record:
             writer.writerow(row)
         writer.writerow((name, '', ''))
-        zid.writestr(name, sio.getvalue())
+        zid.writestr(name, _to_bytes(sio.getvalue()))
                 
     finally:
         zid.close()
+        digests.close()
 
     return
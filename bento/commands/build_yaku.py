@@ -26,7 +26,9 @@ def build_extension(bld, extension, env=None):
         else:
             val = env.get("PYEXT_CPPPATH", [])
             val.extend(extension.include_dirs)
-        tasks = builder.extension(extension.name, extension.sources, env)
+        tasks = builder.extension(extension.name, extension.sources, env,
+                                  unity=extension.unity,
+                                  unity_exclude=extension.unity_exclude)
         if len(tasks) > 1:
             outputs = tasks[0].gen.outputs
         else:
@@ -43,7 +45,9 @@ def build_compiled_library(bld, clib, env=None):
     try:
         for p in clib.include_dirs:
             builder.env["CPPPATH"].insert(0, p)
-        outputs = builder.static_library(clib.name, clib.sources, env)
+        outputs = builder.static_library(clib.name, clib.sources, env,
+                                         unity=clib.unity,
+                                         unity_exclude=clib.unity_exclude)
         return [n.bldpath() for n in outputs]
     except RuntimeError:
         e = extract_exception()
@@ -166,7 +166,11 @@ class ContextWithBuildDirectory(CmdContext):
         return n
 
 class ConfigureContext(ContextWithBuildDirectory):
-    pass
+    @classmethod
+    def toolchain_signature(cls, build_node):
+        """Return a string identifying the tools found by the last configure
+        run in the given build directory (part of the configure signature)."""
+        return ""
 
 def _generic_iregistrer(category, name, nodes, from_node, target_dir):
     source_dir = os.path.join("$_srcrootdir", from_node.bldpath())
@@ -374,6 +378,40 @@ class BuildContext(ContextWithBuildDirectory):
                 target_nodes.append(target_node)
             self.outputs_registry.register_outputs("modules", "meta_from_template", target_nodes,
                                                self.build_node, "$sitedir")
+
+    def watched_files(self):
+        """Return the set of absolute paths of the files the registered
+        outputs come from."""
+        files = set()
+        for category, name, nodes, from_node, target_dir in self.outputs_registry.iter_over_category():
+            files.update([n.abspath() for n in nodes])
+        return files
+
+    def rebuild(self, paths):
+        """Update the outputs of this (already run) context after the given
+        files were modified, and return True. Return False if the command has
+        to be run again instead, i.e. if any of the files is not one of
+        watched_files (a new file may change the package), or was removed.
+
+        Used by bentomaker build --watch."""
+        for path in paths:
+            if not op.isfile(path):
+                return False
+        files = self.watched_files()
+        for path in paths:
+            if not path in files:
+                return False
+        self.compile_changed(paths)
+        if self.inplace:
+            self.post_compile()
+        return True
+
+    def compile_changed(self, paths):
+        """Rebuild the outputs depending on the given modified files. The
+        python and data files are registered from the source tree, and need
+        no rebuild."""
+        pass
+
     def post_compile(self):
         # Do the output_registry -> installed sections registry convertion
         section_writer = self.section_writer
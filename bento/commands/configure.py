@@ -2,6 +2,11 @@ import sys
 import os
 import os.path as op
 
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
 from six import moves
 
 from bento.utils.utils \
@@ -20,6 +25,13 @@ from bento.errors \
     import \
         UsageException
 
+# Environment variables which influence the outcome of configure
+CONFIGURE_ENV_VARS = ["PATH", "PYTHONPATH", "CC", "CXX", "CPP", "FC", "F77",
+                      "CFLAGS", "CXXFLAGS", "CPPFLAGS", "FFLAGS", "LDFLAGS",
+                      "LINKFLAGS", "LIBS", "CPATH", "C_INCLUDE_PATH",
+                      "CPLUS_INCLUDE_PATH", "LIBRARY_PATH", "LD_LIBRARY_PATH",
+                      "INCLUDE", "LIB", "SDKROOT", "MACOSX_DEPLOYMENT_TARGET"]
+
 def set_scheme_unix(scheme, options, package):
     # This mess is the simplest solution I can think of to support:
     #   - /usr/local as default for prefix while using debian/ubuntu changes
@@ -173,6 +185,16 @@ class ConfigureCommand(Command):
 Purpose: configure the project
 Usage: bentomaker configure [OPTIONS]"""
     short_descr = "configure the project."
+    common_options = Command.common_options \
+                        + [Option("--conf-cache-dir",
+                                  help="Directory of the configuration checks cache shared between build directories (yaku only)",
+                                  dest="conf_cache_dir"),
+                           Option("--reset-conf-cache",
+                                  help="Remove every cached configuration check result before configuring",
+                                  action="store_true", dest="reset_conf_cache"),
+                           Option("-j", "--jobs",
+                                  help="Number of processes for batches of configuration checks (yaku only) [default: number of CPUs]",
+                                  type="int", dest="jobs")]
 
     def __init__(self, *a, **kw):
         super(ConfigureCommand, self).__init__(*a, **kw)
@@ -214,3 +236,38 @@ def _compute_scheme(package_options):
     for name, f in package_options.path_options.items():
         scheme[name] = f.default_value
     return scheme
+
+def _package_files(package):
+    files = [BENTO_SCRIPT]
+    files.extend(package.hook_files)
+    for key in sorted(package.subpackages):
+        files.append(key)
+        files.extend([op.join(package.subpackages[key].rdir, h) \
+                      for h in package.subpackages[key].hook_files])
+    return files
+
+def configure_signature(global_context, cmd_argv, run_node, package):
+    """Return a digest of the inputs of configure: its arguments, the bento
+    files, the interpreter, the toolchain-related environment variables and
+    the tools found by the last configure run."""
+    top_node = run_node._ctx.srcnode
+    build_node = run_node._ctx.bldnode
+
+    m = md5()
+    def _update(s):
+        m.update(s.encode("utf-8"))
+
+    _update("%r\n" % (cmd_argv,))
+    _update("%s\n%s\n" % (sys.executable, sys.version))
+    for k in CONFIGURE_ENV_VARS:
+        _update("%s=%r\n" % (k, os.environ.get(k, None)))
+    for f in _package_files(package):
+        n = top_node.find_node(f)
+        if n is None:
+            _update("%s: missing\n" % f)
+        else:
+            _update("%s: " % f)
+            m.update(n.read("rb"))
+    context_klass = global_context.retrieve_command_context("configure")
+    _update(context_klass.toolchain_signature(build_node))
+    return m.hexdigest()
@@ -1,6 +1,9 @@
 from bento.commands.configure \
     import \
         _compute_scheme, set_scheme_options
+from bento.commands.options \
+    import \
+        OptionsContext
 from bento.commands.registries \
     import \
         CommandRegistry, ContextRegistry, OptionsRegistry
@@ -23,7 +26,7 @@ from six.moves \
 
 class GlobalContext(object):
     def __init__(self, command_data_db, commands_registry=None, contexts_registry=None,
-            options_registry=None, commands_scheduler=None):
+            options_registry=None, commands_scheduler=None, signatures_db=None):
         self._commands_registry = commands_registry or CommandRegistry()
         self._contexts_registry = contexts_registry or ContextRegistry()
         self._options_registry = options_registry or OptionsRegistry()
@@ -39,6 +42,13 @@ class GlobalContext(object):
         else:
             self._command_data_store = read_or_create_dict(command_data_db.abspath())
 
+        self._signature_funcs = {}
+        self._signatures_db = signatures_db
+        if signatures_db is None:
+            self._signatures = {}
+        else:
+            self._signatures = read_or_create_dict(signatures_db.abspath())
+
     def store(self):
         if self._command_data_db:
             self._command_data_db.safe_write(cPickle.dumps(self._command_data_store), "wb")
@@ -61,6 +71,21 @@ class GlobalContext(object):
         """
         self._commands_registry.register(cmd_name, cmd, public)
 
+    def register_lazy_command(self, cmd_name, path, public=True):
+        """Register a command name to the import path of a command class.
+
+        The command module is only imported when the command is retrieved.
+
+        Parameters
+        ----------
+        cmd_name: str
+            name of the command
+        path: str
+            import path of the command class, e.g.
+            'bento.commands.build:BuildCommand'
+        """
+        self._commands_registry.register_lazy(cmd_name, path, public)
+
     def retrieve_command(self, cmd_name):
         """Return the command instance registered for the given command name."""
         return self._commands_registry.retrieve(cmd_name)
@@ -81,6 +106,11 @@ class GlobalContext(object):
     def register_command_context(self, cmd_name, klass):
         self._contexts_registry.register(cmd_name, klass)
 
+    def register_lazy_command_context(self, cmd_name, path):
+        """Register a command context class from its import path, imported
+        when the context is retrieved."""
+        self._contexts_registry.register_lazy(cmd_name, path)
+
     def retrieve_command_context(self, cmd_name):
         return self._contexts_registry.retrieve(cmd_name)
 
@@ -106,6 +136,17 @@ class GlobalContext(object):
 
         return self._options_registry.register(cmd_name, context)
 
+    def register_lazy_options_context(self, cmd_name):
+        """Register the default options context of the given command, only
+        created (from the command options) when first retrieved."""
+        def _factory():
+            cmd = self.retrieve_command(cmd_name)
+            context = OptionsContext.from_command(cmd)
+            if self._package_options is not None and hasattr(cmd, "register_options"):
+                cmd.register_options(context, self._package_options)
+            return context
+        return self._options_registry.register_lazy(cmd_name, _factory)
+
     def retrieve_options_context(self, cmd_name):
         return self._options_registry.retrieve(cmd_name)
 
@@ -185,6 +226,45 @@ class GlobalContext(object):
         command name."""
         return self._scheduler.order(cmd_name)
 
+    #----------------------
+    # Command signature API
+    #----------------------
+    def register_command_signature(self, cmd_name, func):
+        """Register a function computing the signature of the inputs of a
+        command.
+
+        func is called as func(global_context, cmd_argv, run_node, package),
+        and returns a string. A command run as a dependency of another one is
+        skipped when its signature did not change since its last successful
+        run."""
+        self._signature_funcs[cmd_name] = func
+
+    def _compute_signature(self, cmd_name, cmd_argv, run_node, package):
+        func = self._signature_funcs.get(cmd_name, None)
+        if func is None:
+            return None
+        else:
+            return func(self, cmd_argv, run_node, package)
+
+    def is_command_up_to_date(self, cmd_name, cmd_argv, run_node, package):
+        """Return True if the inputs of the command did not change since its
+        last successful run."""
+        old = self._signatures.get(cmd_name, None)
+        if old is None:
+            return False
+        return old == self._compute_signature(cmd_name, cmd_argv, run_node, package)
+
+    def store_command_signature(self, cmd_name, cmd_argv, run_node, package):
+        """Record the signature of the inputs of a command which successfully
+        ran. This is written immediately, so that a failure of a later command
+        does not invalidate it."""
+        signature = self._compute_signature(cmd_name, cmd_argv, run_node, package)
+        if signature is None:
+            return
+        self._signatures[cmd_name] = signature
+        if self._signatures_db:
+            self._signatures_db.safe_write(cPickle.dumps(self._signatures), "wb")
+
     #---------
     # Hook API
     #---------
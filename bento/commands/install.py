@@ -1,7 +1,11 @@
 import os
-import shutil
 import subprocess
 import errno
+import threading
+
+from six.moves \
+    import \
+        queue
 
 from bento._config \
     import \
@@ -12,7 +16,17 @@ from bento.installed_package_description import \
 from bento.commands.core import \
     Command, Option
 from bento.utils.utils import \
-    pprint, extract_exception, MODE_755, MODE_777
+    pprint, extract_exception, cpu_count, MODE_755, MODE_777
+from bento.utils.os2 import \
+    copy_file, remove_if_exists
+
+# Ways of installing files besides copying them
+LINK_MODES = ["hard", "reflink", "symlink"]
+# Below this number of files, starting the installer threads costs more than it
+# saves
+_POOL_THRESHOLD = 32
+# Number of files given at once to an installer thread
+_CHUNK_SIZE = 16
 
 def _rollback_operation(line):
     operation, arg = line.split()
@@ -56,7 +70,7 @@ class TransactionLog(object):
         self.f = open(journal_filename, "w")
         self.journal_filename = journal_filename
 
-    def copy(self, source, target, category):
+    def copy(self, source, target, category, link=None):
         if os.path.exists(target):
             self.rollback()
             raise ValueError("File %s already exists, rolled back installation" % target)
@@ -64,9 +78,7 @@ class TransactionLog(object):
         if not os.path.exists(d):
             self.makedirs(d)
         self.f.write("COPY %s\n" % target)
-        shutil.copy(source, target)
-        if category == "executables":
-            os.chmod(target, MODE_755)
+        install_file(source, target, category, link)
 
     def makedirs(self, name, mode=MODE_777):
         head, tail = os.path.split(name)
@@ -100,13 +112,91 @@ class TransactionLog(object):
             _rollback_operation(line.strip())
         self.f = None
 
+def install_file(source, target, kind, link=None):
+    """Install source as target, by copying it or with the given link mode
+    (see LINK_MODES). The target directory must exist.
+
+    Hard links and reflinks fall back to copies when the file system does not
+    support them (e.g. across file systems). Executables whose permissions
+    would have to change are always copied, as changing the permissions of a
+    hard or symbolic link changes the source too."""
+    if link in ("hard", "symlink") and kind == "executables" \
+            and os.stat(source).st_mode & MODE_777 != MODE_755:
+        link = None
+    if link == "hard":
+        remove_if_exists(target)
+        try:
+            os.link(source, target)
+            return
+        except (OSError, AttributeError):
+            pass
+    elif link == "symlink":
+        remove_if_exists(target)
+        os.symlink(os.path.abspath(source), target)
+        return
+    elif link not in (None, "reflink"):
+        raise ValueError("Unknown link mode: %s" % link)
+    copy_file(source, target, reflink=(link == "reflink"))
+    if kind == "executables":
+        os.chmod(target, MODE_755)
+
 def copy_installer(source, target, kind):
     dtarget = os.path.dirname(target)
     if not os.path.exists(dtarget):
         os.makedirs(dtarget)
-    shutil.copy(source, target)
-    if kind == "executables":
-        os.chmod(target, MODE_755)
+    install_file(source, target, kind)
+
+def _make_directories(directories):
+    # parents are sorted before their children, and created only once
+    for d in sorted(directories):
+        try:
+            os.makedirs(d)
+        except OSError:
+            e = extract_exception()
+            if e.errno != errno.EEXIST:
+                raise
+
+def bulk_install(files, jobs=None, link=None):
+    """Install the given (kind, source, target) files.
+
+    The target directories are created first, then the files are installed by
+    a pool of jobs threads (number of CPUs if None): copies mostly wait for
+    the disk or happen in the kernel, without holding the GIL."""
+    files = list(files)
+    _make_directories(set(os.path.dirname(target) for kind, source, target in files))
+
+    if jobs is None:
+        jobs = cpu_count()
+    jobs = min(max(1, jobs), len(files) // _CHUNK_SIZE + 1)
+    if jobs == 1 or len(files) < _POOL_THRESHOLD:
+        for kind, source, target in files:
+            install_file(source, target, kind, link)
+        return
+
+    chunks = queue.Queue()
+    for i in range(0, len(files), _CHUNK_SIZE):
+        chunks.put(files[i:i+_CHUNK_SIZE])
+    errors = []
+
+    def _worker():
+        while not errors:
+            try:
+                chunk = chunks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                for kind, source, target in chunk:
+                    install_file(source, target, kind, link)
+            except Exception:
+                errors.append(extract_exception())
+
+    threads = [threading.Thread(target=_worker) for i in range(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
 
 def unix_installer(source, target, kind):
     if kind in ["executables"]:
@@ -130,7 +220,13 @@ Usage:   bentomaker install [OPTIONS]."""
                                 help="Do a transaction-based install", action="store_true"),
                          Option("-n", "--dry-run", "--list-files",
                                 help="List installed files (do not install anything)",
-                                action="store_true", dest="list_files")]
+                                action="store_true", dest="list_files"),
+                         Option("-j", "--jobs",
+                                help="Number of installer threads (default: number of CPUs)",
+                                type="int", dest="jobs"),
+                         Option("--link",
+                                help="Link the installed files instead of copying them: %s (hard and reflink fall back to copies across file systems)" % "|".join(LINK_MODES),
+                                type="choice", choices=LINK_MODES, dest="link")]
     def run(self, ctx):
         argv = ctx.command_argv
         p = ctx.options_context.parser
@@ -157,9 +253,10 @@ Usage:   bentomaker install [OPTIONS]."""
             trans = TransactionLog("transaction.log")
             try:
                 for kind, source, target in iter_files(node_sections):
-                    trans.copy(source.abspath(), target.abspath(), kind)
+                    trans.copy(source.abspath(), target.abspath(), kind, o.link)
             finally:
                 trans.close()
         else:
-            for kind, source, target in iter_files(node_sections):
-                copy_installer(source.abspath(), target.abspath(), kind)
+            bulk_install([(kind, source.abspath(), target.abspath())
+                          for kind, source, target in iter_files(node_sections)],
+                         o.jobs, o.link)
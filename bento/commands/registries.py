@@ -1,57 +1,98 @@
+import sys
+
 from bento.compat.api \
     import \
         defaultdict
 
+def import_object(path):
+    """Import and return the object referred to by path, of the form
+    'package.module:name'."""
+    module_name, _, name = path.partition(":")
+    if not name:
+        raise ValueError("Invalid object path %r (expected 'module:name')" % path)
+    __import__(module_name)
+    return getattr(sys.modules[module_name], name)
+
 class CommandRegistry(object):
     def __init__(self):
         # command line name -> command class
         self._klasses = {}
+        # command line name -> import path of the command class, for commands
+        # which have not been imported yet
+        self._lazy = {}
         # command line name -> None for private commands
         self._privates = {}
 
     def register(self, name, cmd_klass, public=True):
-        if name in self._klasses:
+        if self.is_registered(name):
             raise ValueError("context for command %r already registered !" % name)
         else:
             self._klasses[name] = cmd_klass
             if not public:
                 self._privates[name] = None
 
+    def register_lazy(self, name, path, public=True):
+        """Register a command from the import path of its class
+        ('package.module:Klass'). The module is only imported, and the
+        command instantiated, when the command is retrieved."""
+        if self.is_registered(name):
+            raise ValueError("context for command %r already registered !" % name)
+        else:
+            self._lazy[name] = path
+            if not public:
+                self._privates[name] = None
+
     def retrieve(self, name):
         cmd_klass = self._klasses.get(name, None)
         if cmd_klass is None:
-            raise ValueError("No command class registered for name %r" % name)
-        else:
-            return cmd_klass
+            path = self._lazy.get(name, None)
+            if path is None:
+                raise ValueError("No command class registered for name %r" % name)
+            cmd_klass = self._klasses[name] = import_object(path)()
+            del self._lazy[name]
+        return cmd_klass
 
     def is_registered(self, name):
-        return name in self._klasses
+        return name in self._klasses or name in self._lazy
 
     def command_names(self):
-        return self._klasses.keys()
+        return list(self._klasses.keys()) + list(self._lazy.keys())
 
     def public_command_names(self):
-        return [k for k in self._klasses.keys() if not k in self._privates]
+        return [k for k in self.command_names() if not k in self._privates]
 
 class ContextRegistry(object):
     def __init__(self, default=None):
         self._contexts = {}
+        # command line name -> import path of the context class
+        self._lazy = {}
         self.set_default(default)
 
     def set_default(self, default):
         self._default = default
 
     def is_registered(self, cmd_name):
-        return cmd_name in self._contexts
+        return cmd_name in self._contexts or cmd_name in self._lazy
 
     def register(self, cmd_name, context):
-        if cmd_name in self._contexts:
+        if self.is_registered(cmd_name):
             raise ValueError("context for command %r already registered !" % cmd_name)
         else:
             self._contexts[cmd_name] = context
 
+    def register_lazy(self, cmd_name, path):
+        """Register a context class from its import path
+        ('package.module:Klass'), imported when first retrieved."""
+        if self.is_registered(cmd_name):
+            raise ValueError("context for command %r already registered !" % cmd_name)
+        else:
+            self._lazy[cmd_name] = path
+
     def retrieve(self, cmd_name):
         context = self._contexts.get(cmd_name, None)
+        if context is None and cmd_name in self._lazy:
+            context = self._contexts[cmd_name] = import_object(self._lazy[cmd_name])
+            del self._lazy[cmd_name]
         if context is None:
             if self._default is None:
                 raise ValueError("No context registered for command %r" % cmd_name)
@@ -65,18 +106,32 @@ class OptionsRegistry(object):
     def __init__(self):
         # command line name -> context *instance*
         self._contexts = {}
+        # command line name -> callable creating the context instance
+        self._factories = {}
 
     def register(self, cmd_name, options_context):
-        if cmd_name in self._contexts:
+        if self.is_registered(cmd_name):
             raise ValueError("options context for command %r already registered !" % cmd_name)
         else:
             self._contexts[cmd_name] = options_context
 
+    def register_lazy(self, cmd_name, factory):
+        """Register a callable returning the options context of the command.
+        It is called the first time the options context is retrieved, so that
+        the command (and its option parser) is only created when needed."""
+        if self.is_registered(cmd_name):
+            raise ValueError("options context for command %r already registered !" % cmd_name)
+        else:
+            self._factories[cmd_name] = factory
+
     def is_registered(self, cmd_name):
-        return cmd_name in self._contexts
+        return cmd_name in self._contexts or cmd_name in self._factories
 
     def retrieve(self, cmd_name):
         options_context = self._contexts.get(cmd_name, None)
+        if options_context is None and cmd_name in self._factories:
+            options_context = self._contexts[cmd_name] = self._factories[cmd_name]()
+            del self._factories[cmd_name]
         if options_context is None:
             raise ValueError("No options context registered for cmd_name %r" % cmd_name)
         else:
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import shutil
 import tempfile
 
@@ -305,6 +306,68 @@ class TestBuildYaku(_TestBuildSimpleExtension):
     def test_disable_nonexisting_extension(self):
         super(TestBuildYaku, self).test_disable_nonexisting_extension()
 
+    @require_c_compiler("yaku")
+    def test_rebuild(self):
+        conf, configure, bld, build = self._run_configure_and_build({"bento.info": BENTO_INFO_WITH_EXT},
+                                                                    build_argv=["--watch"])
+        source = self.top_node.find_node("foo.c")
+        tasks = bld.yaku_context.tasks
+        signatures = [t.signature() for t in tasks]
+
+        source.write(source.read() + "\nint foo_changed(void) { return 0; }\n")
+        self.assertTrue(bld.rebuild([source.abspath()]))
+        # the compile and link tasks were run again
+        self.assertEqual([bld.yaku_context.cache[t.get_uid()] != s for t, s in zip(tasks, signatures)],
+                         [True] * len(tasks))
+
+        # new files may change the package
+        self.assertFalse(bld.rebuild([op.join(self.d, "bar.c")]))
+
+    @require_c_compiler("yaku")
+    def test_rebuild_removed_source(self):
+        conf, configure, bld, build = self._run_configure_and_build({"bento.info": BENTO_INFO_WITH_CLIB},
+                                                                    build_argv=["--watch"])
+        source = self.top_node.find_node("foo.c")
+        path = source.abspath()
+        os.remove(path)
+        # the command has to be run again, which reports the missing source
+        self.assertFalse(bld.rebuild([path]))
+        self.assertFalse(path in bld.watched_files())
+
+    @require_c_compiler("yaku")
+    def test_new_globbed_source(self):
+        bento_info = """\
+Name: foo
+
+Library:
+    CompiledLibrary: foo
+        Sources: src/*.c
+"""
+        src = self.top_node.make_node("src")
+        src.mkdir()
+        src.make_node("a.c").write("int a(void) { return 0; }\n")
+        self._run_configure({"bento.info": bento_info})
+        # recently modified sources are not trusted by the no-op build check
+        old = time.time() - 10
+        for f in src.listdir():
+            os.utime(src.make_node(f).abspath(), (old, old))
+
+        def _build():
+            bld, build = prepare_build(self.top_node, bento_info, self._build_context)
+            run_command_in_context(bld, build)
+            return bld
+
+        bld = _build()
+        # no-op build: the task graph is not created
+        bld = _build()
+        self.assertTrue(bld._yaku_context is None)
+
+        # a new file matching the glob is built
+        src.make_node("b.c").write("int b(void) { return 0; }\n")
+        bld = _build()
+        inputs = [n.name for t in bld.yaku_context.tasks for n in t.inputs]
+        self.assertTrue("b.c" in inputs, inputs)
+
 def _not_has_waf():
     try:
         import bento.backends.waf_backend
@@ -22,16 +22,17 @@ from bento.core.node \
         create_root_with_source_tree
 from bento.commands.wrapper_utils \
     import \
-        run_command_in_context
+        run_command_in_context, run_with_dependencies
 from bento.commands.tests.utils \
     import \
-        prepare_configure
+        prepare_configure, create_global_context
 from bento.backends.yaku_backend \
     import \
         ConfigureYakuContext
 from bento.commands.configure \
     import \
-        _compute_scheme, set_scheme_unix, set_scheme_win32
+        _compute_scheme, set_scheme_unix, set_scheme_win32, \
+        ConfigureCommand, configure_signature
 
 BENTO_INFO = """\
 Name: Sphinx
@@ -140,6 +141,54 @@ MOCK_DEBIAN_SCHEME = {
 }
 
 
+class TestAutoConfigure(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.root = create_root_with_source_tree(self.d, os.path.join(self.d, "build"))
+        self.run_node = self.root.find_node(self.d)
+        self.top_node = self.run_node._ctx.srcnode
+
+        self.old_dir = os.getcwd()
+        os.chdir(self.d)
+
+        self.top_node.make_node("bento.info").safe_write(BENTO_INFO)
+        package = PackageDescription.from_string(BENTO_INFO)
+        package_options = PackageOptions.from_string(BENTO_INFO)
+        self.global_context = create_global_context(package, package_options)
+        self.global_context.set_before("build", "configure")
+        self.global_context.register_command_signature("configure", configure_signature)
+
+    def tearDown(self):
+        os.chdir(self.old_dir)
+        shutil.rmtree(self.d)
+
+    def _build(self):
+        package = PackageDescription.from_string(self.top_node.find_node("bento.info").read())
+        with mock.patch.object(ConfigureCommand, "run") as run:
+            run_with_dependencies(self.global_context, "build", [], self.run_node,
+                                  self.top_node, package)
+            return run.call_count
+
+    def test_skipped_when_unchanged(self):
+        self.assertEqual(self._build(), 1)
+        self.assertEqual(self._build(), 0)
+
+    def test_bento_info_changed(self):
+        self.assertEqual(self._build(), 1)
+        self.top_node.find_node("bento.info").safe_write(BENTO_INFO + "Platforms: any\n")
+        self.assertEqual(self._build(), 1)
+
+    def test_argv_changed(self):
+        self.assertEqual(self._build(), 1)
+        self.global_context.save_command_argv("configure", ["--prefix=/foo"])
+        self.assertEqual(self._build(), 1)
+        self.assertEqual(self._build(), 0)
+
+    def test_environment_changed(self):
+        self.assertEqual(self._build(), 1)
+        with mock.patch.dict(os.environ, {"CFLAGS": "-O3"}):
+            self.assertEqual(self._build(), 1)
+
 class TestUnixScheme(unittest.TestCase):
     def setUp(self):
         super(TestUnixScheme, self).setUp()
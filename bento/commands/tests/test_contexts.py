@@ -44,3 +44,42 @@ Path: floupi
     Default: /yeah
 """)
         self._test(package_options, {"floupi": "/yeah"})
+
+class TestGlobalContextLazyRegistration(unittest.TestCase):
+    def setUp(self):
+        self.context = GlobalContext(None)
+
+    def test_lazy_command(self):
+        from bento.commands.parse import ParseCommand
+
+        self.context.register_lazy_command("parse", "bento.commands.parse:ParseCommand", public=False)
+        self.assertTrue(self.context.is_command_registered("parse"))
+        self.assertEqual(list(self.context.command_names(public_only=False)), ["parse"])
+        self.assertEqual(list(self.context.command_names()), [])
+
+        cmd = self.context.retrieve_command("parse")
+        self.assertTrue(isinstance(cmd, ParseCommand))
+        self.assertTrue(self.context.retrieve_command("parse") is cmd)
+
+        self.assertRaises(ValueError,
+                lambda: self.context.register_command("parse", ParseCommand()))
+
+    def test_not_imported_until_retrieved(self):
+        self.context.register_lazy_command("foo", "bento.commands.non_existing:FooCommand")
+        self.context.register_lazy_command_context("foo", "bento.commands.non_existing:FooContext")
+        self.context.register_lazy_options_context("foo")
+
+        self.assertTrue(self.context.is_command_registered("foo"))
+        self.assertTrue(self.context.is_command_context_registered("foo"))
+        self.assertTrue(self.context.is_options_context_registered("foo"))
+
+        self.assertRaises(ImportError, lambda: self.context.retrieve_command("foo"))
+        self.assertRaises(ImportError, lambda: self.context.retrieve_command_context("foo"))
+
+    def test_lazy_options_context(self):
+        self.context.register_lazy_command("parse", "bento.commands.parse:ParseCommand")
+        self.context.register_lazy_options_context("parse")
+
+        options_context = self.context.retrieve_options_context("parse")
+        self.assertTrue(options_context.parser.has_option("--help"))
+        self.assertTrue(self.context.retrieve_options_context("parse") is options_context)
@@ -1,6 +1,10 @@
 import os
 import shutil
+import marshal
 import tempfile
+import warnings
+
+import mock
 
 from bento.compat.api.moves \
     import \
@@ -25,6 +29,7 @@ from bento.core.pkg_objects \
 from bento.commands.egg_utils \
     import \
         EggInfo
+import bento.commands.build_egg as build_egg
 
 DESCR = """\
 Name: Sphinx
@@ -161,3 +166,77 @@ Platform: UNKNOWN
         egg_info = self._prepare_egg_info()
         for name, content in egg_info.iter_meta(self.build_node):
             pass
+
+class TestCompilePythonFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filenames = []
+        for i in range(4):
+            filename = os.path.join(self.tmpdir, "mod%d.py" % i)
+            f = open(filename, "w")
+            try:
+                f.write("a = %d\n" % i)
+            finally:
+                f.close()
+            self.filenames.append(filename)
+        self.cache_dir = os.path.join(self.tmpdir, "bytecode")
+        self.old_threshold = build_egg._POOL_THRESHOLD
+
+    def tearDown(self):
+        build_egg._POOL_THRESHOLD = self.old_threshold
+        shutil.rmtree(self.tmpdir)
+
+    def _check(self, bytecodes):
+        self.assertEqual(sorted(bytecodes.keys()), self.filenames)
+        for i, filename in enumerate(self.filenames):
+            d = {}
+            exec(marshal.loads(bytecodes[filename]), d)
+            self.assertEqual(d["a"], i)
+
+    def test_cache(self):
+        cache = build_egg.BytecodeCache(self.cache_dir)
+        self._check(build_egg.compile_python_files(self.filenames, 1, cache))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+
+        cache = build_egg.BytecodeCache(self.cache_dir)
+        with mock.patch("bento.commands.build_egg._compile") as _compile:
+            self._check(build_egg.compile_python_files(self.filenames, 1, cache))
+            self.assertFalse(_compile.called)
+
+        cache = build_egg.BytecodeCache(self.cache_dir)
+        build_egg.compile_python_files(self.filenames[:1], 1, cache)
+        cache.prune()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_prune_other_versions(self):
+        cache = build_egg.BytecodeCache(self.cache_dir)
+        build_egg.compile_python_files(self.filenames, 1, cache)
+
+        # entries of another python version are kept
+        other = build_egg.BytecodeCache(self.cache_dir)
+        other.prefix = "00000000-"
+        build_egg.compile_python_files(self.filenames[:2], 1, other)
+        other.prune()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 6)
+
+        cache = build_egg.BytecodeCache(self.cache_dir)
+        cache.prune()
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         sorted(other._used))
+
+    def test_pool(self):
+        build_egg._POOL_THRESHOLD = 1
+        self._check(build_egg.compile_python_files(self.filenames, 2))
+
+    def test_invalid(self):
+        f = open(self.filenames[0], "w")
+        try:
+            f.write("a = \n")
+        finally:
+            f.close()
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            bytecodes = build_egg.compile_python_files(self.filenames, 1)
+        self.assertEqual(len(w), 1)
+        self.assertFalse(self.filenames[0] in bytecodes)
+        self.assertEqual(len(bytecodes), 3)
@@ -28,7 +28,8 @@ from bento.commands.tests.utils \
         prepare_configure, prepare_build
 from bento.commands.install \
     import \
-        InstallCommand, TransactionLog, rollback_transaction
+        InstallCommand, TransactionLog, rollback_transaction, bulk_install, \
+        LINK_MODES
 from bento.commands.options \
     import \
         OptionsContext
@@ -39,6 +40,9 @@ from bento.core.options \
 from bento.core.testing \
     import \
         create_fake_package_from_bento_info, require_c_compiler
+from bento.utils.utils \
+    import \
+        MODE_755
 
 class TestBuildCommand(unittest.TestCase):
     def setUp(self):
@@ -221,3 +225,67 @@ class TestTransactionLog(unittest.TestCase):
             self.fail("Expected failure at this point !")
         finally:
             log.close()
+
+class TestBulkInstall(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.source_dir = op.join(self.base_dir, "src")
+        self.files = write_simple_tree(self.source_dir)
+        self.target_dir = op.join(self.base_dir, "target")
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def _install(self, jobs=None, link=None):
+        files = []
+        for source in self.files:
+            target = op.join(self.target_dir, op.relpath(source, self.source_dir))
+            files.append(("datafiles", source, target))
+        bulk_install(files, jobs, link)
+        return files
+
+    def _read(self, filename):
+        fid = open(filename)
+        try:
+            return fid.read()
+        finally:
+            fid.close()
+
+    def _check(self, files):
+        for kind, source, target in files:
+            self.assertEqual(self._read(target), self._read(source))
+
+    def test_serial(self):
+        self._check(self._install(1))
+
+    def test_parallel(self):
+        self.files *= 4
+        self._check(self._install(4))
+
+    def test_links(self):
+        for link in LINK_MODES:
+            files = self._install(4, link)
+            self._check(files)
+            shutil.rmtree(self.target_dir)
+
+    def test_link_modes(self):
+        source, target = self._install(link="hard")[0][1:]
+        self.assertTrue(op.samefile(source, target))
+
+        source, target = self._install(link="symlink")[0][1:]
+        self.assertEqual(os.readlink(target), source)
+
+        # installing again over a link does not write into the source
+        source, target = self._install()[0][1:]
+        self.assertFalse(op.islink(target))
+        self.assertFalse(op.samefile(source, target))
+        self._check([(None, source, target)])
+
+    def test_executables(self):
+        source = self.files[0]
+        target = op.join(self.target_dir, "foo")
+        for link in [None] + LINK_MODES:
+            bulk_install([("executables", source, target)], link=link)
+            self.assertEqual(os.stat(target).st_mode & MODE_755, MODE_755)
+            self.assertNotEqual(os.lstat(source).st_mode & MODE_755, MODE_755)
+            self.assertFalse(op.islink(target))
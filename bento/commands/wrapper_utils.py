@@ -10,12 +10,20 @@ from bento.commands.hooks \
 
 def run_with_dependencies(global_context, cmd_name, cmd_argv, run_node, top_node, package):
     """Run the given command, including its dependencies as defined in the
-    global_context."""
+    global_context.
+
+    Dependencies whose inputs did not change since their last run are
+    skipped. Return the command instance and its context."""
     deps = global_context.retrieve_dependencies(cmd_name)
     for dep_cmd_name in deps:
         dep_cmd_argv = global_context.retrieve_command_argv(dep_cmd_name)
+        if global_context.is_command_up_to_date(dep_cmd_name, dep_cmd_argv, run_node, package):
+            continue
         resolve_and_run_command(global_context, dep_cmd_name, dep_cmd_argv, run_node, package)
-    resolve_and_run_command(global_context, cmd_name, cmd_argv, run_node, package)
+        global_context.store_command_signature(dep_cmd_name, dep_cmd_argv, run_node, package)
+    cmd, context = resolve_and_run_command(global_context, cmd_name, cmd_argv, run_node, package)
+    global_context.store_command_signature(cmd_name, cmd_argv, run_node, package)
+    return cmd, context
 
 def resolve_and_run_command(global_context, cmd_name, cmd_argv, run_node, package):
     """Run the given Command instance inside its context, including any hook
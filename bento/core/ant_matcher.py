@@ -0,0 +1,181 @@
+"""
+Compiled matcher for ant patterns, used by Node.ant_glob.
+
+All the include and exclude patterns are compiled together into one matcher,
+so that many patterns are answered in a single walk of the tree. A directory
+is described by the set of (pattern, segment) positions which can still match
+below it; those sets are interned, and each one is compiled once into a
+lookup table for literal segments and a list of regexes for wildcard segments.
+A subtree is only walked if at least one include pattern may still match in
+it.
+"""
+import re
+
+# Characters which make a pattern segment a regex instead of a literal name
+_SPECIAL = set("*?[]()|^$\\{}+")
+
+def split_pattern(pattern):
+    """Split an ant pattern in its segments ('**' or name patterns)."""
+    pattern = pattern.replace('\\', '/').replace('//', '/')
+    if pattern.endswith('/'):
+        pattern += '**'
+    return pattern.split('/')
+
+def segment_regex(segment):
+    """Translate a segment pattern (e.g. '*.c') to a compiled regex."""
+    segment = segment.replace('.', '[.]').replace('*', '.*').replace('?', '.').replace('+', '\\+')
+    return re.compile('^%s$' % segment)
+
+def is_literal(segment):
+    return not (_SPECIAL & set(segment))
+
+class _State(object):
+    """Set of pattern positions reached by a path.
+
+    Attributes
+    ----------
+    groups: list
+        indices of the include groups fully matched by the path
+    recurse: bool
+        True if some include pattern may match below the path"""
+    def __init__(self, matcher, positions):
+        self.matcher = matcher
+        self.positions = positions
+
+        patterns = matcher.patterns
+        n_incl = matcher.n_include
+        self.groups = sorted(set([matcher.group_of[p] for p, i in positions
+                                  if p < n_incl and i == len(patterns[p])]))
+        self.recurse = False
+        for p, i in positions:
+            if p < n_incl and i < len(patterns[p]):
+                self.recurse = True
+                break
+        # compiled lazily, only for the states of walked directories
+        self._keep = None
+        self._keep_state = None
+        self._literals = None
+        self._regexes = None
+        self._any_regex = None
+
+    def _compile(self):
+        patterns = self.matcher.patterns
+        keep = []
+        literals = {}
+        regexes = {}
+        regex_of = self.matcher.regex_of
+        def _add(segment, position):
+            if regex_of[segment] is None:
+                literals.setdefault(segment, []).append(position)
+            else:
+                regexes.setdefault(segment, []).append(position)
+        for p, i in self.positions:
+            pattern = patterns[p]
+            if i == len(pattern):
+                continue
+            if pattern[i] == '**':
+                keep.append((p, i))
+                if i + 1 == len(pattern):
+                    keep.append((p, i + 1))
+                else:
+                    _add(pattern[i + 1], (p, i + 2))
+            else:
+                _add(pattern[i], (p, i + 1))
+        self._keep = keep
+        self._literals = literals
+        self._regexes = [(regex_of[segment], positions)
+                         for segment, positions in sorted(regexes.items())]
+        # Most names match none of the regexes: one alternation rejects them
+        # with a single match call
+        if len(self._regexes) > 1:
+            self._any_regex = re.compile("|".join([r.pattern for r, positions in self._regexes]))
+        else:
+            self._any_regex = None
+
+    def next(self, name):
+        """Return the state reached from this one through the entry name,
+        or None if no include pattern may match name or below it, or if
+        name is excluded."""
+        if self._keep is None:
+            self._compile()
+        positions = None
+        literal = self._literals.get(name)
+        if literal:
+            positions = set(self._keep)
+            positions.update(literal)
+        if self._regexes and (self._any_regex is None or self._any_regex.match(name)):
+            for regex, regex_positions in self._regexes:
+                if regex.match(name):
+                    if positions is None:
+                        positions = set(self._keep)
+                    positions.update(regex_positions)
+        if positions is None:
+            # only the '**' positions remain, as for most names
+            if self._keep_state is None:
+                self._keep_state = self.matcher.state(frozenset(self._keep))
+            return self._keep_state
+        return self.matcher.state(frozenset(positions))
+
+class AntMatcher(object):
+    """Matcher for several groups of include patterns, sharing a list of
+    exclude patterns.
+
+    Parameters
+    ----------
+    includes: list
+        each item is a group of patterns (a list of patterns, or a string of
+        space-separated patterns); the paths matched by any pattern of a group
+        are reported for that group
+    excludes: list
+        patterns of excluded paths: an excluded path is neither reported nor
+        walked into"""
+    def __init__(self, includes, excludes):
+        self.patterns = []
+        self.group_of = []
+        for group, patterns in enumerate(includes):
+            for pattern in _to_list(patterns):
+                self.patterns.append(split_pattern(pattern))
+                self.group_of.append(group)
+        self.n_include = len(self.patterns)
+        self.n_groups = len(includes)
+        self._exclude = set()
+        for pattern in _to_list(excludes):
+            self._exclude.add(len(self.patterns))
+            self.patterns.append(split_pattern(pattern))
+
+        # segment -> compiled regex, or None for literal segments
+        self.regex_of = {}
+        for pattern in self.patterns:
+            for segment in pattern:
+                if segment != '**' and not segment in self.regex_of:
+                    if is_literal(segment):
+                        self.regex_of[segment] = None
+                    else:
+                        self.regex_of[segment] = segment_regex(segment)
+
+        self._states = {}
+        self.start = self.state(frozenset([(p, 0) for p in range(len(self.patterns))]))
+
+    def state(self, positions):
+        """Return the interned state for the given positions (None if it
+        matches nothing)."""
+        try:
+            return self._states[positions]
+        except KeyError:
+            state = _State(self, positions)
+            if not (state.recurse or state.groups) or self._is_excluded(positions):
+                state = None
+            self._states[positions] = state
+            return state
+
+    def _is_excluded(self, positions):
+        for p, i in positions:
+            if p in self._exclude and i == len(self.patterns[p]):
+                return True
+        return False
+
+def _to_list(sth):
+    if isinstance(sth, str):
+        return sth.split()
+    else:
+        return sth
@@ -0,0 +1,142 @@
+"""
+Persistent snapshot of directory listings, for bento.core.node.Node.
+
+Looking up or globbing nodes costs one stat per file, which is expensive on
+network filesystems (NFS...). When a snapshot is set (see
+bento.core.node.set_dir_snapshot), the nodes below its roots are looked up in
+the listings of their directories instead. Each listing is stored with the
+mtime of its directory, so that a directory is only stat'ed once per run, and
+only listed again when an entry was added, removed or renamed in it.
+"""
+import os
+import stat
+import errno
+
+from six.moves \
+    import \
+        cPickle
+
+import bento.utils.io2
+import bento.utils.path
+
+from bento.core.node \
+    import \
+        listdir_types
+from bento.utils.utils \
+    import \
+        stat_key
+
+class DirSnapshot(object):
+    """Persistent {directory: {name: is a directory}} snapshot of the
+    directories below roots, except the ones below excludes (e.g. the build
+    directory, written during the run)."""
+    __version__ = 2
+
+    def __init__(self, filename=None, roots=None, excludes=None):
+        self.filename = filename
+        self.roots = [os.path.abspath(p) for p in (roots or [])]
+        self.excludes = [os.path.abspath(p) for p in (excludes or [])]
+
+        self._dirty = False
+        # directory -> (stat key, entries), from the previous runs
+        self._data = {}
+        # directory -> entries (None if not a directory), checked in this run
+        self._checked = {}
+
+        if filename is not None and os.path.exists(filename):
+            try:
+                fid = open(filename, "rb")
+                try:
+                    version, data = cPickle.load(fid)
+                finally:
+                    fid.close()
+                if version == self.__version__:
+                    self._data = data
+            except Exception:
+                self._dirty = True
+
+    def covers(self, path):
+        """Return True if path is handled by the snapshot."""
+        for exclude in self.excludes:
+            if _is_below(path, exclude):
+                return False
+        for root in self.roots:
+            if _is_below(path, root):
+                return True
+        return False
+
+    def entries(self, path):
+        """Return the {name: is a directory} entries of the directory path,
+        or None if path is not a directory."""
+        try:
+            return self._checked[path]
+        except KeyError:
+            pass
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            entries = None
+        else:
+            # recently modified directories are not recorded
+            key = stat_key(st)
+            data = self._data.get(path, None)
+            if key is not None and data is not None and data[0] == key:
+                entries = data[1]
+            else:
+                entries = dict(listdir_types(path))
+                if key is None:
+                    self._data.pop(path, None)
+                else:
+                    self._data[path] = (key, entries)
+                self._dirty = True
+        self._checked[path] = entries
+        return entries
+
+    def lookup(self, path):
+        """Return True if path is a directory, False if it is another kind of
+        file, and None if it does not exist."""
+        parent, name = os.path.split(path)
+        if not name:
+            return self.entries(path) is not None
+        entries = self.entries(parent)
+        if entries is None:
+            return None
+        return entries.get(name, None)
+
+    def listdir_types(self, path):
+        """Same as Node.listdir_types, for the directory path."""
+        entries = self.entries(path)
+        if entries is None:
+            raise OSError(errno.ENOENT, "No such directory: %r" % path)
+        return list(entries.items())
+
+    def invalidate(self, path, recursive=False):
+        """Forget the listing of the directory path, e.g. after a file was
+        created in it, and of its subdirectories if recursive is True."""
+        if recursive:
+            paths = [p for p in set(self._checked) | set(self._data) if _is_below(p, path)]
+        else:
+            paths = [path]
+        for p in paths:
+            self._checked.pop(p, None)
+            if self._data.pop(p, None) is not None:
+                self._dirty = True
+
+    def refresh(self):
+        """Check the directories again, e.g. when a long-running process
+        (bentomaker build --watch) looks up files after they changed."""
+        self._checked.clear()
+
+    def close(self):
+        if self._dirty and self.filename is not None:
+            def _writer(fid):
+                cPickle.dump((self.__version__, self._data), fid, 2)
+            bento.utils.path.ensure_dir(self.filename)
+            bento.utils.io2.safe_write(self.filename, _writer)
+            self._dirty = False
+
+def _is_below(path, directory):
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
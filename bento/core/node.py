@@ -18,6 +18,31 @@ from bento.compat.api \
 from bento.utils.utils \
     import \
         is_string, extract_exception
+from bento.core.ant_matcher \
+    import \
+        AntMatcher
+
+try:
+    _scandir = os.scandir
+except AttributeError:
+    _scandir = None
+
+def listdir_types(path):
+    "list the directory path as (name, is a directory) pairs"
+    if _scandir is not None:
+        # the type comes from the directory entry, without a stat call
+        # (except for symbolic links)
+        ret = []
+        for entry in _scandir(path):
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                isdir = False
+            ret.append((entry.name, isdir))
+        return ret
+    else:
+        return [(name, os.path.isdir(os.path.join(path, name)))
+                for name in os.listdir(path)]
 
 def to_list(sth):
     if isinstance(sth, str):
@@ -85,6 +110,9 @@ elif sys.platform == 'win32':
 
 class Node(object):
     __slots__ = ('name', 'sig', 'children', 'parent', 'cache_abspath', 'cache_isdir')
+    # Optional bento.core.dir_snapshot.DirSnapshot instance (see
+    # set_dir_snapshot)
+    _snapshot = None
     def __init__(self, name, parent):
         self.name = name
         self.parent = parent
@@ -132,6 +160,7 @@ class Node(object):
 
     def write(self, data, flags='w'):
         "write some text to the physical file, assuming the node is a file"
+        self.parent._changed()
         f = None
         try:
             f = open(self.abspath(), flags)
@@ -141,6 +170,7 @@ class Node(object):
                 f.close()
 
     def safe_write(self, data, flags='w'):
+        self.parent._changed()
         tmp = self.parent.make_node([self.name + ".tmp"])
         tmp.write(data, flags)
         rename(tmp.abspath(), self.abspath())
@@ -151,12 +181,20 @@ class Node(object):
 
     def delete(self):
         """Delete the file/folder physically (but not the node)"""
+        self._changed(True)
+        self.parent._changed()
         if getattr(self, 'children', None):
             shutil.rmtree(self.abspath())
             delattr(self, 'children')
         else:
             os.unlink(self.abspath())
 
+    def evict(self):
+        """Remove the node from the tree, after its file was removed by
+        another process"""
+        self.parent._changed()
+        del self.parent.children[self.name]
+
     def suffix(self):
         "scons-like - hot zone so do not touch"
         k = max(0, self.name.rfind('.'))
@@ -171,10 +209,33 @@ class Node(object):
             val += 1
         return val
 
+    def _get_snapshot(self):
+        "directory snapshot handling this node, if any"
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.covers(self.abspath()):
+            return snapshot
+        return None
+
+    def _changed(self, recursive=False):
+        "to be called when an entry is added to or removed from this directory"
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            snapshot.invalidate(self.abspath(), recursive)
+
     def listdir(self):
         "list the directory contents"
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return [name for name, isdir in snapshot.listdir_types(self.abspath())]
         return os.listdir(self.abspath())
 
+    def listdir_types(self):
+        "list the directory contents as (name, is a directory) pairs"
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return snapshot.listdir_types(self.abspath())
+        return listdir_types(self.abspath())
+
     def mkdir(self):
         "write a directory for the node"
         if getattr(self, 'cache_isdir', None):
@@ -183,6 +244,7 @@ class Node(object):
         self.parent.mkdir()
 
         if self.name:
+            self.parent._changed()
             try:
                 os.mkdir(self.abspath())
             except OSError:
@@ -220,11 +282,17 @@ class Node(object):
 
             # optimistic: create the node first then look if it was correct to do so
             cur = self.__class__(x, cur)
-            try:
-                os.stat(cur.abspath())
-            except:
-                del cur.parent.children[x]
-                return None
+            snapshot = cur._get_snapshot()
+            if snapshot is not None:
+                if snapshot.lookup(cur.abspath()) is None:
+                    del cur.parent.children[x]
+                    return None
+            else:
+                try:
+                    os.stat(cur.abspath())
+                except:
+                    del cur.parent.children[x]
+                    return None
 
         ret = cur
 
@@ -340,56 +408,36 @@ class Node(object):
             p = p.parent
         return id(p) == id(node)
 
-    def _ant_iter(self, accept=None, maxdepth=25, pats=[], dir=False, src=True, remove=True):
+    def _ant_walk(self, state, results, maxdepth, dir, src, remove):
         """
-        Semi-private and recursive method used by ant_glob.
-
-        :param accept: function used for accepting/rejecting a node, returns the patterns that can be still accepted in recursion
-        :type accept: function
-        :param maxdepth: maximum depth in the filesystem (25)
-        :type maxdepth: int
-        :param pats: list of patterns to accept and list of patterns to exclude
-        :type pats: tuple
-        :param dir: return folders too (False by default)
-        :type dir: bool
-        :param src: return files (True by default)
-        :type src: bool
-        :param remove: remove files/folders that do not exist (True by default)
-        :type remove: bool
+        Semi-private and recursive method used by ant_glob_many: append the
+        nodes below self matched by the groups of state's matcher to results.
         """
-        dircont = self.listdir()
-        dircont.sort()
+        entries = self.listdir_types()
+        entries.sort()
 
         try:
             lst = set(self.children.keys())
             if remove:
-                for x in lst - set(dircont):
+                for x in lst - set([name for name, isdir in entries]):
                     del self.children[x]
         except:
             self.children = {}
 
-        for name in dircont:
-            npats = accept(name, pats)
-            if npats and npats[0]:
-                accepted = [] in npats[0]
-
-                node = self.make_node([name])
-
-                isdir = os.path.isdir(node.abspath())
-                if accepted:
-                    if isdir:
-                        if dir:
-                            yield node
-                    else:
-                        if src:
-                            yield node
-
-                if getattr(node, 'cache_isdir', None) or isdir:
-                    node.cache_isdir = True
-                    if maxdepth:
-                        for k in node._ant_iter(accept=accept, maxdepth=maxdepth - 1, pats=npats, dir=dir, src=src):
-                            yield k
-        raise StopIteration
+        for name, isdir in entries:
+            nstate = state.next(name)
+            if nstate is None:
+                continue
+
+            node = self.make_node([name])
+            if nstate.groups and ((isdir and dir) or (not isdir and src)):
+                for group in nstate.groups:
+                    results[group].append(node)
+
+            if isdir:
+                node.cache_isdir = True
+                if maxdepth and nstate.recurse:
+                    node._ant_walk(nstate, results, maxdepth - 1, dir, src, remove)
 
     def ant_glob(self, *k, **kw):
         """
@@ -423,61 +471,33 @@ class Node(object):
         :param maxdepth: maximum depth of recursion
         :type maxdepth: int
         """
-
-        src = kw.get('src', True)
-        dir = kw.get('dir', False)
-
-        excl = kw.get('excl', exclude_regs)
         incl = k and k[0] or kw.get('incl', '**')
-
-        def to_pat(s):
-            lst = to_list(s)
-            ret = []
-            for x in lst:
-                x = x.replace('\\', '/').replace('//', '/')
-                if x.endswith('/'):
-                    x += '**'
-                lst2 = x.split('/')
-                accu = []
-                for k in lst2:
-                    if k == '**':
-                        accu.append(k)
-                    else:
-                        k = k.replace('.', '[.]').replace('*','.*').replace('?', '.').replace('+', '\\+')
-                        k = '^%s$' % k
-                        accu.append(re.compile(k))
-                ret.append(accu)
-            return ret
-
-        def filtre(name, nn):
-            ret = []
-            for lst in nn:
-                if not lst:
-                    pass
-                elif lst[0] == '**':
-                    ret.append(lst)
-                    if len(lst) > 1:
-                        if lst[1].match(name):
-                            ret.append(lst[2:])
-                    else:
-                        ret.append([])
-                elif lst[0].match(name):
-                    ret.append(lst[1:])
-            return ret
-
-        def accept(name, pats):
-            nacc = filtre(name, pats[0])
-            nrej = filtre(name, pats[1])
-            if [] in nrej:
-                nacc = []
-            return [nacc, nrej]
-
-        ret = [x for x in self._ant_iter(accept=accept, pats=[to_pat(incl), to_pat(excl)], maxdepth=25, dir=dir, src=src, remove=kw.get('remove', True))]
+        ret = self.ant_glob_many([incl], **kw)[0]
         if kw.get('flat', False):
             return ' '.join([x.path_from(self) for x in ret])
 
         return ret
 
+    def ant_glob_many(self, includes, **kw):
+        """
+        Same as ant_glob for several include patterns at once, in one walk of
+        the tree: return the list of nodes matched by each item of includes
+        (a pattern, or a list of patterns).
+
+        The excl, dir, src, remove and maxdepth arguments are the same as for
+        ant_glob, and apply to all the includes.
+        """
+        src = kw.get('src', True)
+        dir = kw.get('dir', False)
+        excl = kw.get('excl', exclude_regs)
+
+        matcher = AntMatcher(includes, excl)
+        results = [[] for i in includes]
+        if matcher.start is not None:
+            self._ant_walk(matcher.start, results, kw.get('maxdepth', 25), dir, src,
+                           kw.get('remove', True))
+        return results
+
     def find_dir(self, lst):
         """
         search a folder in the filesystem
@@ -635,6 +655,18 @@ def create_base_nodes(source_path=None, build_path=None, run_path=None):
     run_node = root.find_node(run_path)
     return top_node, build_node, run_node
 
+def set_dir_snapshot(snapshot):
+    """Set the bento.core.dir_snapshot.DirSnapshot instance used to look up
+    the nodes below its roots (None to disable it). Return the previous
+    one."""
+    old = Node._snapshot
+    Node._snapshot = snapshot
+    return old
+
+def get_dir_snapshot():
+    """Return the DirSnapshot instance set by set_dir_snapshot, if any."""
+    return Node._snapshot
+
 def find_root(n):
     while n.parent:
         n = n.parent
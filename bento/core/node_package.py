@@ -24,7 +24,8 @@ class NodeDataFiles(object):
         self.target_dir = target_dir
 
 class NodeExtension(object):
-    def __init__(self, name, nodes, top_node, ref_node, sub_directory_node=None, include_dirs=None):
+    def __init__(self, name, nodes, top_node, ref_node, sub_directory_node=None, include_dirs=None,
+                 unity=False, unity_exclude_nodes=None):
         self.name = name
         self.top_node = top_node
         self.ref_node = ref_node
@@ -45,6 +46,12 @@ class NodeExtension(object):
         else:
             self.include_dirs = include_dirs
 
+        self.unity = unity
+        if unity_exclude_nodes is None:
+            self.unity_exclude_nodes = []
+        else:
+            self.unity_exclude_nodes = unity_exclude_nodes
+
     def extension_from(self, from_node=None):
         if len(self.nodes) < 1:
             return Extension(self.name, [])
@@ -70,7 +77,9 @@ class NodeExtension(object):
                     else:
                         return ".".join(full_name_components[len(parent_components):])
                 relative_name = translate_full_name(self.full_name)
-                return Extension(relative_name, sources=[n.path_from(from_node) for n in self.nodes])
+                return Extension(relative_name, sources=[n.path_from(from_node) for n in self.nodes],
+                                 unity=self.unity,
+                                 unity_exclude=[n.path_from(from_node) for n in self.unity_exclude_nodes])
 
 class NodePythonPackage(object):
     def __init__(self, name, nodes, top_node, ref_node, sub_directory_node=None):
@@ -111,10 +120,21 @@ class NodeRepresentation(object):
         self._extra_source_nodes = []
         self._aliased_source_nodes = {}
 
-    def to_node_extension(self, extension, source_node, ref_node):
+    def _glob_sources(self, source_node, compiled):
+        """Resolve the source globs of the given extensions or compiled
+        libraries in one walk of source_node."""
+        patterns = []
+        for c in compiled:
+            patterns.extend(c.sources)
+            patterns.extend(c.unity_exclude)
+        return dict(zip(patterns, source_node.ant_glob_many(patterns)))
+
+    def to_node_extension(self, extension, source_node, ref_node, globbed=None):
+        if globbed is None:
+            globbed = self._glob_sources(source_node, [extension])
         nodes = []
         for s in extension.sources:
-            _nodes = source_node.ant_glob(s)
+            _nodes = globbed[s]
             if len(_nodes) < 1:
                 #name = translate_name(extension.name, ref_node, self.top_or_sub_directory_node)
                 raise IOError("Sources glob entry %r for extension %r did not return any result" \
@@ -132,7 +152,16 @@ class NodeRepresentation(object):
                         raise IOError("include dir %s is invalid" % include_dir)
                     else:
                         include_dirs.append(n)
-        return NodeExtension(extension.name, nodes, self.top_node, ref_node, self.sub_directory_node)
+        unity_exclude_nodes = []
+        for s in extension.unity_exclude:
+            _nodes = globbed[s]
+            if len(_nodes) < 1:
+                raise IOError("UnityExclude glob entry %r for extension %r did not return any result" \
+                              % (s, extension.name))
+            else:
+                unity_exclude_nodes.extend(_nodes)
+        return NodeExtension(extension.name, nodes, self.top_node, ref_node, self.sub_directory_node,
+                             unity=extension.unity, unity_exclude_nodes=unity_exclude_nodes)
 
     def _run_in_subpackage(self, pkg, func):
         for name, sub_pkg in pkg.subpackages.items():
@@ -143,27 +172,33 @@ class NodeRepresentation(object):
             func(sub_pkg, ref_node)
 
     def _update_extensions(self, pkg):
+        globbed = self._glob_sources(self.top_node, pkg.extensions.values())
         for name, extension in pkg.extensions.items():
             ref_node = self.top_node
-            extension = self.to_node_extension(extension, self.top_node, ref_node)
+            extension = self.to_node_extension(extension, self.top_node, ref_node, globbed)
             self._registry["extensions"][extension.full_name] = extension
 
         def _subpackage_extension(sub_package, ref_node):
+            globbed = self._glob_sources(ref_node, sub_package.extensions.values())
             for name, extension in sub_package.extensions.items():
-                extension = self.to_node_extension(extension, ref_node, ref_node)
+                extension = self.to_node_extension(extension, ref_node, ref_node, globbed)
                 full_name = translate_name(name, ref_node, self.top_node)
                 self._registry["extensions"][full_name] = extension
         self._run_in_subpackage(pkg, _subpackage_extension)
 
     def _update_libraries(self, pkg):
+        globbed = self._glob_sources(self.top_node, pkg.compiled_libraries.values())
         for name, compiled_library in pkg.compiled_libraries.items():
             ref_node = self.top_node
-            compiled_library = self.to_node_extension(compiled_library, self.top_node, ref_node)
+            compiled_library = self.to_node_extension(compiled_library, self.top_node, ref_node,
+                                                      globbed)
             self._registry["compiled_libraries"][name] = compiled_library
 
         def _subpackage_compiled_libraries(sub_package, ref_node):
+            globbed = self._glob_sources(ref_node, sub_package.compiled_libraries.values())
             for name, compiled_library in sub_package.compiled_libraries.items():
-                compiled_library = self.to_node_extension(compiled_library, ref_node, ref_node)
+                compiled_library = self.to_node_extension(compiled_library, ref_node, ref_node,
+                                                          globbed)
                 name = translate_name(name, ref_node, self.top_node)
                 self._registry["compiled_libraries"][name] = compiled_library
         self._run_in_subpackage(pkg, _subpackage_compiled_libraries)
@@ -191,16 +226,28 @@ class NodeRepresentation(object):
         self._run_in_subpackage(pkg, _subpackage_resolve_package)
 
     def _update_data_files(self, pkg):
+        # The patterns of all the sections sharing a source directory are
+        # resolved in one walk
+        by_source_dir = {}
         for name, data_section in pkg.data_files.items():
-            ref_node = self.top_node.find_node(data_section.source_dir)
-            nodes = []
-            for f in data_section.files:
-                ns = ref_node.ant_glob(f)
-                if len(ns) < 1:
-                    raise IOError("File/glob %s could not be resolved (data file section %s)" % (f, name))
-                else:
-                    nodes.extend(ns)
-            self._registry["datafiles"][name] = NodeDataFiles(name, nodes, ref_node, data_section.target_dir)
+            by_source_dir.setdefault(data_section.source_dir, []).append((name, data_section))
+
+        for source_dir, sections in by_source_dir.items():
+            ref_node = self.top_node.find_node(source_dir)
+            patterns = []
+            for name, data_section in sections:
+                patterns.extend(data_section.files)
+            globbed = dict(zip(patterns, ref_node.ant_glob_many(patterns)))
+
+            for name, data_section in sections:
+                nodes = []
+                for f in data_section.files:
+                    ns = globbed[f]
+                    if len(ns) < 1:
+                        raise IOError("File/glob %s could not be resolved (data file section %s)" % (f, name))
+                    else:
+                        nodes.extend(ns)
+                self._registry["datafiles"][name] = NodeDataFiles(name, nodes, ref_node, data_section.target_dir)
 
     def _update_py_modules(self, pkg):
         for m in pkg.py_modules:
@@ -211,8 +258,8 @@ class NodeRepresentation(object):
                 self._registry["modules"][m] = n
 
     def _update_extra_sources(self, pkg):
-        for s in pkg.extra_source_files:
-            nodes = self.top_node.ant_glob(s)
+        globbed = self.top_node.ant_glob_many(pkg.extra_source_files)
+        for s, nodes in zip(pkg.extra_source_files, globbed):
             if len(nodes) < 1:
                 warnings.warn("extra source files glob entry %r did not return any result" % (s,))
             self._extra_source_nodes.extend(nodes)
@@ -4,6 +4,15 @@ from copy \
     import \
         deepcopy
 
+from six.moves \
+    import \
+        cPickle
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
 from bento.core.pkg_objects \
     import \
         Extension, DataFiles, Executable, CompiledLibrary
@@ -49,9 +58,55 @@ def _parse_libraries(libraries):
                     CompiledLibrary.from_parse_dict(v)
     return ret
 
-def recurse_subentos(subentos, source_dir):
+class SubentoCache(object):
+    """Cache of parsed sub-bento files.
+
+    data maps the absolute path of each sub-bento file to the md5 checksum of
+    its content and its pickled parsing result, and is meant to be persisted
+    between runs: a sub-bento file is only parsed again when its content
+    changes. Parsing a sub-bento does not depend on user flags."""
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        # absolute paths of the files parsed (i.e. cache misses) so far
+        self.parsed = []
+
+    def parse(self, filename):
+        """Return (kw, subentos) for the given sub-bento file, see
+        raw_to_subpkg_kw."""
+        fid = open(filename, "rb")
+        try:
+            checksum = md5(fid.read()).hexdigest()
+        finally:
+            fid.close()
+
+        entry = self.data.get(filename, None)
+        if entry is not None and entry[0] == checksum:
+            # Unpickling returns a new copy of the cached objects
+            return cPickle.loads(entry[1])
+
+        fid = open(filename)
+        try:
+            content = fid.read()
+        finally:
+            fid.close()
+        ret = raw_to_subpkg_kw(raw_parse(content, filename))
+        self.data[filename] = (checksum, cPickle.dumps(ret, 2))
+        self.parsed.append(filename)
+        return ret
+
+    def prune(self):
+        """Remove entries of files which do not exist anymore."""
+        for filename in list(self.data.keys()):
+            if not os.path.exists(filename):
+                del self.data[filename]
+
+def recurse_subentos(subentos, source_dir, subento_cache=None):
     filenames = []
     subpackages = {}
+    if subento_cache is None:
+        subento_cache = SubentoCache()
 
     # FIXME: this is damn ugly - using nodes would be good here
     def _recurse(subento, cwd):
@@ -60,21 +115,16 @@ def recurse_subentos(subentos, source_dir):
             raise ValueError("%s not found !" % f)
         filenames.append(relpath(f, source_dir))
 
-        fid = open(f)
-        try:
-            key = relpath(f, source_dir)
-            rdir = relpath(os.path.join(cwd, subento), source_dir)
-
-            d = raw_parse(fid.read(), f)
-            kw, subentos = raw_to_subpkg_kw(d)
-            subpackages[key] = SubPackageDescription(rdir, **kw)
-            hooks_as_abspaths = [os.path.normpath(os.path.join(cwd, subento, h)) \
-                                 for h in subpackages[key].hook_files]
-            filenames.extend([relpath(f, source_dir) for f in hooks_as_abspaths])
-            for s in subentos:
-                _recurse(s, os.path.join(cwd, subento))
-        finally:
-            fid.close()
+        key = relpath(f, source_dir)
+        rdir = relpath(os.path.join(cwd, subento), source_dir)
+
+        kw, subentos = subento_cache.parse(os.path.abspath(f))
+        subpackages[key] = SubPackageDescription(rdir, **kw)
+        hooks_as_abspaths = [os.path.normpath(os.path.join(cwd, subento, h)) \
+                             for h in subpackages[key].hook_files]
+        filenames.extend([relpath(f, source_dir) for f in hooks_as_abspaths])
+        for s in subentos:
+            _recurse(s, os.path.join(cwd, subento))
 
     for s in subentos:
         _recurse(s, source_dir)
@@ -111,7 +161,7 @@ def raw_to_subpkg_kw(raw_dict):
 
     return kw, misc_d["subento"]
 
-def raw_to_pkg_kw(raw_dict, user_flags, bento_info=None):
+def raw_to_pkg_kw(raw_dict, user_flags, bento_info=None, subento_cache=None):
     if bento_info is None:
         source_dir = os.getcwd()
     else:
@@ -150,7 +200,8 @@ def raw_to_pkg_kw(raw_dict, user_flags, bento_info=None):
         if len(subentos) > 0 and libraries and libraries["sub_directory"] is not None:
             raise InvalidPackage("You cannot use both Recurse and Library:SubDirectory features !")
         else:
-            subpackages, files = recurse_subentos(subentos, source_dir=source_dir)
+            subpackages, files = recurse_subentos(subentos, source_dir=source_dir,
+                                                  subento_cache=subento_cache)
             kw["subpackages"] = subpackages
     else:
         files = []
@@ -377,6 +428,12 @@ def static_representation(pkg, options={}):
                 indented_list("Sources", ext.sources, 3)
                 if ext.include_dirs:
                     indented_list("IncludeDirs", ext.include_dirs, 3)
+                if ext.unity is True:
+                    r.append(' ' * 2 * indent_level + "Unity: true")
+                elif ext.unity is not False:
+                    r.append(' ' * 2 * indent_level + "Unity: %d" % ext.unity)
+                if ext.unity_exclude:
+                    indented_list("UnityExclude", ext.unity_exclude, 3)
         r.append("")
 
     for name, value in pkg.executables.items():
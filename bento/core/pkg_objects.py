@@ -97,7 +97,7 @@ class Compiled(object):
     def from_parse_dict(cls, d):
         return cls(**d)
 
-    def __init__(self, name, sources, include_dirs=None):
+    def __init__(self, name, sources, include_dirs=None, unity=False, unity_exclude=None):
         self.name = name
         self.base_name = op.basename(name)
         self.sources = [bento.utils.path.normalize_path(p) for p in sources]
@@ -105,6 +105,13 @@ class Compiled(object):
             self.include_dirs = []
         else:
             self.include_dirs = include_dirs
+        # False, True (one unity build unit per parallel job) or a number of
+        # units
+        self.unity = unity
+        if unity_exclude is None:
+            self.unity_exclude = []
+        else:
+            self.unity_exclude = [bento.utils.path.normalize_path(p) for p in unity_exclude]
 
     def __str__(self):
         return "%s(%s, %s, %s)" % (self.__class__.__name__, self.name,
@@ -113,7 +120,9 @@ class Compiled(object):
     def __eq__(self, other):
         return self.name == other.name \
                 and self.sources == other.sources \
-                and self.include_dirs == other.include_dirs
+                and self.include_dirs == other.include_dirs \
+                and self.unity == other.unity \
+                and self.unity_exclude == other.unity_exclude
 
     #def __repr__(self):
     #    return self.__str__()
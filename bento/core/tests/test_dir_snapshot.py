@@ -0,0 +1,81 @@
+import os
+import time
+import shutil
+import tempfile
+
+import os.path as op
+
+from bento.compat.api.moves \
+    import \
+        unittest
+from bento.core.node \
+    import \
+        Node, set_dir_snapshot
+from bento.core.dir_snapshot \
+    import \
+        DirSnapshot
+
+def _make_old(path):
+    old = time.time() - 10
+    os.utime(path, (old, old))
+
+class TestDirSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.top = op.join(self.d, "top")
+        os.makedirs(op.join(self.top, "sub"))
+        for f in [op.join("sub", "a.py"), op.join("sub", "b.py")]:
+            open(op.join(self.top, f), "w").close()
+        for d in [self.top, op.join(self.top, "sub")]:
+            _make_old(d)
+        self.filename = op.join(self.d, "build", "dir_snapshot.bin")
+
+    def tearDown(self):
+        set_dir_snapshot(None)
+        shutil.rmtree(self.d)
+
+    def _snapshot(self):
+        return DirSnapshot(self.filename, roots=[self.top], excludes=[op.join(self.top, "build")])
+
+    def test_lookup(self):
+        snapshot = self._snapshot()
+        sub = op.join(self.top, "sub")
+        self.assertEqual(snapshot.lookup(sub), True)
+        self.assertEqual(snapshot.lookup(op.join(sub, "a.py")), False)
+        self.assertEqual(snapshot.lookup(op.join(sub, "c.py")), None)
+        self.assertEqual(snapshot.lookup(op.join(sub, "a.py", "foo")), None)
+        self.assertEqual(sorted(snapshot.listdir_types(sub)), [("a.py", False), ("b.py", False)])
+
+        self.assertTrue(snapshot.covers(sub))
+        self.assertFalse(snapshot.covers(op.join(self.top, "build", "foo")))
+        self.assertFalse(snapshot.covers(self.top + "2"))
+
+    def test_persistence(self):
+        sub = op.join(self.top, "sub")
+        snapshot = self._snapshot()
+        snapshot.entries(sub)
+        snapshot.close()
+
+        # unchanged directories are not listed again
+        snapshot = self._snapshot()
+        snapshot._data[sub][1]["fake.py"] = False
+        self.assertEqual(snapshot.lookup(op.join(sub, "fake.py")), False)
+
+        # a new entry changes the mtime of its directory
+        snapshot = self._snapshot()
+        time.sleep(0.01)
+        open(op.join(sub, "c.py"), "w").close()
+        self.assertEqual(snapshot.lookup(op.join(sub, "c.py")), False)
+        self.assertEqual(snapshot.lookup(op.join(sub, "fake.py")), None)
+
+    def test_nodes(self):
+        set_dir_snapshot(self._snapshot())
+        top = Node("", None).find_dir(self.top)
+        self.assertTrue(top.find_node(op.join("sub", "a.py")) is not None)
+        self.assertTrue(top.find_node(op.join("sub", "c.py")) is None)
+        self.assertEqual([n.name for n in top.ant_glob("**/*.py")], ["a.py", "b.py"])
+
+        # files written through nodes are seen in the same run
+        top.make_node(op.join("sub", "c.py")).write("")
+        self.assertTrue(top.find_node(op.join("sub", "c.py")) is not None)
+        self.assertEqual(sorted(top.find_node("sub").listdir()), ["a.py", "b.py", "c.py"])
@@ -126,6 +126,38 @@ class TestNodeInsideTemp(unittest.TestCase):
         foobar = self.d_node.find_node("foo.bar")
         self.assertEqual(set(node.abspath() for node in nodes), set([foobar.abspath()]))
 
+    def _make_tree(self, filenames):
+        for filename in filenames:
+            n = self.d_node.make_node(filename)
+            n.parent.mkdir()
+            n.write("")
+
+    def test_ant_recursive(self):
+        self._make_tree(["a.txt", op.join("sub", "b.txt"), op.join("sub", "c.bar"),
+                         op.join("sub", "deep", "d.txt"), op.join(".git", "e.txt")])
+        nodes = self.d_node.ant_glob("**/*.txt")
+        self.assertEqual([n.path_from(self.d_node) for n in nodes],
+                         ["a.txt", op.join("sub", "b.txt"), op.join("sub", "deep", "d.txt")])
+
+        nodes = self.d_node.ant_glob("sub/", dir=True)
+        self.assertEqual([n.path_from(self.d_node) for n in nodes],
+                         [op.join("sub", "b.txt"), op.join("sub", "c.bar"),
+                          op.join("sub", "deep"), op.join("sub", "deep", "d.txt")])
+
+        # excluded directories are not walked into
+        nodes = self.d_node.ant_glob("**/*.txt", excl=["sub", "**/.git"])
+        self.assertEqual([n.path_from(self.d_node) for n in nodes], ["a.txt"])
+
+    def test_ant_glob_many(self):
+        self._make_tree(["a.txt", op.join("sub", "b.txt"), op.join("sub", "c.bar")])
+        nodes = self.d_node.ant_glob_many(["*.txt", "sub/*.txt sub/*.bar", "**/*.bar", "*.none"])
+        self.assertEqual([[n.path_from(self.d_node) for n in ns] for ns in nodes],
+                         [["a.txt"], [op.join("sub", "b.txt"), op.join("sub", "c.bar")],
+                          [op.join("sub", "c.bar")], []])
+        for ns in nodes:
+            for n in ns:
+                self.assertEqual(n.abspath(), self.d_node.ant_glob(n.path_from(self.d_node))[0].abspath())
+
 class TestNodeWithBuild(unittest.TestCase):
     def setUp(self):
         top = os.getcwd()
@@ -66,6 +66,22 @@ Library:
 """
         self._static_representation(bento_info)
 
+    def test_unity_extension(self):
+        bento_info = """\
+Name: foo
+
+Library:
+    Extension: _foo
+        Sources: foo.c, bar.c
+        Unity: 2
+        UnityExclude: bar.c
+"""
+        self._static_representation(bento_info)
+        pkg = PackageDescription.from_string(bento_info)
+        extension = pkg.extensions["_foo"]
+        self.assertEqual(extension.unity, 2)
+        self.assertEqual(extension.unity_exclude, ["bar.c"])
+
     def _static_representation(self, bento_info):
         r_pkg = PackageDescription.from_string(bento_info)
         # We recompute pkg to avoid dealing with stylistic difference between
@@ -90,3 +90,66 @@ class TestTranslation(unittest.TestCase):
 
         self._test_compiled_library(tree, clib, spkg, ["bar/src/clib.c", "bar/src/clib2.c", "bar/src/clib3.f"],
                                     ["bar"])
+
+SUBENTO_INFO = """\
+Library:
+    Packages: %s
+"""
+
+class TestSubentoCache(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.top = create_first_node(self.d)
+        self.top.make_node("bento.info").write("Name: foo\nRecurse: bar, fubar\n")
+        for name in ["bar", "fubar"]:
+            n = self.top.make_node(name).make_node("bento.info")
+            n.parent.mkdir()
+            n.write(SUBENTO_INFO % name)
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def _recurse(self, cache):
+        subpackages, files = package.recurse_subentos(["bar", "fubar"],
+                self.d, cache)
+        return dict((k, v.packages) for k, v in subpackages.items())
+
+    def test_reparse_modified_only(self):
+        cache = package.SubentoCache()
+        r_subpackages = {"bar/bento.info": ["bar"],
+                         "fubar/bento.info": ["fubar"]}
+        self.assertEqual(self._recurse(cache), r_subpackages)
+        self.assertEqual(len(cache.parsed), 2)
+
+        cache = package.SubentoCache(cache.data)
+        self.assertEqual(self._recurse(cache), r_subpackages)
+        self.assertEqual(cache.parsed, [])
+
+        self.top.find_node("fubar/bento.info").write(SUBENTO_INFO % "fubar2")
+        cache = package.SubentoCache(cache.data)
+        r_subpackages["fubar/bento.info"] = ["fubar2"]
+        self.assertEqual(self._recurse(cache), r_subpackages)
+        self.assertEqual(cache.parsed, [self.top.find_node("fubar/bento.info").abspath()])
+
+    def test_non_ascii(self):
+        filename = self.top.find_node("bar/bento.info").abspath()
+        fid = open(filename, "wb")
+        try:
+            fid.write("# caf\xc3\xa9\n".encode("latin-1") + \
+                      (SUBENTO_INFO % "bar").encode("ascii"))
+        finally:
+            fid.close()
+
+        cache = package.SubentoCache()
+        cache.parse(filename)
+        cache = package.SubentoCache(cache.data)
+        cache.parse(filename)
+        self.assertEqual(cache.parsed, [])
+
+    def test_prune(self):
+        cache = package.SubentoCache()
+        self._recurse(cache)
+        n = self.top.find_node("fubar/bento.info")
+        n.delete()
+        cache.prune()
+        self.assertEqual(list(cache.data.keys()), [self.top.find_node("bar/bento.info").abspath()])
@@ -0,0 +1,356 @@
+"""Hand-written tokenizer for the common subset of the bento.info format.
+
+The PLY-based BentoLexer is generic but slow: every token goes through the PLY
+master regex, a rule function and a stack of generators (escaping, indentation,
+post-processing). FastBentoLexer produces exactly the same token stream for
+files without escaped characters, tabs, carriage returns and a few other
+rarely used characters, and falls back to the PLY lexer for anything else
+(including invalid input, so that error messages are unchanged).
+
+Each lexer state of bento.parser.lexer is emulated with the same regular
+expressions, tried in the same order as PLY does.
+"""
+import re
+
+from ply.lex \
+    import \
+        LexToken
+
+from bento.parser.lexer \
+    import \
+        BentoLexer, keywords_dict, keyword_misc, line_keywords, \
+        multilines_keywords, comma_line_keywords, comma_word_keywords, \
+        indent_generator, filter_ws_and_newline, post_process_string, \
+        t_FIELD, t_COMMENT, t_WORD, t_insidemstring_COLON, \
+        t_insidemstring_MULTILINES_STRING, t_insidewcommalistfirstline_WORD, \
+        t_insidewcommalist_WORD, t_insidescommalist_STRING
+from bento.parser.utils \
+    import \
+        count_lines
+
+# Same flags as PLY
+_FLAGS = re.VERBOSE | re.UNICODE | re.MULTILINE
+
+def _rule_re(rule, lookahead=None):
+    pattern = rule.__doc__
+    if lookahead is not None:
+        # Remove the trailing lookahead assertion: the following character is
+        # tested by the tokenizer
+        assert pattern.endswith(lookahead)
+        pattern = pattern[:-len(lookahead)]
+    return re.compile(pattern, _FLAGS)
+
+_FIELD = _rule_re(t_FIELD)
+_COMMENT = _rule_re(t_COMMENT)
+_WORD = _rule_re(t_WORD)
+_COLON_CONTINUED = _rule_re(t_insidemstring_COLON)
+_MULTILINES_STRING = _rule_re(t_insidemstring_MULTILINES_STRING)
+_WORD_FIRSTLINE = _rule_re(t_insidewcommalistfirstline_WORD, "(?=,)")
+_WORD_LIST = _rule_re(t_insidewcommalist_WORD, "(?=,)")
+_STRING_LIST = _rule_re(t_insidescommalist_STRING, "(?=,)")
+_WS = re.compile(r"[ ]+")
+
+# Characters for which the tokenizer defers to PLY: tabs, CRLF line endings,
+# whitespaces other than space and newline, and '^' (which is not handled
+# consistently across states). Escaping backslashes are detected while
+# tokenizing.
+_UNSUPPORTED = re.compile(r"[\t\r^]|[^\S \n]", re.UNICODE)
+
+# Lexer states (see bento.parser.lexer.states)
+_INITIAL = 0
+_INSIDEWORD = 1
+_INSIDESTRING = 2
+_INSIDEMSTRING = 3
+_INSIDEMSTRINGNOTCONTINUED = 4
+_INSIDEWCOMMALISTFIRSTLINE = 5
+_INSIDEWCOMMALIST = 6
+_INSIDESCOMMALISTFIRSTLINE = 7
+_INSIDESCOMMALIST = 8
+
+class _Unsupported(Exception):
+    pass
+
+class _Source(object):
+    # Stand-in for the PLY lexer attached to tokens, used by p_error to
+    # display the faulty line
+    def __init__(self, lexdata):
+        self.lexdata = lexdata
+
+def _field_state(type, data, pos):
+    if type in line_keywords:
+        return _INSIDESTRING
+    elif type in multilines_keywords:
+        if pos == 0 or data[pos-1] == "\n":
+            return _INSIDEMSTRING
+        else:
+            return _INSIDESTRING
+    elif type in comma_line_keywords:
+        return _INSIDESCOMMALISTFIRSTLINE
+    elif type in comma_word_keywords:
+        return _INSIDEWCOMMALISTFIRSTLINE
+    else:
+        return _INSIDEWORD
+
+def tokenize(data):
+    """Return the list of raw tokens of data, as generated by the PLY lexer
+    (i.e. before escaping and indentation processing), or None if data uses
+    features outside the subset handled here."""
+    if _UNSUPPORTED.search(data):
+        return None
+    try:
+        return _tokenize(data)
+    except _Unsupported:
+        return None
+
+def _tokenize(data):
+    source = _Source(data)
+    tokens = []
+    end = len(data)
+    pos = 0
+    lineno = 1
+    state = _INITIAL
+
+    def add(type, value, pos, lineno, lexer=True):
+        tok = LexToken()
+        tok.type = type
+        tok.value = value
+        tok.lineno = lineno
+        tok.lexpos = pos
+        # PLY only attaches the lexer to tokens created by rule functions
+        if lexer:
+            tok.lexer = source
+        tokens.append(tok)
+
+    while pos < end:
+        c = data[pos]
+        if state == _INITIAL or (state == _INSIDEWCOMMALISTFIRSTLINE and c in "#()"):
+            # Rules order: NEWLINE, COLON, FIELD, COMMENT, WORD, WS, LPAR, RPAR
+            if c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+            elif c == ":":
+                add("COLON", c, pos, lineno)
+                pos += 1
+            elif c == " " or c == "#":
+                m = _COMMENT.match(data, pos)
+                if m:
+                    pos = m.end()
+                else:
+                    value = _WS.match(data, pos).group()
+                    add("WS", value, pos, lineno, False)
+                    pos += len(value)
+            elif c == "(":
+                add("LPAR", c, pos, lineno, False)
+                pos += 1
+            elif c == ")":
+                add("RPAR", c, pos, lineno, False)
+                pos += 1
+            else:
+                m = _FIELD.match(data, pos)
+                if m:
+                    value = m.group()
+                    if "\n" in data[m.end():data.index(":", m.end())]:
+                        raise _Unsupported()
+                    type = keywords_dict.get(value, None)
+                    if type is None:
+                        # Unrecognized keyword: let PLY raise the error
+                        raise _Unsupported()
+                    add(type, value, pos, lineno)
+                    state = _field_state(type, data, pos)
+                    pos = m.end()
+                else:
+                    m = _WORD.match(data, pos)
+                    if m is None:
+                        raise _Unsupported()
+                    value = m.group()
+                    add(keyword_misc.get(value, "WORD"), value, pos, lineno)
+                    pos = m.end()
+        elif state == _INSIDEWORD:
+            # Rules order: COMMENT, NEWLINE, COLON, WS, WORD
+            if c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+                state = _INITIAL
+            elif c == ":":
+                add("COLON", c, pos, lineno)
+                pos += 1
+            elif c == " " or c == "#":
+                m = _COMMENT.match(data, pos)
+                if m:
+                    pos = m.end()
+                else:
+                    value = _WS.match(data, pos).group()
+                    add("WS", value, pos, lineno)
+                    pos += len(value)
+            else:
+                m = _WORD.match(data, pos)
+                if m is None:
+                    raise _Unsupported()
+                add("WORD", m.group(), pos, lineno)
+                pos = m.end()
+        elif state == _INSIDESTRING:
+            # Rules order: NEWLINE, COLON, WS, STRING
+            if c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+                state = _INITIAL
+            elif c == ":":
+                add("COLON", c, pos, lineno)
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            else:
+                eol = data.find("\n", pos)
+                if eol < 0:
+                    eol = end
+                value = data[pos:eol]
+                if "\\" in value:
+                    raise _Unsupported()
+                add("STRING", value, pos, lineno)
+                pos = eol
+                state = _INITIAL
+        elif state == _INSIDEMSTRING:
+            # Rules order: COLON, COLON_NO_CONTINUED, WS, NEWLINE,
+            # MULTILINES_STRING
+            if c == ":":
+                add("COLON", c, pos, lineno)
+                if not _COLON_CONTINUED.match(data, pos):
+                    state = _INSIDEMSTRINGNOTCONTINUED
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            elif c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+            else:
+                value = _MULTILINES_STRING.match(data, pos).group()
+                add("MULTILINES_STRING", value, pos, lineno)
+                lineno += count_lines(value) - 1
+                pos += len(value)
+                state = _INITIAL
+        elif state == _INSIDEMSTRINGNOTCONTINUED:
+            # Rules order: NEWLINE, WS, BLOCK_MULTILINES_STRING. Line numbers
+            # are not updated in this state.
+            if c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            else:
+                value = _MULTILINES_STRING.match(data, pos).group()
+                add("BLOCK_MULTILINES_STRING", value, pos, lineno)
+                pos += len(value)
+                state = _INITIAL
+        elif state == _INSIDEWCOMMALISTFIRSTLINE:
+            # Rules order: COLON, WS, WORD, WORD_STOP, NEWLINE, COMMA, then
+            # the INITIAL rules (handled above)
+            if c == ":":
+                add("COLON", c, pos, lineno)
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            elif c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+            elif c == ",":
+                add("COMMA", c, pos, lineno)
+                pos += 1
+            else:
+                m = _WORD_FIRSTLINE.match(data, pos)
+                if m is None:
+                    raise _Unsupported()
+                add("WORD", m.group(), pos, lineno)
+                pos = m.end()
+                if data.startswith(",", pos):
+                    state = _INSIDEWCOMMALIST
+                else:
+                    state = _INITIAL
+        elif state == _INSIDEWCOMMALIST:
+            # Rules order: WORD, WORD_STOP, NEWLINE, WS, COMMA
+            if c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            elif c == ",":
+                add("COMMA", c, pos, lineno)
+                pos += 1
+            else:
+                m = _WORD_LIST.match(data, pos)
+                if m is None:
+                    raise _Unsupported()
+                add("WORD", m.group(), pos, lineno)
+                pos = m.end()
+                if not data.startswith(",", pos):
+                    state = _INITIAL
+        else:
+            # _INSIDESCOMMALISTFIRSTLINE rules order: COLON, WS, STRING,
+            # STRING_STOP, NEWLINE, COMMA
+            # _INSIDESCOMMALIST rules order: WS, STRING, STRING_STOP, NEWLINE,
+            # COMMA
+            if c == ":" and state == _INSIDESCOMMALISTFIRSTLINE:
+                add("COLON", c, pos, lineno)
+                pos += 1
+            elif c == " ":
+                value = _WS.match(data, pos).group()
+                add("WS", value, pos, lineno)
+                pos += len(value)
+            elif c == "\n":
+                add("NEWLINE", c, pos, lineno)
+                lineno += 1
+                pos += 1
+            elif c == ",":
+                add("COMMA", c, pos, lineno)
+                pos += 1
+            else:
+                m = _STRING_LIST.match(data, pos)
+                if m is None:
+                    raise _Unsupported()
+                add("STRING", m.group(), pos, lineno)
+                pos = m.end()
+                if data.startswith(",", pos):
+                    state = _INSIDESCOMMALIST
+                else:
+                    state = _INITIAL
+    return tokens
+
+class FastBentoLexer(BentoLexer):
+    """Lexer with the same interface and output as BentoLexer, using the
+    hand-written tokenizer when possible.
+
+    The PLY lexer is only created when falling back to it."""
+    def __init__(self, optimize=False):
+        self._optimize = optimize
+        self.lexer = None
+        self.fallback = False
+
+    def input(self, data):
+        tokens = tokenize(data)
+        if tokens is None:
+            self.fallback = True
+            if self.lexer is None:
+                super(FastBentoLexer, self).__init__(self._optimize)
+            super(FastBentoLexer, self).input(data)
+        else:
+            self.fallback = False
+            # Without BACKSLASH token, the escaping filters are no-ops
+            stream = indent_generator(iter(tokens))
+            stream = filter_ws_and_newline(stream)
+            stream = post_process_string(stream)
+            self.stream = stream
@@ -32,6 +32,7 @@ word_fields = [
     ("SRCDIR_ID", r"SourceDir"),
     ("SUB_DIRECTORY_ID", r"SubDirectory"),
     ("TARGET_ID", r"TargetDir"),
+    ("UNITY_ID", r"Unity"),
     ("URL_ID", r"Url"),
     ("VERSION_ID", r"Version"),
 ]
@@ -63,6 +64,7 @@ comma_word_fields = [
     ("PACKAGES_ID", r"Packages"),
     ("RECURSE_ID", r"Recurse"),
     ("SOURCES_ID", r"Sources"),
+    ("UNITY_EXCLUDE_ID", r"UnityExclude"),
     ("USE_BACKENDS_ID", r"UseBackends"),
 ]
 
@@ -82,7 +84,9 @@ keyword_misc = dict([
         ('flag', 'FLAG_OP'),
         ('os', 'OS_OP'),
 ])
-keyword_misc_tokens = keyword_misc.values()
+# sorted so that the grammar signature (see bento.parser.parsetab) does not
+# depend on dict ordering
+keyword_misc_tokens = sorted(keyword_misc.values())
 
 tokens = ["COLON", "WS", "WORD", "NEWLINE", "STRING", "MULTILINES_STRING",
           "BLOCK_MULTILINES_STRING", "COMMA", "INDENT", "DEDENT", "LPAR",
@@ -670,9 +674,20 @@ class _Dummy(object):
 
 EOF = _Dummy()
 
+# PLY lexers, built once per process (building one means compiling and
+# validating every rule), and cloned for each BentoLexer
+_PLY_LEXERS = {}
+
+def _ply_lexer(optimize):
+    lexer = _PLY_LEXERS.get(optimize, None)
+    if lexer is None:
+        lexer = lex(reflags=re.UNICODE|re.MULTILINE, debug=0, optimize=optimize, nowarn=0, lextab='lextab')
+        _PLY_LEXERS[optimize] = lexer
+    return lexer.clone()
+
 class BentoLexer(object):
     def __init__(self, optimize=False):
-        self.lexer = lex(reflags=re.UNICODE|re.MULTILINE, debug=0, optimize=optimize, nowarn=0, lextab='lextab')
+        self.lexer = _ply_lexer(optimize)
 
     def input(self, data):
         self.lexer.input(data)
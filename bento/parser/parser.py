@@ -9,7 +9,7 @@ import bento.parser.rules
 
 from bento._config \
     import \
-        _PICKLED_PARSETAB, _OPTIMIZE_LEX, _DEBUG_YACC
+        _PICKLED_PARSETAB, _OPTIMIZE_LEX, _DEBUG_YACC, _FAST_PARSER
 from bento.utils.utils \
     import \
         extract_exception
@@ -19,6 +19,9 @@ from bento.errors \
 from bento.parser.lexer \
     import \
         BentoLexer, tokens as _tokens
+from bento.parser.fast_lexer \
+    import \
+        FastBentoLexer
 
 # XXX: is there a less ugly way to do this ?
 __GLOBALS = globals()
@@ -31,13 +34,16 @@ for k in dir(bento.parser.rules):
 # in the grammar.
 tokens = [t for t in _tokens if not t in ["WS", "NEWLINE", "BACKSLASH", "BLOCK_MULTILINES_STRING"]]
 
-def _has_parser_changed(picklefile):
+# Frozen parser tables, shipped with bento (see write_parsetab)
+_PARSETAB_MODULE = "bento.parser.parsetab"
+
+def _has_parser_changed(picklefile=None, tabmodule=None):
     # FIXME: private function to determine whether ply will need to write to
     # the pickled grammar file. Highly implementation dependent.
-    from ply.yacc import PlyLogger, get_caller_module_dict, ParserReflect, YaccError, LRTable
+    from ply.yacc import PlyLogger, ParserReflect, YaccError, LRTable
     errorlog = PlyLogger(sys.stderr)
 
-    pdict = get_caller_module_dict(2)
+    pdict = globals()
 
     # Collect parser information from the dictionary
     pinfo = ParserReflect(pdict, log=errorlog)
@@ -52,18 +58,62 @@ def _has_parser_changed(picklefile):
     # Read the tables
     try:
         lr = LRTable()
-        read_signature = lr.read_pickle(picklefile)
+        if picklefile:
+            read_signature = lr.read_pickle(picklefile)
+        else:
+            read_signature = lr.read_table(tabmodule)
         return read_signature != signature
     except Exception:
         return True
 
+def write_parsetab():
+    """(Re)generate the frozen parser tables module (bento/parser/parsetab.py).
+
+    This needs to be run whenever the grammar in bento.parser.rules changes."""
+    outputdir = op.relpath(op.dirname(op.abspath(__file__)))
+    ply.yacc.yacc(start="stmt_list", tabmodule=_PARSETAB_MODULE,
+                  outputdir=outputdir, debug=0)
+
 class Parser(object):
-    def __init__(self, lexer=None):
+    def __init__(self, lexer=None, fast=None):
+        """Create a new parser.
+
+        Parameters
+        ----------
+        lexer: object
+            lexer instance. Default to FastBentoLexer in fast mode,
+            BentoLexer otherwise.
+        fast: bool
+            if True, the frozen parser tables from bento.parser.parsetab are
+            used, and nothing is ever written to disk. Otherwise, the tables
+            are pickled into _PICKLED_PARSETAB. Defaults to _FAST_PARSER.
+        """
+        if fast is None:
+            fast = _FAST_PARSER
+        self.fast = fast
+
         if lexer is None:
-            self.lexer = BentoLexer(optimize=_OPTIMIZE_LEX)
+            self.lexer = self._new_lexer()
         else:
             self.lexer = lexer
 
+        if fast:
+            # If the frozen tables are out of date, PLY regenerates them in
+            # memory
+            self.parser = ply.yacc.yacc(start="stmt_list",
+                                    tabmodule=_PARSETAB_MODULE,
+                                    write_tables=0,
+                                    debug=0)
+        else:
+            self.parser = self._pickled_parser()
+
+    def _new_lexer(self):
+        if self.fast:
+            return FastBentoLexer(optimize=_OPTIMIZE_LEX)
+        else:
+            return BentoLexer(optimize=_OPTIMIZE_LEX)
+
+    def _pickled_parser(self):
         picklefile = _PICKLED_PARSETAB
         if not op.exists(picklefile):
             try:
@@ -85,9 +135,9 @@ class Parser(object):
                         raise BentoError("Cannot write new updated grammar to file %r" % _PICKLED_PARSETAB)
                 else:
                     raise
-        self.parser = ply.yacc.yacc(start="stmt_list",
-                                picklefile=picklefile,
-                                debug=_DEBUG_YACC)
+        return ply.yacc.yacc(start="stmt_list",
+                             picklefile=picklefile,
+                             debug=_DEBUG_YACC)
 
     def parse(self, data):
         res = self.parser.parse(data, lexer=self.lexer)
@@ -98,7 +148,7 @@ class Parser(object):
 
     def reset(self):
         # XXX: implements reset for lexer
-        self.lexer = BentoLexer(optimize=_OPTIMIZE_LEX)
+        self.lexer = self._new_lexer()
         # XXX: ply parser.reset method expects those attributes to
         # exist
         self.parser.statestack = []
@@ -401,6 +401,14 @@ def p_extension_include_dirs(p):
     """extension_field_stmt : INCLUDE_DIRS_ID COLON wcomma_list"""
     p[0] = Node("include_dirs", value=p[3].value)
 
+def p_extension_unity(p):
+    """extension_field_stmt : UNITY_ID COLON WORD"""
+    p[0] = Node("unity", value=p[3])
+
+def p_extension_unity_exclude(p):
+    """extension_field_stmt : UNITY_EXCLUDE_ID COLON wcomma_list"""
+    p[0] = Node("unity_exclude", value=p[3].value)
+
 def p_compiled_library_stmt_content(p):
     """compiled_library_stmt : compiled_library_decl INDENT compiled_library_field_stmts DEDENT"""
     p[0] = Node("compiled_library", children=[p[1]])
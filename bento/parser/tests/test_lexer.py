@@ -1,3 +1,5 @@
+import os.path as op
+
 from bento.errors \
     import \
         ParseError
@@ -7,6 +9,9 @@ from bento.utils.utils \
 from bento.parser.lexer \
     import \
         BentoLexer
+from bento.parser.fast_lexer \
+    import \
+        FastBentoLexer
 
 from bento.compat.api.moves import unittest
 
@@ -914,3 +919,87 @@ NName: foo
         except ParseError:
             e = extract_exception()
             self.assertEqual(e.token.lexer.lineno, 5, "Invalid line number: %d" % e.token.lexer.lineno)
+
+# Same tests with the fast lexer
+class TestFastLexerStageOne(TestLexerStageOne):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastLexerStageTwo(TestLexerStageTwo):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastLexerStageThree(TestLexerStageThree):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastLexerStageFour(TestLexerStageFour):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastMultilineString(TestMultilineString):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastLexerStageFive(TestLexerStageFive):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastNewLines(TestNewLines):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastComment(TestComment):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastMeta(TestMeta):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastErrorHandling(TestErrorHandling):
+    def setUp(self):
+        self.lexer = FastBentoLexer()
+
+class TestFastLexer(TestCase):
+    def _tokens(self, lexer, data):
+        lexer.input(data)
+        return [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
+
+    def _test_same_tokens(self, data, fallback=False):
+        lexer = FastBentoLexer()
+        self.assertEqual(self._tokens(lexer, data), self._tokens(BentoLexer(), data))
+        self.assertEqual(lexer.fallback, fallback)
+
+    def test_functionals(self):
+        d = op.join(op.dirname(__file__), "functionals")
+        for f in ["distribute.info", "jinja2.info", "sphinx.info"]:
+            fid = open(op.join(d, f))
+            try:
+                self._test_same_tokens(fid.read())
+            finally:
+                fid.close()
+
+    def test_conditional(self):
+        data = """\
+Name: foo
+# comment
+Library:
+    if not flag(foo):
+        Packages: a, b,
+            c
+    else:
+        Modules:
+            a,
+            b  # comment
+        BuildRequires: a, b c
+"""
+        self._test_same_tokens(data)
+
+    def test_fallback(self):
+        self._test_same_tokens("Name: foo\r\nVersion: 1.0\r\n", fallback=True)
+        self._test_same_tokens("Library:\n    Packages: foo\\ bar, c\n", fallback=True)
+
+        lexer = FastBentoLexer()
+        self.assertRaises(SyntaxError, lambda: self._tokens(lexer, "Library:\n\tPackages: foo\n"))
+        self.assertTrue(lexer.fallback)
@@ -27,6 +27,7 @@ from bento.errors \
         BentoError, ParseError
 
 from bento.parser import parser as parser_module
+import bento.parser.parsetab as parsetab
 
 #old = sys.path[:]
 #try:
@@ -145,7 +146,7 @@ class TestParserCaching(unittest.TestCase):
         try:
             parser_module._PICKLED_PARSETAB = parsetab
             try:
-                parser_module.Parser()
+                parser_module.Parser(fast=False)
                 self.assertTrue(len(self._list_files()) == 0, "Ply created a cached file in CWD")
                 self.fail("Expected an error when creating a parser in read-only dir !")
             except BentoError:
@@ -169,15 +170,40 @@ class TestParserCaching(unittest.TestCase):
         old_parsetab = parser_module._PICKLED_PARSETAB
         try:
             parser_module._PICKLED_PARSETAB = parsetab
-            parser_module.Parser()
+            parser_module.Parser(fast=False)
             self.assertEqual(self._list_files(), [op.abspath(parsetab)])
 
             os.chmod(self.subwdir, stat.S_IREAD | stat.S_IEXEC)
             os.chmod(parsetab, stat.S_IREAD)
 
-            parser_module.Parser()
+            parser_module.Parser(fast=False)
             # This ensures ply did not write another cached file behind our back
             self.assertEqual(self._list_files(), [op.abspath(parsetab)],
                              "Ply created another cached parsetab file !")
         finally:
             parser_module._PICKLED_PARSETAB = old_parsetab
+
+    def test_fast_no_write(self):
+        """Test that the fast parser never writes anything, even with stale
+        frozen tables."""
+        os.makedirs(self.subwdir)
+        os.chdir(self.subwdir)
+        os.chmod(os.getcwd(), stat.S_IREAD | stat.S_IEXEC)
+
+        p = parser_module.Parser(fast=True)
+        p.parse("Name: foo\n")
+        self.assertEqual(self._list_files(), [])
+
+        old_signature = parsetab._lr_signature
+        try:
+            parsetab._lr_signature = "stale"
+            p = parser_module.Parser(fast=True)
+            self.assertEqual(p.parse("Name: foo\n").children[0].value, "foo")
+            self.assertEqual(self._list_files(), [])
+        finally:
+            parsetab._lr_signature = old_signature
+
+    def test_frozen_tables_uptodate(self):
+        """Test that bento/parser/parsetab.py matches the grammar (see
+        bento.parser.parser.write_parsetab)."""
+        self.assertFalse(parser_module._has_parser_changed(tabmodule=parser_module._PARSETAB_MODULE))
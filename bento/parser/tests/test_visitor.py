@@ -240,6 +240,22 @@ Library:
         extension = parse_and_analyse(data)["libraries"]["default"]["extensions"]["_foo"]
         self.assertEqual(extension, r_extension)
 
+    def test_extension_unity(self):
+        data = """\
+Library:
+    Extension: _foo
+        Sources: foo.c, bar.c, fubar.c
+        Unity: %s
+        UnityExclude: bar.c
+"""
+        for value, r_unity in [("true", True), ("false", False), ("2", 2)]:
+            r_extension = {"name": "_foo", "sources": ["foo.c", "bar.c", "fubar.c"],
+                           "unity": r_unity, "unity_exclude": ["bar.c"]}
+            extension = parse_and_analyse(data % value)["libraries"]["default"]["extensions"]["_foo"]
+            self.assertEqual(extension, r_extension)
+
+        self.assertRaises(ValueError, lambda: parse_and_analyse(data % "yes"))
+
     def test_double_sources_extension(self):
         data = """\
 Library:
@@ -26,6 +26,19 @@ def split_newlines(s):
 # XXX: fix the str vs bool issue with flag variables
 _LIT_BOOL = {"true": True, "false": False, True: True, False: False}
 
+def _parse_unity(value, name):
+    # Unity: true (one unit per parallel job), false, or a number of units
+    if value in ("true", "false"):
+        return _LIT_BOOL[value]
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        raise ValueError("invalid Unity value %r for extension %r (expected true, false or a number of units)"
+                         % (value, name))
+    return count
+
 class Dispatcher(object):
     def __init__(self, user_values=None):
         self._d = {
@@ -218,6 +231,12 @@ class Dispatcher(object):
             elif c.type == "include_dirs":
                 _ensure_unique("include_dirs")
                 ret["include_dirs"] = c.value
+            elif c.type == "unity":
+                _ensure_unique("unity")
+                ret["unity"] = _parse_unity(c.value, ret["name"])
+            elif c.type == "unity_exclude":
+                _ensure_unique("unity_exclude")
+                ret["unity_exclude"] = c.value
             else:
                 raise ValueError("Gne ?")
         for c in [node.children[0]] + node.children[1]:
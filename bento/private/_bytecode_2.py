@@ -1,43 +1,36 @@
 import os
 import sys
+import struct
 import marshal
 
 # XXX: implementation details from py_compile
 from py_compile import \
-    wr_long, MAGIC, PyCompileError
+    MAGIC, PyCompileError
 import __builtin__
 
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from StringIO import StringIO
+def pyc_header(mtime, size):
+    """Return the .pyc header for a source file with the given mtime (size
+    is not part of the header in python 2)."""
+    return MAGIC + struct.pack("<L", long(mtime) & 0xFFFFFFFFL)
 
-def bcompile(source):
-    """Return the compiled bytecode from the given filename as a string ."""
+def compile_code(source, dfile=None):
+    """Return the marshalled code object of the given source file, without
+    the .pyc header."""
     f = open(source, 'U')
     try:
-        try:
-            timestamp = long(os.fstat(f.fileno()).st_mtime)
-        except AttributeError:
-            timestamp = long(os.stat(file).st_mtime)
         codestring = f.read()
-        f.close()
-        if codestring and codestring[-1] != '\n':
-            codestring = codestring + '\n'
-        try:
-            codeobject = __builtin__.compile(codestring, source, 'exec')
-        except Exception,err:
-            raise PyCompileError(err.__class__, err.args, source)
-        fc = StringIO()
-        try:
-            fc.write('\0\0\0\0')
-            wr_long(fc, timestamp)
-            fc.write(marshal.dumps(codeobject))
-            fc.flush()
-            fc.seek(0, 0)
-            fc.write(MAGIC)
-            return fc.getvalue()
-        finally:
-            fc.close()
     finally:
         f.close()
+    if codestring and codestring[-1] != '\n':
+        codestring = codestring + '\n'
+    try:
+        codeobject = __builtin__.compile(codestring, dfile or source, 'exec')
+    except Exception, err:
+        raise PyCompileError(err.__class__, err.args, dfile or source)
+    return marshal.dumps(codeobject)
+
+def bcompile(source):
+    """Return the compiled bytecode from the given filename as a string ."""
+    st = os.stat(source)
+    code = compile_code(source)
+    return pyc_header(st.st_mtime, st.st_size) + code
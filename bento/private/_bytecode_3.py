@@ -1,84 +1,45 @@
 import os
 import sys
 import builtins
-import io
+import struct
 import py_compile
 import marshal
+import tokenize
 
-if sys.version_info[:2] < (3, 2):
-    def _bcompile(file, cfile=None, dfile=None, doraise=False):
-        encoding = py_compile.read_encoding(file, "utf-8")
-        f = open(file, 'U', encoding=encoding)
-        try:
-            timestamp = int(os.fstat(f.fileno()).st_mtime)
-        except AttributeError:
-            timestamp = int(os.stat(file).st_mtime)
-        codestring = f.read()
-        f.close()
-        if codestring and codestring[-1] != '\n':
-            codestring = codestring + '\n'
-        try:
-            codeobject = builtins.compile(codestring, dfile or file,'exec')
-        except Exception as err:
-            py_exc = py_compile.PyCompileError(err.__class__, err, dfile or file)
-            if doraise:
-                raise py_exc
-            else:
-                sys.stderr.write(py_exc.msg + '\n')
-                return
-        fc = io.BytesIO()
-        try:
-            fc.write(b'\0\0\0\0')
-            py_compile.wr_long(fc, timestamp)
-            marshal.dump(codeobject, fc)
-            fc.flush()
-            fc.seek(0, 0)
-            fc.write(py_compile.MAGIC)
-            return fc.getvalue()
-        finally:
-            fc.close()
+if sys.version_info[:2] >= (3, 4):
+    from importlib.util import MAGIC_NUMBER
 else:
-    import tokenize
     import imp
-    import errno
-    def _bcompile(file, cfile=None, dfile=None, doraise=False, optimize=-1):
-        with tokenize.open(file) as f:
-            try:
-                timestamp = int(os.fstat(f.fileno()).st_mtime)
-            except AttributeError:
-                timestamp = int(os.stat(file).st_mtime)
-            codestring = f.read()
-        try:
-            codeobject = builtins.compile(codestring, dfile or file, 'exec',
-                                          optimize=optimize)
-        except Exception as err:
-            py_exc = py_compile.PyCompileError(err.__class__, err, dfile or file)
-            if doraise:
-                raise py_exc
-            else:
-                sys.stderr.write(py_exc.msg + '\n')
-                return
-        if cfile is None:
-            if optimize >= 0:
-                cfile = imp.cache_from_source(file, debug_override=not optimize)
-            else:
-                cfile = imp.cache_from_source(file)
-        try:
-            os.makedirs(os.path.dirname(cfile))
-        except OSError as error:
-            if error.errno != errno.EEXIST:
-                raise
-        fc = io.BytesIO()
-        try:
-            fc.write(b'\0\0\0\0')
-            py_compile.wr_long(fc, timestamp)
-            marshal.dump(codeobject, fc)
-            fc.flush()
-            fc.seek(0, 0)
-            fc.write(py_compile.MAGIC)
-            return fc.getvalue()
-        finally:
-            fc.close()
+    MAGIC_NUMBER = imp.get_magic()
+
+def pyc_header(mtime, size):
+    """Return the .pyc header for a source file with the given mtime and
+    size."""
+    if sys.version_info[:2] >= (3, 7):
+        # PEP 552: flags set to 0 for timestamp-based pyc
+        return MAGIC_NUMBER + struct.pack("<3L", 0, int(mtime) & 0xFFFFFFFF,
+                                          size & 0xFFFFFFFF)
+    elif sys.version_info[:2] >= (3, 3):
+        return MAGIC_NUMBER + struct.pack("<2L", int(mtime) & 0xFFFFFFFF,
+                                          size & 0xFFFFFFFF)
+    else:
+        return MAGIC_NUMBER + struct.pack("<L", int(mtime) & 0xFFFFFFFF)
+
+def compile_code(file, dfile=None):
+    """Return the marshalled code object of the given source file, without
+    the .pyc header."""
+    with tokenize.open(file) as f:
+        codestring = f.read()
+    if codestring and codestring[-1] != '\n':
+        codestring = codestring + '\n'
+    try:
+        codeobject = builtins.compile(codestring, dfile or file, 'exec')
+    except Exception as err:
+        raise py_compile.PyCompileError(err.__class__, err, dfile or file)
+    return marshal.dumps(codeobject)
 
 def bcompile(file):
-    return _bcompile(file, doraise=True)
+    """Return the compiled bytecode from the given filename as bytes."""
+    st = os.stat(file)
+    code = compile_code(file)
+    return pyc_header(st.st_mtime, st.st_size) + code
@@ -17,5 +17,13 @@ HOOK_DUMP = ".hooks.pck"
 
 CONFIG_CACHE = ".config.pck"
 BUILD_CACHE = ".build.pck"
+# Snapshot of the task graph of the last successful build
+GRAPH_CACHE = ".graph.pck"
 
-_OUTPUT = sys.stdout
+class _Stdout(object):
+    """sys.stdout at the time of use, even if it is replaced after yaku was
+    imported (e.g. by the bentomaker daemon, for each of its requests)."""
+    def __getattr__(self, name):
+        return getattr(sys.stdout, name)
+
+_OUTPUT = _Stdout()
@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import multiprocessing
 
 try:
     from hashlib import md5
@@ -21,7 +22,7 @@ from yaku.errors \
         UnknownTask
 from yaku.utils \
     import \
-        ensure_dir
+        ensure_dir, extract_exception
 
 def create_file(conf, code, prefix="", suffix=""):
     filename = "%s%s%s" % (prefix, md5(code.encode()).hexdigest(), suffix)
@@ -73,11 +74,135 @@ def write_log(conf, log, tasks, code, succeed, explanation):
     log.write(s.getvalue())
     log.write("\n")
 
+def write_cached_log(conf, log, code, succeed):
+    for line in code.splitlines():
+        log.write("  |%s\n" % line)
+
+    if succeed:
+        log.write("---> Succeeded (cached result) !\n")
+    else:
+        log.write("---> Failure (cached result) !\n")
+    log.write("\n")
+
 def create_conf_blddir(conf, name, body):
-    dirname = ".conf-%s-%s" % (name, hash(name+body))
+    # hash() is randomized between processes on python 3
+    dirname = ".conf-%s-%s" % (name, md5((name + body).encode()).hexdigest())
     bld_root = os.path.join(conf.bld_root.abspath(), dirname)
     if not os.path.exists(bld_root):
         os.makedirs(bld_root)
     bld_root = conf.bld_root.make_node(dirname)
     old_root = conf.bld_root
     return old_root, bld_root
+
+# (conf, checks) of the batch run by run_checks, inherited by the worker
+# processes
+_BATCH = None
+
+class _LogBuffer(object):
+    """In-memory stand-in for the configuration log of a worker."""
+    def __init__(self, name):
+        self.name = name
+        self._buf = StringIO()
+
+    def write(self, data):
+        self._buf.write(data)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return self._buf.getvalue()
+
+def _run_check(i):
+    # Executed in a worker process: the output, log and results of the check
+    # are sent back to the parent, which merges them in order
+    import yaku.context
+
+    conf, checks = _BATCH
+    output, log = StringIO(), _LogBuffer(getattr(conf.log, "name", None))
+    old_output, old_log = yaku.context._OUTPUT, conf.log
+    yaku.context._OUTPUT, conf.log = output, log
+
+    n_results = len(conf.conf_results)
+    cmd_cache, stdout_cache = conf._cmd_cache, conf._stdout_cache
+    conf._cmd_cache, conf._stdout_cache = {}, {}
+    conf_cache = getattr(conf, "conf_cache", None)
+    if conf_cache is not None:
+        conf_cache.hits = conf_cache.misses = 0
+    try:
+        try:
+            ret, error = checks[i](conf), None
+        except Exception:
+            ret, error = None, extract_exception()
+        new_results = conf.conf_results[n_results:]
+        new_caches = (conf._cmd_cache, conf._stdout_cache)
+        del conf.conf_results[n_results:]
+    finally:
+        yaku.context._OUTPUT, conf.log = old_output, old_log
+        cmd_cache.update(conf._cmd_cache)
+        stdout_cache.update(conf._stdout_cache)
+        conf._cmd_cache, conf._stdout_cache = cmd_cache, stdout_cache
+
+    if conf_cache is not None:
+        stats = (conf_cache.hits, conf_cache.misses)
+    else:
+        stats = (0, 0)
+    return ret, error, output.getvalue(), log.getvalue(), new_results, new_caches, stats
+
+def _fork_pool(jobs):
+    if hasattr(multiprocessing, "get_context"):
+        return multiprocessing.get_context("fork").Pool(jobs)
+    else:
+        return multiprocessing.Pool(jobs)
+
+def run_checks(conf, checks, jobs=None):
+    """Run a batch of independent checks concurrently.
+
+    Each check is a callable taking the configure context as its only argument
+    (e.g. lambda conf: check_header(conf, "stdio.h")). Checks are run in jobs
+    worker processes (conf.jobs or the number of CPUs if None). Messages,
+    config.log entries and configuration results of each check are merged
+    in the order of the checks, so the outcome does not depend on the number
+    of jobs. Checks run in a batch must not modify the configure environment.
+
+    Returns the list of the checks return values."""
+    global _BATCH
+    import yaku.context
+
+    if jobs is None:
+        jobs = getattr(conf, "jobs", None)
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(checks))
+    if jobs < 2 or sys.platform == "win32":
+        return [check(conf) for check in checks]
+
+    # Avoid duplicating buffered output in the workers
+    yaku.context._OUTPUT.flush()
+    conf.log.flush()
+    _BATCH = (conf, checks)
+    try:
+        pool = _fork_pool(jobs)
+        try:
+            results = pool.map(_run_check, range(len(checks)), 1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _BATCH = None
+
+    conf_cache = getattr(conf, "conf_cache", None)
+    ret = []
+    for value, error, output, log, new_results, new_caches, stats in results:
+        yaku.context._OUTPUT.write(output)
+        conf.log.write(log)
+        if error is not None:
+            raise error
+        conf.conf_results.extend(new_results)
+        conf._cmd_cache.update(new_caches[0])
+        conf._stdout_cache.update(new_caches[1])
+        if conf_cache is not None:
+            conf_cache.hits += stats[0]
+            conf_cache.misses += stats[1]
+        ret.append(value)
+    return ret
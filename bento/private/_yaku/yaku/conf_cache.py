@@ -0,0 +1,153 @@
+"""Persistent cache of configuration check results, shared between build
+directories.
+
+A check is addressed by its test code, the builder method used to run it, the
+environment used to build the command lines, and a fingerprint of the
+toolchain: resolved path, size and mtime of every program referred to by the
+environment (compiler, linker...), and the environment variables which
+influence compilers. A check matching an entry is answered from the cache
+instead of running the compiler.
+"""
+import os
+import re
+import shutil
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+from yaku.utils \
+    import \
+        rename, find_program, is_string
+
+# Variables of the yaku environment which do not influence check results
+IGNORED_VARS = ["ENV", "BLDDIR", "VERBOSE"]
+# Variables of the process environment which influence check results, besides
+# PATH (programs are fingerprinted through their resolved path)
+TOOLCHAIN_ENV_VARS = ["CPATH", "C_INCLUDE_PATH", "CPLUS_INCLUDE_PATH",
+                      "LIBRARY_PATH", "LD_LIBRARY_PATH", "INCLUDE", "LIB",
+                      "SDKROOT", "MACOSX_DEPLOYMENT_TARGET"]
+
+def _program_fingerprint(program, path, programs):
+    key = (program, path)
+    if not key in programs:
+        if os.path.isabs(program):
+            filename = program
+        else:
+            filename = find_program(program, path.split(os.pathsep))
+        if filename is not None and os.path.isfile(filename):
+            st = os.stat(filename)
+            programs[key] = "%s:%d:%r" % (filename, st.st_size, st.st_mtime)
+        else:
+            programs[key] = None
+    return programs[key]
+
+def toolchain_fingerprint(env, programs=None):
+    """Return a digest of the given yaku environment and of the programs it
+    refers to.
+
+    programs is an optional dict used to memoize the lookup of programs."""
+    if programs is None:
+        programs = {}
+    process_env = env.get("ENV", os.environ)
+    path = process_env.get("PATH", "")
+
+    # Paths inside the build directory (include and library directories
+    # of the checks) are made relative to it
+    blddir = env.get("BLDDIR", None)
+    if blddir:
+        blddir_re = re.compile(r"(%s|%s)(?=[\\/'\"]|$)" % \
+                (re.escape(os.path.abspath(blddir)), re.escape(blddir)))
+    else:
+        blddir_re = None
+
+    m = md5()
+    for k in sorted(env.keys()):
+        if k in IGNORED_VARS:
+            continue
+        v = env[k]
+        value = "%s=%r\n" % (k, v)
+        if blddir_re is not None:
+            value = blddir_re.sub("$BLDDIR", value)
+        m.update(value.encode("utf-8"))
+        if isinstance(v, list) and v and is_string(v[0]) and not v[0].startswith("-"):
+            fingerprint = _program_fingerprint(v[0], path, programs)
+            if fingerprint is not None:
+                m.update(("%s\n" % fingerprint).encode("utf-8"))
+    for k in TOOLCHAIN_ENV_VARS:
+        m.update(("%s=%r\n" % (k, process_env.get(k, None))).encode("utf-8"))
+    return m.hexdigest()
+
+class ConfCache(object):
+    """Cache of configuration check results.
+
+    Parameters
+    ----------
+    path: str
+        cache directory (created if needed)"""
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        # statistics for this run only
+        self.hits = 0
+        self.misses = 0
+        # {(program, PATH): fingerprint}, programs are only looked up once
+        self._programs = {}
+
+    def toolchain_fingerprint(self, env):
+        """Return a digest of the given yaku environment and of the programs
+        it refers to."""
+        return toolchain_fingerprint(env, self._programs)
+
+    def check_key(self, kind, code, env):
+        m = md5()
+        m.update(kind.encode("utf-8"))
+        m.update(code.encode("utf-8"))
+        m.update(self.toolchain_fingerprint(env).encode("utf-8"))
+        return m.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Return the cached result (True or False) for the given key, or None
+        if unknown."""
+        try:
+            fid = open(self._entry_path(key))
+            try:
+                ret = fid.read() == "1"
+            finally:
+                fid.close()
+        except IOError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ret
+
+    def set(self, key, succeed):
+        entry = self._entry_path(key)
+        if not os.path.exists(os.path.dirname(entry)):
+            os.makedirs(os.path.dirname(entry))
+        tmp = "%s.%d.tmp" % (entry, os.getpid())
+        fid = open(tmp, "w")
+        try:
+            if succeed:
+                fid.write("1")
+            else:
+                fid.write("0")
+        finally:
+            fid.close()
+        rename(tmp, entry)
+
+    def clear(self):
+        """Remove every cached result."""
+        for f in os.listdir(self.path):
+            d = os.path.join(self.path, f)
+            if os.path.isdir(d):
+                shutil.rmtree(d, True)
+        self._programs = {}
+
+    def summary(self):
+        return "%d hits, %d misses" % (self.hits, self.misses)
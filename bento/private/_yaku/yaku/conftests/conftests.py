@@ -287,11 +287,7 @@ int main (void)
                                   "result": ret, "func": func})
     return ret
 
-def check_funcs_at_once(conf, funcs, libs=None):
-    if libs is None:
-        libs = []
-
-    header = []
+def _funcs_code(funcs):
     header = ['#ifdef __cplusplus']
     header.append('extern "C" {')
     header.append('#endif')
@@ -314,7 +310,7 @@ def check_funcs_at_once(conf, funcs, libs=None):
         tmp.append("\t%s();" % f)
     tmp = "\n".join(tmp)
 
-    body = r"""
+    return r"""
 %(include)s
 %(header)s
 
@@ -325,20 +321,94 @@ int main (void)
 }
 """ % {"tmp": tmp, "include": "", "header": header}
 
-    conf.start_message("Checking for functions %s" % ", ".join(funcs))
+def _try_program_with_libs(conf, name, code, libs):
     old_lib = copy.deepcopy(conf.env["LIBS"])
     try:
         for lib in libs[::-1]:
             conf.env["LIBS"].insert(0, lib)
-        ret = conf.builders["ctasks"].try_program("check_func", body, None)
-        if ret:
-            conf.end_message("yes")
-        else:
-            conf.end_message("no !")
+        return conf.builders["ctasks"].try_program(name, code, None)
     finally:
         conf.env["LIBS"] = old_lib
 
+def check_funcs_at_once(conf, funcs, libs=None):
+    if libs is None:
+        libs = []
+
+    body = _funcs_code(funcs)
+
+    conf.start_message("Checking for functions %s" % ", ".join(funcs))
+    ret = _try_program_with_libs(conf, "check_func", body, libs)
+    if ret:
+        conf.end_message("yes")
+    else:
+        conf.end_message("no !")
+
     for func in funcs:
         conf.conf_results.append({"type": "func", "value": func,
                                   "result": ret})
     return ret
+
+def _bisect(items, try_items):
+    """Find which items pass try_items, trying them all at once first and
+    bisecting the failing sets, so that n items of which k fail cost
+    O(k log(n)) calls instead of n."""
+    results = {}
+    def _check(items):
+        if try_items(items):
+            for item in items:
+                results[item] = True
+        elif len(items) == 1:
+            results[items[0]] = False
+        else:
+            middle = len(items) // 2
+            _check(items[:middle])
+            _check(items[middle:])
+    if items:
+        _check(list(items))
+    return results
+
+def _end_batch_message(conf, items, results):
+    missing = [item for item in items if not results[item]]
+    if missing:
+        conf.end_message("no for %s !" % ", ".join(missing))
+    else:
+        conf.end_message("yes")
+
+def check_headers(conf, headers):
+    """Check for several headers at once.
+
+    All the headers are included in a single compilation, in the given order.
+    If it fails, the list is bisected to find the missing headers. Returns a
+    dict header -> availability, and records one result per header, as
+    check_header would."""
+    def try_headers(headers):
+        code = "\n".join(["#include <%s>" % header for header in headers])
+        return conf.builders["ctasks"].try_compile("check_header", code + "\n", None)
+
+    conf.start_message("Checking for headers %s" % ", ".join(headers))
+    ret = _bisect(headers, try_headers)
+    _end_batch_message(conf, headers, ret)
+    for header in headers:
+        conf.conf_results.append({"type": "header", "value": header,
+                                  "result": ret[header]})
+    return ret
+
+def check_funcs(conf, funcs, libs=None):
+    """Check for several functions at once.
+
+    Like check_funcs_at_once, but the list is bisected when the link fails to
+    find the missing functions. Returns a dict function -> availability, and
+    records one result per function, as check_func would."""
+    if libs is None:
+        libs = []
+
+    def try_funcs(funcs):
+        return _try_program_with_libs(conf, "check_func", _funcs_code(funcs), libs)
+
+    conf.start_message("Checking for functions %s" % ", ".join(funcs))
+    ret = _bisect(funcs, try_funcs)
+    _end_batch_message(conf, funcs, ret)
+    for func in funcs:
+        conf.conf_results.append({"type": "func", "value": func,
+                                  "result": ret[func]})
+    return ret
@@ -18,6 +18,12 @@ from yaku._config \
 from yaku.environment \
     import \
         Environment
+from yaku.signature \
+    import \
+        NodeSignatures
+from yaku.include_scanner \
+    import \
+        IncludeScanner
 from yaku.tools \
     import \
         import_tools
@@ -75,6 +81,11 @@ class ConfigureContext(object):
         self._configured = {}
         self._stdout_cache = {}
         self._cmd_cache = {}
+        # Optional yaku.conf_cache.ConfCache instance, shared between build
+        # directories
+        self.conf_cache = None
+        # Number of workers for yaku.conf.run_checks (None: number of CPUs)
+        self.jobs = None
 
         self.src_root = None
         self.bld_root = None
@@ -217,6 +228,23 @@ class BuildContext(object):
         self.cache = {}
         self.builders = {}
         self.tasks = []
+        # Optional yaku.task_cache.TaskCache instance, shared between build
+        # directories
+        self.task_cache = None
+        # Optional yaku.trace.Tracer instance, recording the task execution
+        self.tracer = None
+        # Optional yaku.jobserver.JobServerClient instance, limiting the
+        # number of commands run concurrently
+        self.jobserver = None
+        # Number of parallel jobs of the build, used to size the unity build
+        # units (see yaku.unity)
+        self.jobs = 1
+        # task uid -> duration (in seconds) of its last run
+        self.task_durations = {}
+        # task uid -> peak resident set size (in bytes) of its last run
+        self.task_memory = {}
+        self.node_sigs = NodeSignatures()
+        self.include_scanner = IncludeScanner()
 
     def load(self, src_path=None, build_path="build"):
         if src_path is None:
@@ -254,6 +282,14 @@ class BuildContext(object):
             fid = open(build_cache.abspath(), "rb")
             try:
                 self.cache = load(fid)
+                try:
+                    self.node_sigs.data = load(fid)
+                    self.include_scanner.data = load(fid)
+                    self.task_durations = load(fid)
+                    self.task_memory = load(fid)
+                except EOFError:
+                    # build cache written by an older version
+                    pass
             finally:
                 fid.close()
         else:
@@ -273,15 +309,23 @@ class BuildContext(object):
         tmp_fid = open(build_cache.abspath() + ".tmp", "wb")
         try:
             dump(self.cache, tmp_fid)
+            dump(self.node_sigs.data, tmp_fid)
+            dump(self.include_scanner.data, tmp_fid)
+            dump(self.task_durations, tmp_fid)
+            dump(self.task_memory, tmp_fid)
         finally:
             tmp_fid.close()
         rename(build_cache.abspath() + ".tmp", build_cache.abspath())
 
+        if self.task_cache is not None:
+            self.task_cache.save()
+
     def set_stdout_cache(self, task, stdout):
         pass
 
-    def set_cmd_cache(self, task, stdout):
-        pass
+    def set_cmd_cache(self, task, cmd):
+        if self.tracer is not None:
+            self.tracer.set_command(task, cmd)
 
 def myopen(filename, mode="r"):
     if "w" in mode:
@@ -0,0 +1,115 @@
+"""Snapshot of the task graph of the last successful build.
+
+Creating the tasks of a build (resolving nodes, setting up environments) and
+checking each of them is wasted work when nothing changed. After a successful
+build, save_graph records every file the tasks depend on, but which no task
+produces (inputs and dependencies, including the scanned ones), and every
+output, each with its stat tuple. The snapshot is keyed by a digest computed
+by the caller from whatever the graph was expanded from (package description,
+build configuration...), and may carry some caller data.
+
+load_graph returns this data when the key is the same and none of the
+recorded files changed: the build is then a no-op, and does not need to
+create any task.
+"""
+import os
+import sys
+import time
+
+if sys.version_info[0] < 3:
+    from cPickle \
+        import \
+            load, dump
+else:
+    from pickle \
+        import \
+            load, dump
+
+from yaku._config \
+    import \
+        GRAPH_CACHE
+from yaku.signature \
+    import \
+        stat_key, RACY_DELAY
+from yaku.utils \
+    import \
+        rename
+
+def _graph_files(tasks):
+    """Return the sorted absolute paths of the leaves and of the outputs of
+    the tasks."""
+    outputs = set()
+    for t in tasks:
+        outputs.update(t.outputs)
+
+    leaves = set()
+    for t in tasks:
+        deps = t.inputs + t.deps
+        if t.scan is not None:
+            deps = deps + t.scan(t)
+        for n in deps:
+            if not n in outputs:
+                leaves.add(n.abspath())
+    return sorted(leaves), sorted([n.abspath() for n in outputs])
+
+def save_graph(ctx, key, data=None):
+    """Record the files of the tasks of ctx, together with key and data."""
+    leaves, outputs = _graph_files(ctx.tasks)
+    # recently modified leaves are checked by a full build next time (see
+    # yaku.signature.stat_key)
+    racy = (time.time() - RACY_DELAY) * 1e9
+
+    stats = []
+    for files, is_leaf in [(leaves, True), (outputs, False)]:
+        for f in files:
+            try:
+                st = stat_key(os.stat(f))
+            except OSError:
+                # a file vanished during the build
+                st = None
+            if st is None or (is_leaf and st[0] >= racy):
+                clear_graph(ctx.bld_root.abspath())
+                return
+            stats.append((f, st))
+
+    path = os.path.join(ctx.bld_root.abspath(), GRAPH_CACHE)
+    fid = open(path + ".tmp", "wb")
+    try:
+        dump({"key": key, "files": stats, "data": data}, fid)
+    finally:
+        fid.close()
+    rename(path + ".tmp", path)
+
+def load_graph(build_path, key):
+    """Return the data saved with the graph of the build directory
+    build_path, or None if there is no graph for this key, or if one of its
+    files changed."""
+    path = os.path.join(build_path, GRAPH_CACHE)
+    try:
+        fid = open(path, "rb")
+    except IOError:
+        return None
+    try:
+        try:
+            graph = load(fid)
+        except Exception:
+            # truncated or from an incompatible version
+            return None
+    finally:
+        fid.close()
+
+    if graph.get("key", None) != key:
+        return None
+    for f, old_key in graph["files"]:
+        try:
+            if stat_key(os.stat(f)) != old_key:
+                return None
+        except OSError:
+            return None
+    return graph["data"]
+
+def clear_graph(build_path):
+    """Remove the graph of the build directory build_path, if any."""
+    path = os.path.join(build_path, GRAPH_CACHE)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,152 @@
+"""Scanner of C/C++ header dependencies.
+
+The include directives of each file are memoized, keyed on the file stat
+(see yaku.signature), and stored in the build directory together with the
+build cache, so that a no-op build does not read any header. Includes are
+resolved against the include directories of the task generator, restricted
+to the source and build trees: system headers are not tracked.
+"""
+import os
+import re
+import time
+import threading
+
+from yaku.signature \
+    import \
+        stat_key, RACY_DELAY
+from yaku.utils \
+    import \
+        re_inc, re_nl, re_cpp, repl, extract_include
+from yaku.unity \
+    import \
+        all_sources
+
+def parse_includes(code):
+    """Return the list of (kind, name) include directives of some C code,
+    kind being '<' or '"'."""
+    code = re_nl.sub('', code)
+    code = re_cpp.sub(repl, code)
+    ret = []
+    for m in re.finditer(re_inc, code):
+        kind, name = extract_include(m.group(3), None)
+        if kind is not None:
+            ret.append((kind, name))
+    return ret
+
+def _read_code(path):
+    fid = open(path, "rb")
+    try:
+        # latin-1 never fails, and include directives are ascii
+        return fid.read().decode("latin-1")
+    finally:
+        fid.close()
+
+def include_dir_nodes(task_gen, cpppaths):
+    """Return the include directories of a task generator as nodes: the
+    directories of the sources first, then cpppaths. Directories outside the
+    source and build trees are ignored."""
+    srcnode = task_gen.bld.src_root
+    root = srcnode
+    while root.parent:
+        root = root.parent
+
+    dirs = []
+    for s in all_sources(task_gen):
+        if not s.parent in dirs:
+            dirs.append(s.parent)
+    for p in cpppaths:
+        if os.path.isabs(p):
+            node = root.find_node(p)
+        else:
+            node = srcnode.find_node(p)
+        if node is not None and not node in dirs and \
+                (node.is_src() or node.is_bld()):
+            dirs.append(node)
+    return dirs
+
+class IncludeScanner(object):
+    """Memoized, thread-safe scanner of header dependencies.
+
+    data maps the absolute path of every scanned file to its stat key and
+    its list of include directives, and is meant to be persisted between
+    runs. Include resolutions are only memoized for the current run."""
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def includes(self, node):
+        path = node.abspath()
+        key = stat_key(os.stat(path))
+        entry = self.data.get(path, None)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        includes = parse_includes(_read_code(path))
+        self._lock.acquire()
+        try:
+            if key[0] < (time.time() - RACY_DELAY) * 1e9:
+                self.data[path] = (key, includes)
+            else:
+                self.data.pop(path, None)
+        finally:
+            self._lock.release()
+        return includes
+
+    def resolve(self, local_dir, kind, name, include_dirs):
+        if kind == '"':
+            dirs = (local_dir,) + include_dirs
+        else:
+            dirs = include_dirs
+        rkey = (dirs, name)
+        try:
+            return self._resolved[rkey]
+        except KeyError:
+            pass
+
+        # find_node modifies the node tree, which is not thread-safe
+        self._lock.acquire()
+        try:
+            found = None
+            for d in dirs:
+                node = d.find_node(name)
+                if node is not None and os.path.isfile(node.abspath()):
+                    found = node
+                    break
+            self._resolved[rkey] = found
+            return found
+        finally:
+            self._lock.release()
+
+    def scan(self, node, include_dirs):
+        """Return the list of headers node depends on, recursively."""
+        include_dirs = tuple(include_dirs)
+        seen = set([node])
+        found = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for kind, name in self.includes(n):
+                dep = self.resolve(n.parent, kind, name, include_dirs)
+                if dep is not None and not dep in seen:
+                    seen.add(dep)
+                    found.append(dep)
+                    stack.append(dep)
+        return found
+
+def scan_includes(task):
+    """Scan function for compiled tasks (see _Task.scan).
+
+    Uses the scanner of the build context, and returns no dependency for
+    contexts without scanner (e.g. configure)."""
+    gen = getattr(task, "gen", None)
+    scanner = getattr(getattr(gen, "bld", None), "include_scanner", None)
+    include_dirs = getattr(gen, "include_dirs", None)
+    if scanner is None or include_dirs is None:
+        return []
+    deps = []
+    for node in task.inputs:
+        deps.extend(scanner.scan(node, include_dirs))
+    return deps
@@ -0,0 +1,168 @@
+"""Support of the GNU make jobserver protocol.
+
+A jobserver limits the number of commands run concurrently by a tree of
+processes (make, yaku, compilers...): every process may run one command for
+free (the implicit token), and must read one token from the jobserver pipe
+before running each additional command, and write it back once the command is
+finished.
+
+When yaku runs under a jobserver (found in MAKEFLAGS), it acts as a client.
+Otherwise, a parallel build may create its own jobserver, which is advertised
+in the MAKEFLAGS of the commands it runs (inheriting the pipe), so that
+sub-builds and compilers (e.g. gcc -flto=jobserver) share the same job
+slots.
+"""
+import os
+import re
+import sys
+import errno
+import select
+import threading
+
+from yaku.utils \
+    import \
+        get_exception
+
+_AUTH_RE = re.compile(r"--jobserver-(?:auth|fds)=(\S+)")
+
+class JobServerClient(object):
+    """Client side of a jobserver.
+
+    Parameters
+    ----------
+    read_fd, write_fd: int
+        file descriptors of the jobserver pipe (the same descriptor for a
+        fifo)
+    auth: str
+        value of the --jobserver-auth argument advertised to children
+    fds: tuple
+        file descriptors which must be inherited by the children (empty for a
+        fifo)"""
+    def __init__(self, read_fd, write_fd, auth, fds=()):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.auth = auth
+        self.fds = fds
+
+        self._lock = threading.Lock()
+        self._implicit_free = True
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Return a client for the jobserver advertised in MAKEFLAGS, or None
+        if there is none, or if it cannot be used (e.g. file descriptors not
+        inherited)."""
+        if environ is None:
+            environ = os.environ
+        # The last occurence wins, as for make
+        auths = _AUTH_RE.findall(environ.get("MAKEFLAGS", ""))
+        if not auths:
+            return None
+        auth = auths[-1]
+
+        if auth.startswith("fifo:"):
+            try:
+                fd = os.open(auth[len("fifo:"):], os.O_RDWR)
+            except OSError:
+                return None
+            return cls(fd, fd, auth)
+
+        try:
+            read_fd, write_fd = [int(fd) for fd in auth.split(",")]
+        except ValueError:
+            # e.g. semaphore of make on windows
+            return None
+        try:
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+        except OSError:
+            return None
+        return cls(read_fd, write_fd, auth, (read_fd, write_fd))
+
+    def acquire(self):
+        """Acquire a job slot, blocking until one is available. Return the
+        token to give back to release."""
+        self._lock.acquire()
+        try:
+            if self._implicit_free:
+                self._implicit_free = False
+                return None
+        finally:
+            self._lock.release()
+
+        while True:
+            try:
+                token = os.read(self.read_fd, 1)
+                if not token:
+                    raise IOError("jobserver pipe closed")
+                return token
+            except OSError:
+                e = get_exception()
+                # the pipe may have been put in non-blocking mode by make
+                if e.errno not in (errno.EAGAIN, errno.EINTR):
+                    raise
+            select.select([self.read_fd], [], [])
+
+    def release(self, token):
+        """Release a job slot acquired with acquire."""
+        if token is None:
+            self._lock.acquire()
+            try:
+                self._implicit_free = True
+            finally:
+                self._lock.release()
+        else:
+            os.write(self.write_fd, token)
+
+    def export(self, env=None):
+        """Return a copy of env (os.environ if None) advertising the
+        jobserver in MAKEFLAGS."""
+        if env is None:
+            env = os.environ
+        env = dict(env)
+        flags = _AUTH_RE.sub("", env.get("MAKEFLAGS", "")).split()
+        if not [f for f in flags if f.startswith("-j")]:
+            flags.append("-j")
+        flags.append("--jobserver-auth=%s" % self.auth)
+        env["MAKEFLAGS"] = " ".join(flags)
+        return env
+
+    def close(self):
+        # the fifo was opened by this process, contrary to inherited pipes
+        if not self.fds:
+            os.close(self.read_fd)
+
+class JobServer(JobServerClient):
+    """Jobserver of jobs slots, implemented with a pipe (POSIX only).
+
+    The pipe is advertised as --jobserver-auth=R,W, which is understood by
+    every version of make supporting --jobserver-auth and by gcc
+    -flto=jobserver, contrary to the fifo form of make 4.4. The creating
+    process is a client of its own jobserver, owning the implicit token."""
+    def __init__(self, jobs):
+        read_fd, write_fd = os.pipe()
+        super(JobServer, self).__init__(read_fd, write_fd,
+                "%d,%d" % (read_fd, write_fd), (read_fd, write_fd))
+        self.jobs = jobs
+        os.write(write_fd, "+".encode("ascii") * (jobs - 1))
+
+    def export(self, env=None):
+        env = super(JobServer, self).export(env)
+        flags = [f for f in env["MAKEFLAGS"].split() if not f.startswith("-j")]
+        env["MAKEFLAGS"] = " ".join(["-j%d" % self.jobs] + flags)
+        return env
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+def get_jobserver(jobs, environ=None):
+    """Return the jobserver to use for a build of jobs parallel jobs: the one
+    of the parent process if any, a new one if jobs > 1 and the platform
+    supports it, and None otherwise."""
+    client = JobServerClient.from_environ(environ)
+    if client is not None:
+        return client
+    if jobs > 1 and sys.platform != "win32":
+        return JobServer(jobs)
+    return None
@@ -1,3 +1,4 @@
+import os
 import sys
 import traceback
 if sys.version_info[0] < 3:
@@ -6,14 +7,24 @@ else:
     import queue
 import threading
 
+import heapq
+
 from yaku.task_manager \
     import \
-        run_task, order_tasks, TaskManager
+        order_tasks, TaskManager, TaskGraph, DurationEstimator, \
+        estimate_task_memory
+from yaku.trace \
+    import \
+        run_traced_task
 from yaku.utils \
     import \
-        get_exception
+        get_exception, available_memory
 import yaku.errors
 
+# Interval (in seconds) between two checks of the load average when it is too
+# high to start new tasks
+LOAD_POLL_INTERVAL = 0.5
+
 def run_tasks(ctx, tasks=None):
     if tasks is None:
         tasks = ctx.tasks
@@ -26,7 +37,7 @@ def run_tasks_parallel(ctx, tasks=None, maxjobs=1):
     if tasks is None:
         tasks = ctx.tasks
     task_manager = TaskManager(tasks)
-    r = ParallelRunner(ctx, task_manager, maxjobs)
+    r = DependencyRunner(ctx, task_manager, maxjobs)
     r.start()
     r.run()
 
@@ -43,7 +54,7 @@ class SerialRunner(object):
         grp = self.task_manager.next_set()
         while grp:
             for task in grp:
-                run_task(self.ctx, task)
+                run_traced_task(self.ctx, task)
             grp = self.task_manager.next_set()
 
 class ParallelRunner(object):
@@ -58,13 +69,13 @@ class ParallelRunner(object):
         self.stop = False
 
     def start(self):
-        def _worker():
+        def _worker(worker):
             # XXX: this whole thing is an hack - find a better way to
             # notify task execution failure to all worker threads
             while not self.stop:
                 task = self.worker_queue.get()
                 try:
-                    run_task(self.ctx, task)
+                    run_traced_task(self.ctx, task, worker)
                 except yaku.errors.TaskRunFailure:
                     e = get_exception()
                     self.failure_lock.acquire()
@@ -86,8 +97,8 @@ class ParallelRunner(object):
                 self.worker_queue.task_done()
 
         for i in range(self.njobs):
-            t = threading.Thread(target=_worker)
-            t.setDaemon(True)
+            t = threading.Thread(target=_worker, args=(i,))
+            t.daemon = True
             t.start()
 
     def run(self):
@@ -109,3 +120,153 @@ class ParallelRunner(object):
                 raise yaku.errors.TaskRunFailure(cmd, msg)
 
             grp = self.task_manager.next_set()
+
+class DependencyRunner(object):
+    """Parallel runner driven by the producer/consumer graph of the tasks.
+
+    Contrary to ParallelRunner, there is no barrier between groups of tasks: a
+    task is handed to the workers as soon as the tasks producing its inputs
+    have been run. Once a task fails, no new task is started, and the failure
+    is raised after the tasks already running are finished.
+
+    Ready tasks are started by decreasing length of the longest chain of
+    tasks they start, estimated from the durations recorded in previous
+    builds (ctx.task_durations), so that long tasks on the critical path do
+    not end up last.
+
+    A task is not started if the peak memory of the running tasks, as
+    recorded in previous builds (ctx.task_memory), would exceed memory_limit
+    (in bytes, defaults to the memory available when the runner starts), or
+    while the load average is above max_load (if given). One task is always
+    allowed to run."""
+    def __init__(self, ctx, task_manager, maxjobs=1, memory_limit=None, max_load=None):
+        self.njobs = maxjobs
+        self.task_manager = task_manager
+        self.ctx = ctx
+
+        self.memory_limit = memory_limit
+        self.max_load = max_load
+        self.memory = None
+        self.memory_used = 0
+
+        self.condition = threading.Condition()
+        # heap of (-priority, insertion count, task)
+        self.ready = []
+        self.priorities = None
+        self._count = 0
+        self.graph = None
+        self.running = 0
+        self.remaining = 0
+        self.failed = None
+        self.stop = False
+
+    def start(self):
+        self.graph = TaskGraph(self.task_manager.tasks)
+        estimator = DurationEstimator(getattr(self.ctx, "task_durations", {}),
+                                      self.graph.tasks)
+        self.priorities = self.graph.remaining_paths(estimator)
+        self.memory = estimate_task_memory(getattr(self.ctx, "task_memory", {}),
+                                           self.graph.tasks)
+        if self.memory_limit is None:
+            self.memory_limit = available_memory()
+        self.remaining = len(self.graph.tasks)
+        self._push_ready(self.graph.ready_tasks())
+
+        for i in range(self.njobs):
+            t = threading.Thread(target=self._worker, args=(i,))
+            t.daemon = True
+            t.start()
+
+    def _push_ready(self, tasks):
+        for task in tasks:
+            heapq.heappush(self.ready, (-self.priorities[task], self._count, task))
+            self._count += 1
+
+    def _fits_in_memory(self, task):
+        if self.running == 0 or self.memory_limit is None:
+            return True
+        return self.memory_used + self.memory[task] <= self.memory_limit
+
+    def _overloaded(self):
+        if self.running == 0 or self.max_load is None or not hasattr(os, "getloadavg"):
+            return False
+        return os.getloadavg()[0] >= self.max_load
+
+    def _next_task(self):
+        self.condition.acquire()
+        try:
+            while not self.stop:
+                if self.ready and self._fits_in_memory(self.ready[0][2]):
+                    if not self._overloaded():
+                        break
+                    # changes of the load average are not notified
+                    self.condition.wait(LOAD_POLL_INTERVAL)
+                else:
+                    self.condition.wait()
+            if self.stop:
+                return None
+            task = heapq.heappop(self.ready)[2]
+            self.running += 1
+            self.memory_used += self.memory[task]
+            return task
+        finally:
+            self.condition.release()
+
+    def _task_finished(self, task, failed):
+        self.condition.acquire()
+        try:
+            self.running -= 1
+            self.memory_used -= self.memory[task]
+            self.remaining -= 1
+            if failed:
+                if self.failed is None:
+                    self.failed = task
+                self.stop = True
+            elif not self.stop:
+                self._push_ready(self.graph.task_done(task))
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def _worker(self, worker):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            failed = False
+            try:
+                run_traced_task(self.ctx, task, worker)
+            except yaku.errors.TaskRunFailure:
+                e = get_exception()
+                task.error_msg = e.explain
+                task.error_cmd = e.cmd
+                failed = True
+            except Exception:
+                exc_type, exc_value, tb = sys.exc_info()
+                lines = traceback.format_exception(exc_type, exc_value, tb)
+                task.error_msg = "".join(lines)
+                task.error_cmd = []
+                failed = True
+            self._task_finished(task, failed)
+
+    def run(self):
+        self.condition.acquire()
+        try:
+            try:
+                while self.remaining > 0 and not self.stop:
+                    if not self.ready and self.running == 0:
+                        raise Exception("circular order constraint detected %r" % \
+                                        [t for t in self.graph.tasks if self.graph.pending[t] > 0])
+                    self.condition.wait()
+                # Let the running tasks finish cleanly on failure
+                while self.running > 0:
+                    self.condition.wait()
+            finally:
+                self.stop = True
+                self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+        if self.failed is not None:
+            task = self.failed
+            raise yaku.errors.TaskRunFailure(task.error_cmd, task.error_msg)
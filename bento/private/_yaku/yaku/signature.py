@@ -0,0 +1,54 @@
+"""Content signature of nodes, with a stat-based fast path.
+
+Hashing the content of every input and dependency of every task dominates
+no-op builds. NodeSignatures remembers the content hash of each file
+together with its (mtime, size, inode) stat tuple, and only rehashes a file
+when its stat tuple changed.
+"""
+import os
+import time
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+# Files modified less than RACY_DELAY seconds before being hashed are not
+# remembered: a second modification within the timestamp granularity of the
+# filesystem would otherwise go unnoticed.
+RACY_DELAY = 2
+
+def content_hash(node):
+    return md5(node.read(flags="rb")).digest()
+
+def stat_key(st):
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1e9)
+    return (mtime, st.st_size, st.st_ino)
+
+class NodeSignatures(object):
+    """Cache of node content hashes, indexed by absolute path.
+
+    If use_stat is False, every file is rehashed (full-content mode), but the
+    resulting signatures are the same as in stat mode, so switching mode does
+    not trigger any rebuild."""
+    def __init__(self, data=None, use_stat=True):
+        if data is None:
+            data = {}
+        self.data = data
+        self.use_stat = use_stat
+
+    def get(self, node):
+        path = node.abspath()
+        key = stat_key(os.stat(path))
+        if self.use_stat:
+            entry = self.data.get(path, None)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+
+        h = content_hash(node)
+        if key[0] < (time.time() - RACY_DELAY) * 1e9:
+            self.data[path] = (key, h)
+        else:
+            self.data.pop(path, None)
+        return h
@@ -20,10 +20,13 @@ from yaku.pprint \
         pprint
 from yaku.utils \
     import \
-        get_exception, is_string, function_code
+        get_exception, is_string, function_code, communicate_with_rusage
 from yaku.errors \
     import \
         TaskRunFailure, WindowsError
+from yaku.signature \
+    import \
+        content_hash
 
 # TODO:
 #   - factory for tasks, so that tasks can be created from strings
@@ -72,6 +75,8 @@ class _Task(object):
         self.scan = None
         self.disable_output = False
         self.log = None
+        # peak resident set size (bytes) of the commands run by the task
+        self.max_rss = None
 
     # UID and signature functionalities
     #----------------------------------
@@ -104,10 +109,18 @@ class _Task(object):
         return m.digest()
 
     def _sig_explicit_deps(self, m):
-        for s in self.inputs + self.deps:
-            #if os.path.exists(s):
-            #    m.update(open(s).read())
-            m.update(s.read(flags="rb"))
+        # The build context keeps the content hash of the nodes, to avoid
+        # rehashing files which did not change since the last build
+        bld = getattr(getattr(self, "gen", None), "bld", None)
+        node_sigs = getattr(bld, "node_sigs", None)
+        deps = self.deps
+        if self.scan is not None:
+            deps = deps + self.scan(self)
+        for s in self.inputs + deps:
+            if node_sigs is None:
+                m.update(content_hash(s))
+            else:
+                m.update(node_sigs.get(s))
         return m.digest()
         
     # execution
@@ -128,27 +141,42 @@ class _Task(object):
                 pprint('GREEN', "%-16s%s" % (self.name.upper(), " ".join([i.bldpath() for i in self.inputs])))
 
         self.gen.bld.set_cmd_cache(self, cmd)
+        # Hold a job slot while the command runs, and share the jobserver
+        # with the command
+        jobserver = getattr(self.gen.bld, "jobserver", None)
+        if jobserver is not None:
+            kw["env"] = jobserver.export(env)
+            if jobserver.fds and sys.version_info[0] >= 3:
+                kw["pass_fds"] = jobserver.fds
+            token = jobserver.acquire()
         try:
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT, cwd=cwd, **kw)
-            stdout = p.communicate()[0].decode("utf-8")
-            if p.returncode:
-                raise TaskRunFailure(cmd, stdout)
-            if sys.version_info >= (3,):
-                stdout = stdout
-            else:
-                stdout = stdout.encode("utf-8")
-            if self.disable_output:
-                self.log.write(stdout)
-            else:
-                sys.stderr.write(stdout)
-            self.gen.bld.set_stdout_cache(self, stdout)
-        except OSError:
-            e = get_exception()
-            raise TaskRunFailure(cmd, str(e))
-        except WindowsError:
-            e = get_exception()
-            raise TaskRunFailure(cmd, str(e))
+            try:
+                p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT, cwd=cwd, **kw)
+                stdout, max_rss = communicate_with_rusage(p)
+                stdout = stdout.decode("utf-8")
+                if max_rss is not None and max_rss > (self.max_rss or 0):
+                    self.max_rss = max_rss
+                if p.returncode:
+                    raise TaskRunFailure(cmd, stdout)
+                if sys.version_info >= (3,):
+                    stdout = stdout
+                else:
+                    stdout = stdout.encode("utf-8")
+                if self.disable_output:
+                    self.log.write(stdout)
+                else:
+                    sys.stderr.write(stdout)
+                self.gen.bld.set_stdout_cache(self, stdout)
+            except OSError:
+                e = get_exception()
+                raise TaskRunFailure(cmd, str(e))
+            except WindowsError:
+                e = get_exception()
+                raise TaskRunFailure(cmd, str(e))
+        finally:
+            if jobserver is not None:
+                jobserver.release(token)
 
     def __repr__(self):
         ins = ",".join([i.name for i in self.inputs])
@@ -0,0 +1,227 @@
+"""Persistent cache of task outputs, shared between build directories.
+
+Entries are addressed by the task signature (content of the inputs and
+dependencies, environment variables used to build the command line and task
+function), the task class, and the input/output paths relative to the
+source/build roots. A task matching an entry gets its outputs restored from
+the cache instead of being run, which works across fresh checkouts or new
+build directories, as long as the relative layout is the same.
+"""
+import os
+import shutil
+import errno
+import threading
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+from yaku.environment \
+    import \
+        Environment
+from yaku.utils \
+    import \
+        rename, get_exception
+
+STATS_FILE = "stats.py"
+# Default size cap in bytes
+DEFAULT_MAX_SIZE = 1024 ** 3
+# After eviction, the cache is shrunk down to this fraction of the cap, so
+# that the cleanup is not triggered for every new entry
+EVICTION_RATIO = 0.9
+
+def _relative_path(node):
+    if node.is_bld():
+        return "bld:%s" % node.bldpath()
+    else:
+        return "src:%s" % node.srcpath()
+
+def _entry_size(path):
+    size = 0
+    for f in os.listdir(path):
+        size += os.stat(os.path.join(path, f)).st_size
+    return size
+
+class TaskCache(object):
+    """Content-addressed cache of task outputs.
+
+    Parameters
+    ----------
+    path: str
+        cache directory (created if needed)
+    max_size: int
+        size cap in bytes. Least recently used entries are evicted when the
+        cache grows beyond it.
+    use_hardlinks: bool
+        if True, outputs are restored through hard links instead of copies
+        when possible (same filesystem)."""
+    def __init__(self, path, max_size=None, use_hardlinks=False):
+        self.path = os.path.abspath(path)
+        if max_size is None:
+            max_size = DEFAULT_MAX_SIZE
+        self.max_size = max_size
+        self.use_hardlinks = use_hardlinks
+        # tasks are fetched and stored from the worker threads of the runner
+        self._lock = threading.Lock()
+        self._tmp_count = 0
+
+        # statistics for this run only
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        # cumulative statistics, shared with every build using this cache
+        self.stats = Environment(hits=0, misses=0, size=0)
+        stats_file = os.path.join(self.path, STATS_FILE)
+        if os.path.exists(stats_file):
+            self.stats.load(stats_file)
+
+    def task_key(self, task):
+        m = md5()
+        m.update(task.signature())
+        m.update(task.__class__.__name__.encode())
+        for n in task.inputs + task.outputs:
+            m.update(_relative_path(n).encode())
+        return m.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _count(self, name):
+        self._lock.acquire()
+        try:
+            setattr(self, name, getattr(self, name) + 1)
+            self.stats[name] += 1
+        finally:
+            self._lock.release()
+
+    def fetch(self, task):
+        """Restore the outputs of task from the cache.
+
+        Returns True if the outputs were found in the cache, False
+        otherwise."""
+        entry = self._entry_path(self.task_key(task))
+        if not os.path.isdir(entry):
+            self._count("misses")
+            return False
+
+        try:
+            for i, o in enumerate(task.outputs):
+                _restore(os.path.join(entry, str(i)), o.abspath(), self.use_hardlinks)
+            # mtime of the entry is used for LRU eviction
+            os.utime(entry, None)
+        except (IOError, OSError):
+            # entry evicted by a concurrent build
+            self._count("misses")
+            return False
+        self._count("hits")
+        return True
+
+    def store(self, task):
+        """Store the outputs of a successfully run task into the cache."""
+        entry = self._entry_path(self.task_key(task))
+        if os.path.isdir(entry):
+            return
+
+        self._lock.acquire()
+        try:
+            # unique between the processes and threads storing entries
+            self._tmp_count += 1
+            tmp = "%s.%d.%d.tmp" % (entry, os.getpid(), self._tmp_count)
+        finally:
+            self._lock.release()
+        if not os.path.exists(tmp):
+            os.makedirs(tmp)
+        try:
+            for i, o in enumerate(task.outputs):
+                shutil.copy2(o.abspath(), os.path.join(tmp, str(i)))
+            size = _entry_size(tmp)
+            os.rename(tmp, entry)
+        except (IOError, OSError):
+            shutil.rmtree(tmp, True)
+            return
+
+        self._lock.acquire()
+        try:
+            self.stored += 1
+            self.stats["size"] += size
+            if self.stats["size"] > self.max_size:
+                self._evict(keep=entry)
+        finally:
+            self._lock.release()
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache size goes
+        below the size cap. The entry keep is never removed."""
+        self._lock.acquire()
+        try:
+            self._evict(keep)
+        finally:
+            self._lock.release()
+
+    def _evict(self, keep):
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.path):
+            d = os.path.join(self.path, prefix)
+            if not os.path.isdir(d):
+                continue
+            for key in os.listdir(d):
+                if key.endswith(".tmp"):
+                    # entry being stored
+                    continue
+                entry = os.path.join(d, key)
+                try:
+                    size = _entry_size(entry)
+                    mtime = os.stat(entry).st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, size, entry))
+                total += size
+        entries.sort()
+
+        target = self.max_size * EVICTION_RATIO
+        for mtime, size, entry in entries:
+            if total <= target:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, True)
+            total -= size
+        self.stats["size"] = total
+
+    def save(self):
+        """Write the cumulative statistics in the cache directory."""
+        self.stats.store(os.path.join(self.path, STATS_FILE))
+
+    def summary(self):
+        return "%d hits, %d misses, %d stored (cache size: %.1f MB)" % \
+                (self.hits, self.misses, self.stored, self.stats["size"] / 1024. ** 2)
+
+def _restore(source, target, use_hardlinks):
+    if os.path.exists(target):
+        os.remove(target)
+    if use_hardlinks:
+        try:
+            os.link(source, target)
+            return
+        except (OSError, AttributeError):
+            pass
+    tmp = target + ".tmp"
+    shutil.copy2(source, tmp)
+    rename(tmp, target)
+
+def unshare_outputs(task):
+    """Remove the outputs of task which are hard links (most likely to a
+    cache entry), so that running the task does not modify the cache in
+    place."""
+    for o in task.outputs:
+        try:
+            if os.stat(o.abspath()).st_nlink > 1:
+                os.remove(o.abspath())
+        except OSError:
+            e = get_exception()
+            if e.errno != errno.ENOENT:
+                raise
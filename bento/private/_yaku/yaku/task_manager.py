@@ -1,8 +1,12 @@
 import os
+import time
 
 from yaku.environment \
     import \
         Environment
+from yaku.task_cache \
+    import \
+        unshare_outputs
 
 RULES_REGISTRY = {}
 FILES_REGISTRY = {}
@@ -38,89 +42,217 @@ def set_file_hook(ctx, source, hook):
 class NoHookException(Exception):
     pass
 
-def hash_task(t):
+def _task_exts(t):
     # FIXME: ext_in and ext_out should not be computed from the files
     ext_in = [os.path.splitext(s.name)[1] for s in t.inputs]
     ext_out = [os.path.splitext(s.name)[1] for s in t.outputs]
+    return ext_in, ext_out
+
+def _hash_exts(t, ext_in, ext_out):
     tup = tuple(ext_in + ext_out + t.before + t.after)
     return hash((t.__class__.__name__, tup))
 
+def hash_task(t):
+    ext_in, ext_out = _task_exts(t)
+    return _hash_exts(t, ext_in, ext_out)
+
+def _cyclic_nodes(successors):
+    """Return the set of nodes which are part of a cycle of the graph given as
+    a dict node -> list of successors (iterative Tarjan algorithm)."""
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    cyclic = set()
+    counter = [0]
+
+    def _visit(root):
+        index[root] = lowlink[root] = counter[0]
+        counter[0] += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, [])))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if not child in index:
+                    index[child] = lowlink[child] = counter[0]
+                    counter[0] += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors.get(child, []))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        n = stack.pop()
+                        on_stack.remove(n)
+                        component.append(n)
+                        if n == node:
+                            break
+                    if len(component) > 1 or node in successors.get(node, []):
+                        cyclic.update(component)
+
+    for node in successors:
+        if not node in index:
+            _visit(node)
+    return cyclic
+
 class TaskManager(object):
+    """Sort tasks in sets of tasks which can be run concurrently.
+
+    Tasks are grouped by class and by extension of their inputs/outputs. A
+    group is run after every group producing an extension it consumes, and
+    after every group whose class is in the 'before' attribute of its class.
+    Groups and extensions are indexed, so that ordering is linear in the
+    number of tasks and order constraints."""
     def __init__(self, tasks):
         self.tasks = tasks
 
         self.groups = {}
         self.order = {}
+        # exts[group] = (input extensions, output extensions) of the group
+        self._exts = {}
+        # pending[node] = number of nodes which must be run before node
+        self._pending = {}
+        self._ready = []
         self.make_groups()
         self.make_order()
 
     def set_order(self, a, b):
         if not a in self.order:
             self.order[a] = set()
-        self.order[a].add(b)
+        if not b in self.order[a]:
+            self.order[a].add(b)
+            self._pending[b] += 1
 
     def make_order(self):
         keys = list(self.groups.keys())
-        max = len(keys)
-        for i in range(max):
-            t1 = self.groups[keys[i]][0]
-            for j in range(i + 1, max):
-                t2 = self.groups[keys[j]][0]
-
-                if t2.__class__.__name__ in t1.before:
-                    self.set_order(keys[j], keys[i])
-                elif t1.__class__.__name__ in t2.before:
-                    self.set_order(keys[i], keys[j])
+        position = dict([(k, i) for i, k in enumerate(keys)])
+
+        by_class = {}
+        producers = {}
+        consumers = {}
+        for k in keys:
+            by_class.setdefault(self.groups[k][0].__class__.__name__, []).append(k)
+            ext_in, ext_out = self._exts[k]
+            for ext in ext_in:
+                consumers.setdefault(ext, set()).add(k)
+            for ext in ext_out:
+                producers.setdefault(ext, set()).add(k)
+
+        # Pairs of groups ordered by comparing them, as the class order
+        # overrides the extension order, and a pair of groups consuming each
+        # other's extensions is ordered in one direction only
+        pairs = set()
+        def _add_pair(a, b):
+            if a != b:
+                if position[a] < position[b]:
+                    pairs.add((a, b))
                 else:
-                    # add the constraints based on the comparisons
-                    val = self.compare_exts(t1, t2)
-                    if val > 0:
-                        self.set_order(keys[i], keys[j])
-                    elif val < 0:
-                        self.set_order(keys[j], keys[i])
+                    pairs.add((b, a))
+        special = set()
+        for k in keys:
+            for name in self.groups[k][0].before:
+                for other in by_class.get(name, []):
+                    if other != k:
+                        special.add(k)
+                        special.add(other)
+                    _add_pair(k, other)
+
+        # Groups and extensions in a producer/consumer cycle
+        successors = {}
+        for k in keys:
+            successors[k] = [("ext", ext) for ext in self._exts[k][1]]
+        for ext, ext_consumers in consumers.items():
+            if ext in producers:
+                successors[("ext", ext)] = list(ext_consumers)
+        special.update(_cyclic_nodes(successors))
+
+        for ext, ext_consumers in consumers.items():
+            ext_producers = producers.get(ext, None)
+            if not ext_producers:
+                continue
+            if ("ext", ext) in special or special.intersection(ext_producers) \
+                    or special.intersection(ext_consumers):
+                for p in ext_producers:
+                    for c in ext_consumers:
+                        _add_pair(c, p)
+            else:
+                # The extension is a node of the graph, so that the number of
+                # constraints is linear in the number of producers and
+                # consumers
+                node = ("ext", ext)
+                self._pending[node] = 0
+                for p in ext_producers:
+                    self.set_order(p, node)
+                for c in ext_consumers:
+                    self.set_order(node, c)
+
+        for k1, k2 in pairs:
+            t1 = self.groups[k1][0]
+            t2 = self.groups[k2][0]
+            if t2.__class__.__name__ in t1.before:
+                self.set_order(k2, k1)
+            elif t1.__class__.__name__ in t2.before:
+                self.set_order(k1, k2)
+            else:
+                # add the constraints based on the extensions
+                in1, out1 = self._exts[k1]
+                in2, out2 = self._exts[k2]
+                if set(in1).intersection(out2):
+                    self.set_order(k2, k1)
+                elif set(in2).intersection(out1):
+                    self.set_order(k1, k2)
+
+        self._position = position
+        self._ready = [k for k in keys if self._pending[k] == 0]
 
     def make_groups(self):
         # XXX: we assume tasks with same input/output suffix can run
         # in // (naive emulation of csr-like scheduler in waf)
         groups = self.groups
         for t in self.tasks:
-            h = hash_task(t)
+            ext_in, ext_out = _task_exts(t)
+            h = _hash_exts(t, ext_in, ext_out)
             if h in groups:
                 groups[h].append(t)
             else:
                 groups[h] = [t]
+                self._exts[h] = (ext_in, ext_out)
+                self._pending[h] = 0
 
     def next_set(self):
-        keys = self.groups.keys()
-
-        unconnected = []
-        remainder = []
-
-        for u in keys:
-            for k in self.order.values():
-                if u in k:
-                    remainder.append(u)
-                    break
-            else:
-                unconnected.append(u)
+        ready = sorted(self._ready, key=lambda k: self._position[k])
+        self._ready = []
 
         toreturn = []
-        for y in unconnected:
-            toreturn.extend(self.groups[y])
-
-        # remove stuff only after
-        for y in unconnected:
-                try:
-                    self.order.__delitem__(y)
-                except KeyError:
-                    pass
-                self.groups.__delitem__(y)
+        for y in ready:
+            toreturn.extend(self.groups.pop(y))
+            self._release(y)
 
-        if not toreturn and remainder:
-            raise Exception("circular order constraint detected %r" % remainder)
+        if not toreturn and self.groups:
+            raise Exception("circular order constraint detected %r" % list(self.groups.keys()))
 
         return toreturn
 
+    def _release(self, node):
+        for k in self.order.pop(node, []):
+            self._pending[k] -= 1
+            if self._pending[k] == 0:
+                if k in self.groups:
+                    self._ready.append(k)
+                else:
+                    # extension nodes are released as soon as their
+                    # producers are run
+                    self._release(k)
 
     def compare_exts(self, t1, t2):
         "extension production"
@@ -141,10 +273,40 @@ class TaskManager(object):
                 return 1
         return 0
 
+# Status returned by run_task
+TASK_RUN = "run"
+TASK_CACHED = "cached"
+TASK_UPTODATE = "uptodate"
+
 def run_task(ctx, task):
-    def _run(t):
+    """Run the task if it is not up to date.
+
+    Returns TASK_RUN if the task was run, TASK_CACHED if its outputs were
+    restored from the task cache, and TASK_UPTODATE otherwise."""
+    def _timed_run(t):
+        t.max_rss = None
+        start = time.time()
         t.run()
+        durations = getattr(ctx, "task_durations", None)
+        if durations is not None:
+            durations[tuid] = time.time() - start
+        memory = getattr(ctx, "task_memory", None)
+        if memory is not None and getattr(t, "max_rss", None) is not None:
+            memory[tuid] = t.max_rss
+
+    def _run(t):
+        task_cache = getattr(ctx, "task_cache", None)
+        if task_cache is not None and t.outputs:
+            if task_cache.fetch(t):
+                ctx.cache[tuid] = t.signature()
+                return TASK_CACHED
+            unshare_outputs(t)
+            _timed_run(t)
+            task_cache.store(t)
+        else:
+            _timed_run(t)
         ctx.cache[tuid] = t.signature()
+        return TASK_RUN
 
     tuid = task.get_uid()
     # XXX: there may be a better way to do this without stating output
@@ -152,14 +314,14 @@ def run_task(ctx, task):
     # previous run)
     for o in task.outputs:
         if not os.path.exists(o.abspath()):
-            _run(task)
-            break
+            return _run(task)
     if not tuid in ctx.cache:
-        _run(task)
+        return _run(task)
     else:
         sig = task.signature()
         if sig != ctx.cache[tuid]:
-            _run(task)
+            return _run(task)
+    return TASK_UPTODATE
 
 def build_dag(tasks):
     # Build dependency graph (DAG)
@@ -177,6 +339,193 @@ def build_dag(tasks):
             output_to_tuid[o] = t.get_uid()
     return task_deps, output_to_tuid
 
+def affected_tasks(tasks, paths):
+    """Return the tasks depending on any of the given files (absolute paths),
+    directly or through the outputs of other affected tasks, in the order of
+    tasks. Scanned dependencies are included."""
+    users = {}
+    for t in tasks:
+        deps = t.inputs + t.deps
+        if t.scan is not None:
+            deps = deps + t.scan(t)
+        for n in deps:
+            users.setdefault(n.abspath(), []).append(t)
+
+    affected = set()
+    stack = list(paths)
+    while stack:
+        for t in users.get(stack.pop(), []):
+            if not t in affected:
+                affected.add(t)
+                stack.extend([o.abspath() for o in t.outputs])
+    return [t for t in tasks if t in affected]
+
+class TaskGraph(object):
+    """Producer/consumer graph between tasks.
+
+    A task depends on every task producing one of its inputs or dependencies
+    (as computed by build_dag). Class-level precedence given through the
+    'before' attribute of task classes (see TaskManager.make_order) is
+    honored as well, without creating one edge per pair of tasks.
+
+    The graph keeps track of which tasks have been run: task_done returns the
+    tasks which become runnable once a given task is finished."""
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+        tuid_to_task = dict([(t.get_uid(), t) for t in tasks])
+        task_deps, output_to_tuid = build_dag(tasks)
+
+        self.producers = dict([(t, set()) for t in tasks])
+        self.consumers = dict([(t, []) for t in tasks])
+        for t in tasks:
+            producers = self.producers[t]
+            for n in t.inputs + t.deps:
+                tuid = output_to_tuid.get(n, None)
+                if tuid is None:
+                    continue
+                p = tuid_to_task[tuid]
+                if p is not t and not p in producers:
+                    producers.add(p)
+                    self.consumers[p].append(t)
+
+        self.classes = {}
+        for t in tasks:
+            name = t.__class__.__name__
+            if name in self.classes:
+                self.classes[name].append(t)
+            else:
+                self.classes[name] = [t]
+
+        # class_pending[name] is the number of unfinished tasks which must be
+        # run before any task of class name
+        self.class_pending = {}
+        self.class_followers = {}
+        for name, klass_tasks in self.classes.items():
+            count = 0
+            for other in set(klass_tasks[0].before):
+                if other != name and other in self.classes:
+                    count += len(self.classes[other])
+                    if other in self.class_followers:
+                        self.class_followers[other].append(name)
+                    else:
+                        self.class_followers[other] = [name]
+            self.class_pending[name] = count
+
+        self.pending = dict([(t, len(self.producers[t])) for t in tasks])
+
+    def _is_ready(self, task):
+        return self.pending[task] == 0 and \
+                self.class_pending[task.__class__.__name__] == 0
+
+    def ready_tasks(self):
+        """Return the tasks which can be run right away."""
+        return [t for t in self.tasks if self._is_ready(t)]
+
+    def task_done(self, task):
+        """Mark task as run, and return the list of tasks it released."""
+        released = []
+        for t in self.consumers[task]:
+            self.pending[t] -= 1
+            if self._is_ready(t):
+                released.append(t)
+        for name in self.class_followers.get(task.__class__.__name__, []):
+            self.class_pending[name] -= 1
+            if self.class_pending[name] == 0:
+                for t in self.classes[name]:
+                    if self.pending[t] == 0:
+                        released.append(t)
+        return released
+
+    def remaining_paths(self, cost):
+        """Return a dict task -> cost of the most expensive chain of tasks
+        starting with this task (inclusive), following consumers.
+
+        cost is a callable returning the (estimated) cost of a task."""
+        remaining = {}
+        # visit the tasks from the sinks to the sources
+        n_consumers = dict([(t, len(self.consumers[t])) for t in self.tasks])
+        stack = [t for t in self.tasks if n_consumers[t] == 0]
+        while stack:
+            t = stack.pop()
+            longest = 0
+            for c in self.consumers[t]:
+                if remaining[c] > longest:
+                    longest = remaining[c]
+            remaining[t] = cost(t) + longest
+            for p in self.producers[t]:
+                n_consumers[p] -= 1
+                if n_consumers[p] == 0:
+                    stack.append(p)
+        # tasks in a cycle are never reached
+        for t in self.tasks:
+            if not t in remaining:
+                remaining[t] = cost(t)
+        return remaining
+
+# Cost estimation, in seconds per byte of input, for tasks never run before
+# whose class has no recorded duration either
+SECONDS_PER_INPUT_BYTE = 1e-5
+
+def _input_size(task):
+    size = 0
+    for n in task.inputs:
+        try:
+            size += os.stat(n.abspath()).st_size
+        except OSError:
+            pass
+    return size
+
+class DurationEstimator(object):
+    """Estimate the duration of tasks from the durations recorded in previous
+    builds.
+
+    Tasks never run before are given a duration proportional to the size of
+    their inputs, at the rate observed for the other tasks of their class
+    when known."""
+    def __init__(self, durations, tasks):
+        self.durations = durations
+
+        totals = {}
+        for t in tasks:
+            d = durations.get(t.get_uid(), None)
+            if d is not None:
+                name = t.__class__.__name__
+                total, size = totals.get(name, (0.0, 0))
+                totals[name] = (total + d, size + _input_size(t))
+        self.rates = {}
+        for name, (total, size) in totals.items():
+            if size > 0:
+                self.rates[name] = total / size
+
+    def __call__(self, task):
+        d = self.durations.get(task.get_uid(), None)
+        if d is not None:
+            return d
+        rate = self.rates.get(task.__class__.__name__, SECONDS_PER_INPUT_BYTE)
+        return _input_size(task) * rate
+
+def estimate_task_memory(memory, tasks):
+    """Return a dict task -> estimated peak memory in bytes, from the peak
+    memory recorded in previous builds (memory, keyed by task uid).
+
+    Tasks never run before are assumed to need as much as the most demanding
+    task of their class, or nothing if no task of their class was run."""
+    class_max = {}
+    for t in tasks:
+        m = memory.get(t.get_uid(), None)
+        if m is not None:
+            name = t.__class__.__name__
+            class_max[name] = max(m, class_max.get(name, 0))
+
+    ret = {}
+    for t in tasks:
+        m = memory.get(t.get_uid(), None)
+        if m is None:
+            m = class_max.get(t.__class__.__name__, 0)
+        ret[t] = m
+    return ret
+
 def topo_sort(task_deps):
     # Topological sort (depth-first search)
     # XXX: cycle detection is missing
@@ -234,6 +583,16 @@ class CompiledTaskGen(TaskGen):
         self.object_tasks = []
         self.link_task = None
         self.has_cxx = False
+        # unity build unit -> sources it includes (see yaku.unity)
+        self.unity_members = {}
+
+    def process(self):
+        tasks = TaskGen.process(self)
+        # the units depend on their sources, even without include scanner
+        for t in tasks:
+            for s in t.inputs:
+                t.deps.extend(self.unity_members.get(s, []))
+        return tasks
 
     def add_objects(self, tasks):
         """Add new object tasks, assuming the link task has already
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import tempfile
+import shutil
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, require_cc
+from yaku.context \
+    import \
+        get_cfg
+from yaku.conftests \
+    import \
+        check_header
+from yaku.conf \
+    import \
+        with_conf_blddir
+from yaku.conf_cache \
+    import \
+        ConfCache
+from yaku.environment \
+    import \
+        Environment
+
+class ConfCacheKeyTest(TmpContextBase):
+    def setUp(self):
+        super(ConfCacheKeyTest, self).setUp()
+        self.bindir = os.path.join(self.d, "bin")
+        os.makedirs(self.bindir)
+        self._write_program("fakecc", "v1")
+        self.cache = ConfCache(os.path.join(self.d, "cache"))
+
+    def _write_program(self, name, content):
+        fid = open(os.path.join(self.bindir, name), "w")
+        try:
+            fid.write(content)
+        finally:
+            fid.close()
+
+    def _env(self, **kw):
+        env = Environment(CC=["fakecc"], CFLAGS=["-Wall"],
+                          ENV={"PATH": self.bindir}, BLDDIR="build")
+        env.update(kw)
+        return env
+
+    def test_stable(self):
+        key = self.cache.check_key("compile", "int a;", self._env())
+        self.assertEqual(key, ConfCache(self.cache.path).check_key("compile", "int a;", self._env()))
+        # build directory does not matter
+        self.assertEqual(key, self.cache.check_key("compile", "int a;", self._env(BLDDIR="build2")))
+
+    def test_invalidation(self):
+        key = self.cache.check_key("compile", "int a;", self._env())
+        self.assertNotEqual(key, self.cache.check_key("compile", "int b;", self._env()))
+        self.assertNotEqual(key, self.cache.check_key("link", "int a;", self._env()))
+        self.assertNotEqual(key, self.cache.check_key("compile", "int a;", self._env(CFLAGS=["-O2"])))
+
+        # a different compiler binary changes the key
+        self._write_program("fakecc", "version 2")
+        self.assertNotEqual(key, ConfCache(self.cache.path).check_key("compile", "int a;", self._env()))
+
+    def test_get_set_clear(self):
+        self.assertEqual(self.cache.get("abcd"), None)
+        self.cache.set("abcd", True)
+        self.cache.set("efgh", False)
+        self.assertEqual(self.cache.get("abcd"), True)
+        self.assertEqual(self.cache.get("efgh"), False)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+        self.cache.clear()
+        self.assertEqual(self.cache.get("abcd"), None)
+
+class ConfCacheCheckTest(TmpContextBase):
+    def setUp(self):
+        super(ConfCacheCheckTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        super(ConfCacheCheckTest, self).tearDown()
+
+    def _configure(self, build_path):
+        ctx = get_cfg(build_path=build_path)
+        ctx.conf_cache = ConfCache(self.cache_dir)
+        ctx.use_tools(["ctasks"])
+        results = [check_header(ctx, "stdio.h"),
+                   check_header(ctx, "yakuyakudoesnotexist.h")]
+        ctx.store()
+        return ctx, results
+
+    @require_cc
+    def test_shared_between_build_dirs(self):
+        ctx, results = self._configure("build")
+        self.assertEqual(results, [True, False])
+        misses = ctx.conf_cache.misses
+        self.assertTrue(misses >= 2)
+
+        ctx, results = self._configure("build2")
+        self.assertEqual(results, [True, False])
+        self.assertEqual(ctx.conf_cache.misses, 0)
+        self.assertEqual(ctx.conf_cache.hits, misses)
+
+    @require_cc
+    def test_chained_checks_not_cached(self):
+        def _link(build_path):
+            ctx = get_cfg(build_path=build_path)
+            ctx.conf_cache = ConfCache(self.cache_dir)
+            ctx.use_tools(["ctasks"])
+            builder = ctx.builders["ctasks"]
+            def f():
+                # the program check links against the library just built
+                return builder.try_static_library_no_blddir("foo", "int foo() {return 0;}") and \
+                       builder.try_program_no_blddir("exe", "int foo(); int main() {return foo();}",
+                                                     env={"LIBS": ["foo"]})
+            hits = ctx.conf_cache.hits
+            ret = with_conf_blddir(ctx, "chained", "chained", f)
+            ctx.store()
+            return ret, ctx.conf_cache.hits - hits
+
+        self.assertEqual(_link("build"), (True, 0))
+        self.assertEqual(_link("build2"), (True, 0))
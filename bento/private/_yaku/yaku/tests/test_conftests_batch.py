@@ -0,0 +1,119 @@
+import os
+import sys
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, require_cc
+from yaku.context \
+    import \
+        get_cfg
+from yaku.conftests \
+    import \
+        check_header, check_headers, check_funcs, run_checks
+from yaku.conftests.conftests \
+    import \
+        _bisect
+
+if sys.version_info[0] < 3:
+    from cStringIO \
+        import \
+            StringIO
+else:
+    from io \
+        import \
+            StringIO
+
+class BisectTest(TmpContextBase):
+    def test_simple(self):
+        tried = []
+        def try_items(items):
+            tried.append(items)
+            return not "c" in items
+        ret = _bisect(["a", "b", "c", "d"], try_items)
+        self.assertEqual(ret, {"a": True, "b": True, "c": False, "d": True})
+        self.assertEqual(tried[0], ["a", "b", "c", "d"])
+        self.assertEqual(len(tried), 5)
+
+    def test_all_pass(self):
+        tried = []
+        def try_items(items):
+            tried.append(items)
+            return True
+        self.assertEqual(_bisect(["a", "b"], try_items), {"a": True, "b": True})
+        self.assertEqual(len(tried), 1)
+        self.assertEqual(_bisect([], try_items), {})
+
+class BatchChecksTest(TmpContextBase):
+    def _configure(self, build_path, jobs):
+        import yaku.context
+
+        ctx = get_cfg(build_path=build_path)
+        ctx.use_tools(["ctasks"])
+        headers = ["stdio.h", "yakuyakudoesnotexist.h", "stdlib.h", "string.h"]
+        checks = [lambda conf, h=h: check_header(conf, h) for h in headers]
+
+        output = StringIO()
+        old_output = yaku.context._OUTPUT
+        yaku.context._OUTPUT = output
+        try:
+            ret = run_checks(ctx, checks, jobs)
+        finally:
+            yaku.context._OUTPUT = old_output
+        ctx.store()
+        return ret, ctx.conf_results, output.getvalue()
+
+    @require_cc
+    def test_deterministic(self):
+        serial = self._configure("build1", 1)
+        parallel = self._configure("build2", 4)
+        self.assertEqual(serial[0], [True, False, True, True])
+        self.assertEqual(serial[0], parallel[0])
+        self.assertEqual(serial[1], parallel[1])
+        self.assertEqual(serial[2], parallel[2])
+
+    def test_failure(self):
+        import yaku.context
+
+        ctx = get_cfg()
+        def check(conf):
+            conf.conf_results.append({"type": "pid", "value": os.getpid(), "result": True})
+            return True
+        def failing_check(conf):
+            raise ValueError("yoyo")
+
+        output = StringIO()
+        old_output = yaku.context._OUTPUT
+        yaku.context._OUTPUT = output
+        try:
+            try:
+                run_checks(ctx, [check, failing_check], 2)
+                self.fail("failing check did not raise")
+            except ValueError:
+                e = sys.exc_info()[1]
+                self.assertEqual(str(e), "yoyo")
+        finally:
+            yaku.context._OUTPUT = old_output
+        # the result of the other check, run in a worker, is kept
+        self.assertEqual(len(ctx.conf_results), 1)
+        self.assertNotEqual(ctx.conf_results[0]["value"], os.getpid())
+
+class BatchConftestsTest(TmpContextBase):
+    def setUp(self):
+        super(BatchConftestsTest, self).setUp()
+        self.ctx = get_cfg()
+        self.ctx.use_tools(["ctasks"])
+
+    @require_cc
+    def test_check_headers(self):
+        ret = check_headers(self.ctx, ["stdio.h", "yakuyakudoesnotexist.h", "stdlib.h"])
+        self.assertEqual(ret, {"stdio.h": True, "yakuyakudoesnotexist.h": False,
+                               "stdlib.h": True})
+        self.assertEqual([(r["value"], r["result"]) for r in self.ctx.conf_results],
+                         [("stdio.h", True), ("yakuyakudoesnotexist.h", False),
+                          ("stdlib.h", True)])
+
+    @require_cc
+    def test_check_funcs(self):
+        ret = check_funcs(self.ctx, ["malloc", "yakuyakudoesnotexist", "free"])
+        self.assertEqual(ret, {"malloc": True, "yakuyakudoesnotexist": False,
+                               "free": True})
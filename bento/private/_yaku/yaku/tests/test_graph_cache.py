@@ -0,0 +1,57 @@
+import os
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, make_task, make_old
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.scheduler \
+    import \
+        run_tasks
+from yaku.graph_cache \
+    import \
+        save_graph, load_graph, clear_graph
+
+class GraphCacheTest(TmpContextBase):
+    def setUp(self):
+        super(GraphCacheTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+
+        ctx = self.ctx
+        self.source = ctx.src_root.make_node("a.in")
+        self.source.write("a")
+        make_old(self.source)
+        middle = ctx.bld_root.declare("a.mid")
+        self.target = ctx.bld_root.declare("a.out")
+        ctx.tasks = [make_task(ctx, "first", self.source, middle),
+                     make_task(ctx, "second", middle, self.target)]
+        run_tasks(ctx)
+        self.build_path = ctx.bld_root.abspath()
+
+    def test_noop(self):
+        save_graph(self.ctx, "key", ["data"])
+        self.assertEqual(load_graph(self.build_path, "key"), ["data"])
+        self.assertEqual(load_graph(self.build_path, "other key"), None)
+
+        clear_graph(self.build_path)
+        self.assertEqual(load_graph(self.build_path, "key"), None)
+
+    def test_changed_leaf(self):
+        save_graph(self.ctx, "key")
+        self.source.write("ab")
+        make_old(self.source)
+        self.assertEqual(load_graph(self.build_path, "key"), None)
+
+    def test_removed_output(self):
+        save_graph(self.ctx, "key", [])
+        os.remove(self.target.abspath())
+        self.assertEqual(load_graph(self.build_path, "key"), None)
+
+    def test_racy_leaf(self):
+        # a leaf modified just before the snapshot is not trusted
+        self.source.write("b")
+        save_graph(self.ctx, "key", [])
+        self.assertEqual(load_graph(self.build_path, "key"), None)
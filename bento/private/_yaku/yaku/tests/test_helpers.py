@@ -1,7 +1,15 @@
 import os
+import time
 import tempfile
 import shutil
-from unittest import TestCase
+from unittest import TestCase, skipIf
+
+from yaku.task \
+    import \
+        task_factory
+from yaku.utils \
+    import \
+        find_program
 
 class TmpContextBase(TestCase):
     def setUp(self):
@@ -12,3 +20,26 @@ class TmpContextBase(TestCase):
     def tearDown(self):
         shutil.rmtree(self.d)
         os.chdir(self.cwd)
+
+def copy_task(task):
+    task.outputs[0].write(task.inputs[0].read())
+
+def make_task(ctx, name, source, target, func=copy_task):
+    """Return a task of the context ctx running func (copy of source into
+    target by default)."""
+    task = task_factory(name)([target], [source], func=func)
+    task.env_vars = []
+    task.env = ctx.env
+    return task
+
+def make_old(node, seconds=3600):
+    """Set the modification time of node in the past, for the stat of
+    recently modified files not to be ignored."""
+    t = time.time() - seconds
+    os.utime(node.abspath(), (t, t))
+
+def has_cc():
+    return find_program("gcc") is not None or find_program("cc") is not None
+
+# decorator of the tests running a C compiler
+require_cc = skipIf(not has_cc(), "no C compiler found")
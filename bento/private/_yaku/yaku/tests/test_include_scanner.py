@@ -0,0 +1,73 @@
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, make_old
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.include_scanner \
+    import \
+        IncludeScanner, parse_includes, include_dir_nodes
+from yaku.task_manager \
+    import \
+        CompiledTaskGen
+
+class ParseIncludesTest(TmpContextBase):
+    def test_simple(self):
+        code = """\
+#include <stdio.h>
+  #  include "foo.h"
+/* #include "commented.h" */
+// #include "commented2.h"
+#define FOO 1
+"""
+        self.assertEqual(parse_includes(code), [("<", "stdio.h"), ('"', "foo.h")])
+
+class IncludeScannerTest(TmpContextBase):
+    def setUp(self):
+        super(IncludeScannerTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+
+        src_root = self.ctx.src_root
+        self.source = src_root.make_node("a.c")
+        self.source.write('#include "a.h"\n#include <stdio.h>\n')
+        self.header = src_root.make_node("a.h")
+        self.header.write('#include <sub/b.h>\n#include "a.h"\n')
+        inc = src_root.make_node("inc")
+        inc.mkdir()
+        inc.make_node("sub").mkdir()
+        self.sub_header = src_root.make_node(["inc", "sub", "b.h"])
+        self.sub_header.write("#define B 1\n")
+        for node in [self.source, self.header, self.sub_header]:
+            make_old(node)
+        self.include_dirs = [inc]
+
+    def test_scan(self):
+        scanner = IncludeScanner()
+        deps = scanner.scan(self.source, self.include_dirs)
+        self.assertEqual(set(deps), set([self.header, self.sub_header]))
+
+    def test_include_dir_nodes(self):
+        task_gen = CompiledTaskGen("foo", self.ctx, [self.source], "foo")
+        self.assertEqual(include_dir_nodes(task_gen, ["inc"]),
+                         [self.ctx.src_root, self.include_dirs[0]])
+
+        # no source: only the include paths
+        task_gen = CompiledTaskGen("foo", self.ctx, [], "foo")
+        self.assertEqual(include_dir_nodes(task_gen, ["inc"]), self.include_dirs)
+
+    def test_persistent_graph(self):
+        scanner = self.ctx.include_scanner
+        scanner.scan(self.source, self.include_dirs)
+        self.ctx.store()
+
+        ctx = get_bld()
+        path = self.header.abspath()
+        self.assertTrue(path in ctx.include_scanner.data)
+
+        # Unchanged files are not read again
+        key, includes = ctx.include_scanner.data[path]
+        ctx.include_scanner.data[path] = (key, [])
+        deps = ctx.include_scanner.scan(self.source, self.include_dirs)
+        self.assertEqual(deps, [self.header])
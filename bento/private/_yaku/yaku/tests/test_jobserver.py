@@ -0,0 +1,123 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+
+from yaku.jobserver \
+    import \
+        JobServerClient, JobServer, get_jobserver
+from yaku.utils \
+    import \
+        find_program
+
+class JobServerClientTest(unittest.TestCase):
+    def test_no_jobserver(self):
+        self.assertTrue(JobServerClient.from_environ({}) is None)
+        self.assertTrue(JobServerClient.from_environ({"MAKEFLAGS": "-j4"}) is None)
+
+    def test_invalid_fds(self):
+        r, w = os.pipe()
+        os.close(r)
+        os.close(w)
+        environ = {"MAKEFLAGS": "-j4 --jobserver-auth=%d,%d" % (r, w)}
+        self.assertTrue(JobServerClient.from_environ(environ) is None)
+
+    def test_pipe(self):
+        r, w = os.pipe()
+        try:
+            os.write(w, "+".encode("ascii"))
+            for option in ["--jobserver-fds", "--jobserver-auth"]:
+                environ = {"MAKEFLAGS": " -j2 %s=%d,%d" % (option, r, w)}
+                client = JobServerClient.from_environ(environ)
+                self.assertEqual((client.read_fd, client.write_fd), (r, w))
+                self.assertEqual(client.fds, (r, w))
+
+                # implicit token, then one from the pipe
+                implicit = client.acquire()
+                token = client.acquire()
+                self.assertTrue(implicit is None)
+                self.assertEqual(token, "+".encode("ascii"))
+                client.release(token)
+                client.release(implicit)
+        finally:
+            os.close(r)
+            os.close(w)
+
+if sys.platform != "win32":
+    class JobServerTest(unittest.TestCase):
+        def setUp(self):
+            self.server = JobServer(2)
+
+        def tearDown(self):
+            self.server.close()
+
+        def test_tokens(self):
+            tokens = [self.server.acquire(), self.server.acquire()]
+
+            acquired = threading.Event()
+            def _acquire():
+                tokens.append(self.server.acquire())
+                acquired.set()
+            t = threading.Thread(target=_acquire)
+            t.daemon = True
+            t.start()
+            # both slots are taken
+            self.assertFalse(acquired.wait(0.2))
+
+            self.server.release(tokens[1])
+            self.assertTrue(acquired.wait(5))
+            for token in tokens[::-1][:2]:
+                self.server.release(token)
+
+        def test_export(self):
+            env = self.server.export({"MAKEFLAGS": "-s -j8 --jobserver-auth=3,4"})
+            flags = env["MAKEFLAGS"].split()
+            self.assertEqual(flags[0], "-j2")
+            self.assertTrue("-s" in flags)
+            self.assertEqual([f for f in flags if f.startswith("--jobserver")],
+                             ["--jobserver-auth=%s" % self.server.auth])
+
+        def test_make(self):
+            # the advertised jobserver is understood by make (the fifo form
+            # is not before make 4.4)
+            if find_program("make") is None or sys.version_info[0] < 3:
+                return
+            d = tempfile.mkdtemp()
+            try:
+                fid = open(os.path.join(d, "Makefile"), "w")
+                try:
+                    fid.write("all: a b\na:\n\t@true\nb:\n\t@true\n")
+                finally:
+                    fid.close()
+                p = subprocess.Popen(["make", "-C", d], env=self.server.export(),
+                                     pass_fds=self.server.fds,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                out = p.communicate()[0]
+                self.assertEqual(p.returncode, 0, out)
+            finally:
+                shutil.rmtree(d)
+
+        def test_nested(self):
+            # a sub-build shares the slots of the parent
+            client = get_jobserver(4, self.server.export())
+            try:
+                self.assertEqual(client.auth, self.server.auth)
+                self.assertTrue(client.acquire() is None)
+                token = client.acquire()
+                self.assertEqual(token, "+".encode("ascii"))
+                client.release(token)
+                self.assertEqual(self.server.acquire(), None)
+                self.assertEqual(self.server.acquire(), "+".encode("ascii"))
+            finally:
+                client.close()
+
+        def test_get_jobserver(self):
+            self.assertTrue(get_jobserver(1, {}) is None)
+            server = get_jobserver(3, {})
+            try:
+                self.assertEqual(server.jobs, 3)
+            finally:
+                server.close()
@@ -0,0 +1,216 @@
+import sys
+import time
+import threading
+import subprocess
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, copy_task, make_task
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.task_manager \
+    import \
+        TaskManager, TaskGraph, DurationEstimator, estimate_task_memory
+from yaku.scheduler \
+    import \
+        DependencyRunner
+from yaku.errors \
+    import \
+        TaskRunFailure
+from yaku.utils \
+    import \
+        communicate_with_rusage
+
+class DependencyRunnerTest(TmpContextBase):
+    def setUp(self):
+        super(DependencyRunnerTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+
+    def _run(self, tasks, maxjobs=4):
+        runner = DependencyRunner(self.ctx, TaskManager(tasks), maxjobs)
+        runner.start()
+        runner.run()
+
+    def test_graph(self):
+        ctx = self.ctx
+        source = ctx.src_root.make_node("a.in")
+        source.write("a")
+        middle = ctx.bld_root.declare("a.mid")
+        target = ctx.bld_root.declare("a.out")
+        t1 = make_task(ctx, "first", source, middle)
+        t2 = make_task(ctx, "second", middle, target)
+
+        graph = TaskGraph([t2, t1])
+        self.assertEqual(graph.ready_tasks(), [t1])
+        self.assertEqual(graph.task_done(t1), [t2])
+        self.assertEqual(graph.task_done(t2), [])
+
+    def test_chain(self):
+        ctx = self.ctx
+        source = ctx.src_root.make_node("a.in")
+        source.write("abc")
+        middle = ctx.bld_root.declare("a.mid")
+        target = ctx.bld_root.declare("a.out")
+        tasks = [make_task(ctx, "second", middle, target),
+                 make_task(ctx, "first", source, middle)]
+        self._run(tasks)
+        self.assertEqual(target.read(), "abc")
+
+    def test_no_group_barrier(self):
+        """A consumer must not wait for unrelated tasks of its producer group."""
+        ctx = self.ctx
+        consumer_ran = threading.Event()
+
+        def _slow(task):
+            consumer_ran.wait(10)
+            copy_task(task)
+
+        def _consume(task):
+            consumer_ran.set()
+            copy_task(task)
+
+        tasks = []
+        for name in ["slow", "fast"]:
+            node = ctx.src_root.make_node("%s.in" % name)
+            node.write(name)
+            tasks.append(make_task(ctx, "produce", node,
+                                    ctx.bld_root.declare("%s.mid" % name),
+                                    name == "slow" and _slow or copy_task))
+        tasks.append(make_task(ctx, "consume", tasks[-1].outputs[0],
+                                ctx.bld_root.declare("fast.out"), _consume))
+        self._run(tasks)
+        self.assertTrue(consumer_ran.is_set())
+
+    def test_failure(self):
+        ctx = self.ctx
+        source = ctx.src_root.make_node("a.in")
+        source.write("a")
+        middle = ctx.bld_root.declare("a.mid")
+        target = ctx.bld_root.declare("a.out")
+
+        def _fail(task):
+            raise TaskRunFailure(["fail"], "failed on purpose")
+
+        tasks = [make_task(ctx, "first", source, middle, _fail),
+                 make_task(ctx, "second", middle, target)]
+        self.assertRaises(TaskRunFailure, lambda: self._run(tasks))
+        self.assertFalse(ctx.cache)
+
+class CriticalPathTest(TmpContextBase):
+    def setUp(self):
+        super(CriticalPathTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+
+        self.order = []
+        def _record(task):
+            self.order.append(task.name)
+            copy_task(task)
+
+        # short: a.in -> a.out, long: b.in -> b.mid -> b.out
+        ctx = self.ctx
+        for name in ["a", "b"]:
+            ctx.src_root.make_node("%s.in" % name).write(name)
+        b_mid = ctx.bld_root.declare("b.mid")
+        self.tasks = [
+            make_task(ctx, "short", ctx.src_root.find_node("a.in"),
+                       ctx.bld_root.declare("a.out"), _record),
+            make_task(ctx, "long1", ctx.src_root.find_node("b.in"), b_mid, _record),
+            make_task(ctx, "long2", b_mid, ctx.bld_root.declare("b.out"), _record)]
+
+    def test_remaining_paths(self):
+        durations = {"short": 3, "long1": 2, "long2": 2}
+        graph = TaskGraph(self.tasks)
+        remaining = graph.remaining_paths(lambda t: durations[t.name])
+        self.assertEqual([remaining[t] for t in self.tasks], [3, 4, 2])
+
+    def test_estimator(self):
+        short, long1, long2 = self.tasks
+        estimator = DurationEstimator({long1.get_uid(): 2.0}, self.tasks)
+        self.assertEqual(estimator(long1), 2.0)
+        # never run, no known duration for its class: estimated from its input size
+        self.assertTrue(estimator(short) > 0)
+
+    def test_longest_chain_first(self):
+        short, long1, long2 = self.tasks
+        self.ctx.task_durations = {short.get_uid(): 1.0, long1.get_uid(): 1.0,
+                                   long2.get_uid(): 1.0}
+        runner = DependencyRunner(self.ctx, TaskManager(self.tasks), 1)
+        runner.start()
+        runner.run()
+        self.assertEqual(self.order[0], "long1")
+
+    def test_durations_stored(self):
+        runner = DependencyRunner(self.ctx, TaskManager(self.tasks), 2)
+        runner.start()
+        runner.run()
+        self.ctx.store()
+
+        ctx = get_bld()
+        self.assertEqual(sorted(ctx.task_durations.keys()),
+                         sorted([t.get_uid() for t in self.tasks]))
+
+class MemoryLimitTest(TmpContextBase):
+    def setUp(self):
+        super(MemoryLimitTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        def _slow(task):
+            self.lock.acquire()
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.lock.release()
+            time.sleep(0.05)
+            copy_task(task)
+            self.lock.acquire()
+            self.running -= 1
+            self.lock.release()
+
+        self.tasks = []
+        for name in ["a", "b", "c", "d"]:
+            node = self.ctx.src_root.make_node("%s.in" % name)
+            node.write(name)
+            self.tasks.append(make_task(self.ctx, "big", node,
+                                         self.ctx.bld_root.declare("%s.out" % name), _slow))
+
+    def _run(self, memory_limit):
+        runner = DependencyRunner(self.ctx, TaskManager(self.tasks), 4, memory_limit)
+        runner.start()
+        runner.run()
+
+    def test_estimate(self):
+        a, b, c, d = self.tasks
+        memory = estimate_task_memory({a.get_uid(): 100, b.get_uid(): 200}, self.tasks)
+        self.assertEqual([memory[t] for t in self.tasks], [100, 200, 200, 200])
+        self.assertEqual(estimate_task_memory({}, self.tasks)[a], 0)
+
+    def test_limit(self):
+        self.ctx.task_memory = dict([(t.get_uid(), 100) for t in self.tasks])
+        self._run(250)
+        self.assertEqual(self.max_running, 2)
+        for t in self.tasks:
+            self.assertEqual(t.outputs[0].read(), t.inputs[0].read())
+
+    def test_larger_than_limit(self):
+        # a task needing more than the whole budget still runs, alone
+        self.ctx.task_memory = dict([(t.get_uid(), 1000) for t in self.tasks])
+        self._run(250)
+        self.assertEqual(self.max_running, 1)
+
+    def test_rusage(self):
+        p = subprocess.Popen([sys.executable, "-c", "print('yo')"],
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        stdout, max_rss = communicate_with_rusage(p)
+        self.assertEqual(p.returncode, 0)
+        self.assertEqual(stdout.decode().strip(), "yo")
+        if max_rss is not None:
+            self.assertTrue(max_rss > 0)
@@ -0,0 +1,56 @@
+import os
+import time
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.signature \
+    import \
+        NodeSignatures, content_hash, stat_key
+
+class NodeSignaturesTest(TmpContextBase):
+    def setUp(self):
+        super(NodeSignaturesTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+        self.node = self.ctx.src_root.make_node("foo.h")
+        self.node.write("#define FOO 1\n")
+        # make the file old enough to be trusted through its stat
+        old = time.time() - 10
+        os.utime(self.node.abspath(), (old, old))
+
+    def test_stat_fast_path(self):
+        sigs = NodeSignatures()
+        h = sigs.get(self.node)
+        self.assertEqual(h, content_hash(self.node))
+
+        # Same stat -> the stored hash is used without reading the file
+        path = self.node.abspath()
+        key = stat_key(os.stat(path))
+        sigs.data[path] = (key, "fake")
+        self.assertEqual(sigs.get(self.node), "fake")
+
+    def test_full_content_mode(self):
+        sigs = NodeSignatures(use_stat=False)
+        path = self.node.abspath()
+        sigs.data[path] = (stat_key(os.stat(path)), "fake")
+        self.assertEqual(sigs.get(self.node), content_hash(self.node))
+
+    def test_changed_file(self):
+        sigs = NodeSignatures()
+        h = sigs.get(self.node)
+        self.node.write("#define FOO 2\n")
+        self.assertNotEqual(sigs.get(self.node), h)
+        # recently modified files are not remembered
+        self.assertFalse(self.node.abspath() in sigs.data)
+
+    def test_persistence(self):
+        self.ctx.node_sigs.get(self.node)
+        self.ctx.store()
+
+        ctx = get_bld()
+        self.assertTrue(self.node.abspath() in ctx.node_sigs.data)
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import shutil
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, make_task
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.task_manager \
+    import \
+        run_task
+from yaku.task_cache \
+    import \
+        TaskCache
+
+class TaskCacheTest(TmpContextBase):
+    def setUp(self):
+        super(TaskCacheTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.nruns = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        super(TaskCacheTest, self).tearDown()
+
+    def _build(self, build_path, content, max_size=None):
+        ctx = get_cfg(build_path=build_path)
+        ctx.store()
+        ctx = get_bld(build_path=build_path)
+        ctx.task_cache = TaskCache(self.cache_dir, max_size=max_size)
+
+        def _copy(task):
+            self.nruns += 1
+            task.outputs[0].write(task.inputs[0].read())
+
+        source = ctx.src_root.make_node("a.in")
+        source.write(content)
+        target = ctx.bld_root.declare("a.out")
+        task = make_task(ctx, "copy", source, target, _copy)
+
+        run_task(ctx, task)
+        ctx.store()
+        return ctx, target
+
+    def test_shared_between_build_dirs(self):
+        ctx, target = self._build("build", "abc")
+        self.assertEqual(self.nruns, 1)
+        self.assertEqual(ctx.task_cache.misses, 1)
+        self.assertEqual(ctx.task_cache.stored, 1)
+
+        ctx, target = self._build("build2", "abc")
+        self.assertEqual(self.nruns, 1)
+        self.assertEqual(ctx.task_cache.hits, 1)
+        self.assertEqual(target.read(), "abc")
+        self.assertEqual(ctx.task_cache.stats["hits"], 1)
+        self.assertEqual(ctx.task_cache.stats["misses"], 1)
+
+        ctx, target = self._build("build3", "abcd")
+        self.assertEqual(self.nruns, 2)
+        self.assertEqual(target.read(), "abcd")
+
+    def test_eviction(self):
+        ctx, target = self._build("build", "a" * 100, max_size=150)
+        ctx, target = self._build("build", "b" * 100, max_size=150)
+        self.assertEqual(self.nruns, 2)
+        self.assertTrue(ctx.task_cache.stats["size"] <= 150)
+
+        # the most recent entry is kept
+        ctx, target = self._build("build2", "b" * 100, max_size=150)
+        self.assertEqual(self.nruns, 2)
+
+    def test_eviction_skips_pending_entries(self):
+        ctx, target = self._build("build", "a" * 100, max_size=150)
+        # entry being stored by another thread or process
+        pending = os.path.join(self.cache_dir, "ab", "ab12.%d.1.tmp" % os.getpid())
+        os.makedirs(pending)
+        fid = open(os.path.join(pending, "0"), "w")
+        try:
+            fid.write("c" * 100)
+        finally:
+            fid.close()
+
+        cache = TaskCache(self.cache_dir, max_size=10)
+        cache.evict()
+        self.assertTrue(os.path.exists(pending))
+        self.assertEqual(cache.stats["size"], 0)
@@ -0,0 +1,90 @@
+import unittest
+
+from yaku.task \
+    import \
+        task_factory
+from yaku.task_manager \
+    import \
+        TaskManager, affected_tasks
+
+class _Node(object):
+    def __init__(self, name):
+        self.name = name
+
+    def abspath(self):
+        return "/" + self.name
+
+def _task(name, source, target):
+    return task_factory(name)([_Node(target)], [_Node(source)])
+
+def _sets(tasks):
+    manager = TaskManager(tasks)
+    sets = []
+    grp = manager.next_set()
+    while grp:
+        sets.append([t.__class__.name for t in grp])
+        grp = manager.next_set()
+    return sets
+
+class TaskManagerTest(unittest.TestCase):
+    def test_extensions(self):
+        tasks = [_task("tm_link", "a.o", "a.so"),
+                 _task("tm_cc", "a.c", "a.o"),
+                 _task("tm_cc", "b.c", "b.o"),
+                 _task("tm_gen", "a.idl", "a.c"),
+                 _task("tm_other", "a.txt", "a.html")]
+        self.assertEqual(_sets(tasks),
+                         [["tm_gen", "tm_other"], ["tm_cc", "tm_cc"], ["tm_link"]])
+
+    def test_many_producers(self):
+        # every generator feeds every link task through the .o extension
+        tasks = []
+        for i in range(10):
+            tasks.append(_task("tm_link%d" % i, "lib%d.o" % i, "lib%d.so" % i))
+            tasks.append(_task("tm_gen%d" % i, "f%d.in%d" % (i, i), "f%d.o" % i))
+        sets = _sets(tasks)
+        self.assertEqual(len(sets), 2)
+        self.assertEqual(sorted(sets[0]), sorted(["tm_gen%d" % i for i in range(10)]))
+
+    def test_same_extension(self):
+        # a group consuming the extension it produces is not ordered with
+        # itself
+        tasks = [_task("tm_cc", "a.c", "a.o"),
+                 _task("tm_preprocess", "a.c", "a.c")]
+        self.assertEqual(_sets(tasks), [["tm_preprocess"], ["tm_cc"]])
+
+    def test_mutual(self):
+        # groups consuming each other's extension: the first one waits
+        tasks = [_task("tm_x2y", "a.x", "a.y"), _task("tm_y2x", "b.y", "b.x")]
+        self.assertEqual(_sets(tasks), [["tm_y2x"], ["tm_x2y"]])
+        self.assertEqual(_sets(tasks[::-1]), [["tm_x2y"], ["tm_y2x"]])
+
+    def test_before(self):
+        # the class order overrides the extension order
+        first = _task("tm_before_a", "a.a", "a.b")
+        second = _task("tm_before_b", "a.b", "a.c")
+        first.__class__.before = [second.__class__.__name__]
+        try:
+            self.assertEqual(_sets([first, second]), [["tm_before_b"], ["tm_before_a"]])
+        finally:
+            first.__class__.before = []
+
+    def test_cycle(self):
+        tasks = [_task("tm_cycle1", "a.x", "a.y"),
+                 _task("tm_cycle2", "a.y", "a.z"),
+                 _task("tm_cycle3", "a.z", "a.x")]
+        self.assertRaises(Exception, lambda: _sets(tasks))
+
+class AffectedTasksTest(unittest.TestCase):
+    def test_affected(self):
+        gen = _task("tm_gen", "a.idl", "a.c")
+        cc_a = _task("tm_cc", "a.c", "a.o")
+        cc_b = _task("tm_cc", "b.c", "b.o")
+        link = _task("tm_link", "a.o", "a.so")
+        link.inputs.append(cc_b.outputs[0])
+        cc_b.deps = [_Node("b.h")]
+        tasks = [link, cc_a, cc_b, gen]
+
+        self.assertEqual(affected_tasks(tasks, ["/a.idl"]), [link, cc_a, gen])
+        self.assertEqual(affected_tasks(tasks, ["/b.h"]), [link, cc_b])
+        self.assertEqual(affected_tasks(tasks, ["/c.c"]), [])
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, copy_task, make_task
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.task_manager \
+    import \
+        TaskManager
+from yaku.scheduler \
+    import \
+        DependencyRunner, SerialRunner
+from yaku.trace \
+    import \
+        Tracer
+
+def _slow_copy(task):
+    time.sleep(0.05)
+    copy_task(task)
+
+class TracerTest(TmpContextBase):
+    def setUp(self):
+        super(TracerTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+        self.ctx.tracer = Tracer()
+
+    def _tasks(self):
+        # a.in -> a.mid -> a.out (slow chain), b.in -> b.out (fast)
+        ctx = self.ctx
+        for name in ["a", "b"]:
+            ctx.src_root.make_node("%s.in" % name).write(name)
+        a_mid = ctx.bld_root.declare("a.mid")
+        return [make_task(ctx, "second", a_mid, ctx.bld_root.declare("a.out"), _slow_copy),
+                make_task(ctx, "first", ctx.src_root.find_node("a.in"), a_mid, _slow_copy),
+                make_task(ctx, "other", ctx.src_root.find_node("b.in"),
+                           ctx.bld_root.declare("b.out"))]
+
+    def _check_trace(self):
+        tracer = self.ctx.tracer
+        self.assertEqual(len(tracer.records), 3)
+        self.assertEqual([r.status for r in tracer.records], ["run"] * 3)
+
+        path = tracer.critical_path()
+        self.assertEqual([r.task.name for r in path], ["first", "second"])
+
+        filename = os.path.join(self.d, "trace.json")
+        tracer.write(filename)
+        fid = open(filename)
+        try:
+            events = json.load(fid)["traceEvents"]
+        finally:
+            fid.close()
+        self.assertEqual(len(events), 3)
+        for e in events:
+            self.assertEqual(e["ph"], "X")
+            self.assertTrue(e["dur"] >= 0)
+        self.assertTrue("Critical path" in tracer.summary())
+
+    def test_serial(self):
+        runner = SerialRunner(self.ctx, TaskManager(self._tasks()))
+        runner.start()
+        runner.run()
+        self._check_trace()
+
+    def test_parallel(self):
+        runner = DependencyRunner(self.ctx, TaskManager(self._tasks()), 2)
+        runner.start()
+        runner.run()
+        self._check_trace()
+
+    def test_uptodate(self):
+        tasks = self._tasks()
+        runner = SerialRunner(self.ctx, TaskManager(tasks))
+        runner.run()
+
+        self.ctx.tracer = Tracer()
+        runner = SerialRunner(self.ctx, TaskManager(tasks))
+        runner.run()
+        self.assertEqual([r.status for r in self.ctx.tracer.records], ["uptodate"] * 3)
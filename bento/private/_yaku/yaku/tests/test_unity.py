@@ -0,0 +1,91 @@
+import os
+import subprocess
+
+from yaku.tests.test_helpers \
+    import \
+        TmpContextBase, require_cc
+from yaku.context \
+    import \
+        get_cfg, get_bld
+from yaku.scheduler \
+    import \
+        run_tasks
+from yaku.unity \
+    import \
+        split_sources, unity_count, unity_sources
+
+# Two sources defining the same static function: they cannot be merged
+_SOURCES = {
+    "main.c": "int foo(void); int bar(void);\nint main(void) { return foo() + bar() - 3; }\n",
+    "foo.c": "static int helper(void) { return 1; }\nint foo(void) { return helper(); }\n",
+    "bar.c": "static int helper(void) { return 2; }\nint bar(void) { return helper(); }\n",
+    "fubar.c": "int fubar(void) { return 0; }\n",
+}
+
+class SplitSourcesTest(TmpContextBase):
+    def test_split(self):
+        self.assertEqual(split_sources([1, 2, 3, 4, 5], 2), [[1, 2, 3], [4, 5]])
+        self.assertEqual(split_sources([1, 2, 3], 3), [[1], [2], [3]])
+        self.assertEqual(split_sources([1], 3), [[1]])
+
+    def test_count(self):
+        self.assertEqual(unity_count(10), 1)
+        self.assertEqual(unity_count(10, 4), 4)
+        self.assertEqual(unity_count(2, 4), 2)
+        self.assertEqual(unity_count(0, 4), 1)
+
+class UnitySourcesTest(TmpContextBase):
+    def setUp(self):
+        super(UnitySourcesTest, self).setUp()
+        ctx = get_cfg()
+        ctx.store()
+        self.ctx = get_bld()
+        self.sources = []
+        for name in sorted(_SOURCES):
+            node = self.ctx.src_root.make_node(name)
+            node.write(_SOURCES[name])
+            self.sources.append(node)
+
+    def test_units(self):
+        bar, foo, fubar, main = self.sources
+        sources, members = unity_sources(self.ctx, "foo", self.sources, 2, [bar])
+        self.assertEqual(len(sources), 3)
+        self.assertEqual(sources[2], bar)
+        units = sources[:2]
+        self.assertEqual([members[u] for u in units], [[foo, fubar], [main]])
+        code = units[0].read()
+        self.assertTrue('#include "%s"' % os.path.relpath(foo.abspath(), units[0].parent.abspath())
+                        in code)
+
+    def test_jobs(self):
+        self.ctx.jobs = 2
+        sources, members = unity_sources(self.ctx, "foo", self.sources)
+        self.assertEqual(len(sources), 2)
+        self.assertEqual(sum([len(m) for m in members.values()]), 4)
+
+        # one unit per source: nothing is merged
+        self.ctx.jobs = 4
+        sources, members = unity_sources(self.ctx, "foo", self.sources)
+        self.assertEqual(sources, self.sources)
+        self.assertEqual(members, {})
+
+class UnityBuildTest(TmpContextBase):
+    @require_cc
+    def test_program(self):
+        ctx = get_cfg()
+        ctx.use_tools(["ctasks"])
+        ctx.store()
+
+        for name in sorted(_SOURCES):
+            ctx.src_root.make_node(name).write(_SOURCES[name])
+
+        ctx = get_bld()
+        builder = ctx.builders["ctasks"]
+        outputs = builder.program("main", sorted(_SOURCES), unity=1,
+                                  unity_exclude=["bar.c"])
+        run_tasks(ctx)
+        ctx.store()
+
+        self.assertEqual(subprocess.call([outputs[0].abspath()]), 0)
+        objects = [t for t in ctx.tasks if t.name == "cc"]
+        self.assertEqual(len(objects), 2)
@@ -16,10 +16,11 @@ from yaku.scheduler \
         run_tasks
 from yaku.conf \
     import \
-        with_conf_blddir, create_file, write_log
+        with_conf_blddir, create_file, write_log, write_cached_log
 from yaku.utils \
     import \
         get_exception
+import yaku.unity
 
 def import_tools(tool_list, tooldirs=None):
     old_sys = sys.path[:]
@@ -63,6 +64,24 @@ class Builder(object):
     def configure(self):
         pass
 
+    def apply_unity(self, task_gen, unity, unity_exclude=None):
+        """Merge the sources of task_gen into unity build units (see
+        yaku.unity).
+
+        unity may be True (one unit per parallel job), or a number of units.
+        unity_exclude lists the sources which must be compiled on their
+        own."""
+        if unity is True:
+            count = None
+        else:
+            count = unity
+        if unity_exclude:
+            exclude = self.to_nodes(unity_exclude)
+        else:
+            exclude = []
+        task_gen.sources, task_gen.unity_members = yaku.unity.unity_sources(
+                self.ctx, task_gen.target, task_gen.sources, count, exclude)
+
     def _task_gen_factory(self, name, target, sources, env):
         sources = self.to_nodes(sources)
 
@@ -76,7 +95,13 @@ class Builder(object):
         outputs = tasks[0].outputs[:]
         return outputs
 
-def try_task_maker(conf, task_maker, name, body, headers, env=None):
+def try_task_maker(conf, task_maker, name, body, headers, env=None, cache=True):
+    """Run the check made of the tasks created by task_maker.
+
+    If cache is True and conf has a configure check cache, the result of the
+    check may come from the cache, in which case its tasks are not run and
+    conf.last_task is None. Checks whose outputs are used by later checks
+    must not be cached."""
     if headers:
         head = "\n".join(["#include <%s>" % h for h in headers])
     else:
@@ -96,6 +121,21 @@ def try_task_maker(conf, task_maker, name, body, headers, env=None):
         t.disable_output = True
         t.log = conf.log
 
+    if cache:
+        conf_cache = getattr(conf, "conf_cache", None)
+    else:
+        conf_cache = None
+    if conf_cache is not None:
+        kind = "%s.%s" % (getattr(task_maker, "__self__", task_maker).__class__.__name__,
+                          task_maker.__name__)
+        key = conf_cache.check_key(kind, code, task_gen.env)
+        succeed = conf_cache.get(key)
+        if succeed is not None:
+            # the tasks did not run: their outputs may not exist
+            conf.last_task = None
+            write_cached_log(conf, conf.log, code, succeed)
+            return succeed
+
     succeed = False
     explanation = None
     try:
@@ -108,6 +148,8 @@ def try_task_maker(conf, task_maker, name, body, headers, env=None):
             #raise
     finally:
         write_log(conf, conf.log, tasks, code, succeed, explanation)
+    if conf_cache is not None:
+        conf_cache.set(key, succeed)
     return succeed
 
 def _merge_env(_env, new_env):
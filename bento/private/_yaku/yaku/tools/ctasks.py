@@ -16,6 +16,12 @@ from yaku.utils \
 from yaku.compiled_fun \
     import \
         compile_fun
+from yaku.include_scanner \
+    import \
+        scan_includes, include_dir_nodes
+from yaku.unity \
+    import \
+        all_sources
 from yaku.errors \
     import \
         TaskRunFailure
@@ -53,6 +59,7 @@ def ccompile_task(self, node):
 
     task = task_factory("cc")(inputs=[node], outputs=[target], func=ccompile, env=self.env)
     task.gen = self
+    task.scan = scan_includes
     task.env_vars = cc_vars
     return [task]
 
@@ -68,6 +75,7 @@ def shared_ccompile_task(self, node):
 
     task = task_factory("shcc")(inputs=[node], outputs=[target], func=shccompile, env=self.env)
     task.gen = self
+    task.scan = scan_includes
     task.env_vars = cc_vars
     return [task]
 
@@ -117,8 +125,13 @@ def apply_define(task_gen):
 
 def apply_cpppath(task_gen):
     cpppaths = task_gen.env["CPPPATH"]
-    implicit_paths = set([s.parent.srcpath() \
-                          for s in task_gen.sources])
+    # ordered, so that the command line (part of the task signature) is
+    # stable from one build to the next
+    implicit_paths = []
+    for s in all_sources(task_gen):
+        path = s.parent.srcpath()
+        if not path in implicit_paths:
+            implicit_paths.append(path)
     srcnode = task_gen.sources[0].ctx.srcnode
 
     relcpppaths = []
@@ -129,7 +142,8 @@ def apply_cpppath(task_gen):
             relcpppaths.append(node.bldpath())
         else:
             relcpppaths.append(p)
-    cpppaths = list(implicit_paths) + relcpppaths
+    cpppaths = implicit_paths + relcpppaths
+    task_gen.include_dirs = include_dir_nodes(task_gen, task_gen.env["CPPPATH"])
     task_gen.env["INCPATH"] = [
             task_gen.env["CPPPATH_FMT"] % p
             for p in cpppaths]
@@ -177,12 +191,15 @@ class CCBuilder(yaku.tools.Builder):
                                 lambda : yaku.tools.try_task_maker(self.ctx, self._compile, name, body, headers))
 
     def try_compile_no_blddir(self, name, body, headers=None, env=None):
-        return yaku.tools.try_task_maker(self.ctx, self._compile, name, body, headers, env)
+        return yaku.tools.try_task_maker(self.ctx, self._compile, name, body, headers, env,
+                                         cache=False)
 
-    def static_library(self, name, sources, env=None):
+    def static_library(self, name, sources, env=None, unity=False, unity_exclude=None):
         sources = self.to_nodes(sources)
         task_gen = CompiledTaskGen("ccstaticlib", self.ctx, sources, name)
         task_gen.env = yaku.tools._merge_env(self.env, env)
+        if unity:
+            self.apply_unity(task_gen, unity, unity_exclude)
 
         tasks = self._static_library(task_gen, name)
         self.ctx.tasks.extend(tasks)
@@ -210,12 +227,15 @@ class CCBuilder(yaku.tools.Builder):
                                 lambda : yaku.tools.try_task_maker(self.ctx, self._static_library, name, body, headers))
 
     def try_static_library_no_blddir(self, name, body, headers=None, env=None):
-        return yaku.tools.try_task_maker(self.ctx, self._static_library, name, body, headers, env)
+        return yaku.tools.try_task_maker(self.ctx, self._static_library, name, body, headers, env,
+                                         cache=False)
 
-    def shared_library(self, name, sources, env=None):
+    def shared_library(self, name, sources, env=None, unity=False, unity_exclude=None):
         sources = self.to_nodes(sources)
         task_gen = CompiledTaskGen("ccsharedlib", self.ctx, sources, name)
         task_gen.env = yaku.tools._merge_env(self.env, env)
+        if unity:
+            self.apply_unity(task_gen, unity, unity_exclude)
 
         tasks = self._shared_library(task_gen, name)
         self.ctx.tasks.extend(tasks)
@@ -247,13 +267,16 @@ class CCBuilder(yaku.tools.Builder):
                                 lambda : yaku.tools.try_task_maker(self.ctx, self._shared_library, name, body, headers))
 
     def try_shared_library_no_blddir(self, name, body, headers=None, env=None):
-        return yaku.tools.try_task_maker(self.ctx, self._shared_library, name, body, headers, env)
+        return yaku.tools.try_task_maker(self.ctx, self._shared_library, name, body, headers, env,
+                                         cache=False)
 
-    def program(self, name, sources, env=None):
+    def program(self, name, sources, env=None, unity=False, unity_exclude=None):
         sources = self.to_nodes(sources)
         task_gen = CompiledTaskGen("ccprogram", self.ctx,
                                    sources, name)
         task_gen.env = yaku.tools._merge_env(self.env, env)
+        if unity:
+            self.apply_unity(task_gen, unity, unity_exclude)
         tasks = self._program(task_gen, name)
 
         self.ctx.tasks.extend(tasks)
@@ -281,7 +304,8 @@ class CCBuilder(yaku.tools.Builder):
                                 lambda : yaku.tools.try_task_maker(self.ctx, self._program, name, body, headers, env))
 
     def try_program_no_blddir(self, name, body, headers=None, env=None):
-        return yaku.tools.try_task_maker(self.ctx, self._program, name, body, headers, env)
+        return yaku.tools.try_task_maker(self.ctx, self._program, name, body, headers, env,
+                                         cache=False)
 
     def configure(self, candidates=None):
         ctx = self.ctx
@@ -16,6 +16,9 @@ from yaku.utils \
 from yaku.compiled_fun \
     import \
         compile_fun
+from yaku.include_scanner \
+    import \
+        scan_includes
 from yaku.tools.ctasks \
     import \
         apply_cpppath, apply_libdir, apply_libs, apply_define
@@ -38,10 +41,8 @@ def cxxcompile_task(self, node):
 
     task = task_factory("cxx")(inputs=[node], outputs=[target])
     task.gen = self
+    task.scan = scan_includes
     task.env_vars = cxx_vars
-    #print find_deps("foo.c", ["."])
-    #task.scan = lambda : find_deps(node, ["."])
-    #task.deps.extend(task.scan())
     task.env = self.env
     task.func = cxxcompile
     return [task]
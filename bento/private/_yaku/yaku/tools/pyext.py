@@ -21,6 +21,12 @@ from yaku.sysconfig \
 from yaku.compiled_fun \
     import \
         compile_fun
+from yaku.include_scanner \
+    import \
+        scan_includes, include_dir_nodes
+from yaku.unity \
+    import \
+        all_sources
 from yaku.task \
     import \
         task_factory
@@ -152,6 +158,7 @@ def pycc_task(self, node):
 
     task = task_factory("pycc")(inputs=[node], outputs=[target])
     task.gen = self
+    task.scan = scan_includes
     task.env_vars = pycc_vars
     task.env = self.env
     task.func = pycc
@@ -170,6 +177,7 @@ def pycxx_task(self, node):
 
     task = task_factory("pycxx")(inputs=[node], outputs=[target])
     task.gen = self
+    task.scan = scan_includes
     task.env_vars = pycxx_vars
     task.env = self.env
     task.func = pycxx
@@ -258,11 +266,13 @@ class PythonBuilder(yaku.tools.Builder):
         set_extension_hook(".cxx", old_hook_cxx)
         return tasks
 
-    def extension(self, name, sources, env=None):
+    def extension(self, name, sources, env=None, unity=False, unity_exclude=None):
         sources = self.to_nodes(sources)
         task_gen = CompiledTaskGen("pyext", self.ctx, sources, name)
         task_gen.bld = self.ctx
         task_gen.env = yaku.tools._merge_env(self.env, env)
+        if unity:
+            self.apply_unity(task_gen, unity, unity_exclude)
         tasks = self._extension(task_gen, name)
         self.ctx.tasks.extend(tasks)
 
@@ -520,8 +530,13 @@ def apply_libpath(task_gen):
 
 def apply_cpppath(task_gen):
     cpppaths = task_gen.env["PYEXT_CPPPATH"]
-    implicit_paths = set([s.parent.srcpath() \
-                          for s in task_gen.sources])
+    # ordered, so that the command line (part of the task signature) is
+    # stable from one build to the next
+    implicit_paths = []
+    for s in all_sources(task_gen):
+        path = s.parent.srcpath()
+        if not path in implicit_paths:
+            implicit_paths.append(path)
     srcnode = task_gen.sources[0].ctx.srcnode
 
     relcpppaths = []
@@ -532,7 +547,8 @@ def apply_cpppath(task_gen):
             relcpppaths.append(node.bldpath())
         else:
             relcpppaths.append(p)
-    cpppaths = list(implicit_paths) + relcpppaths
+    cpppaths = implicit_paths + relcpppaths
+    task_gen.include_dirs = include_dir_nodes(task_gen, task_gen.env["PYEXT_CPPPATH"])
     task_gen.env["PYEXT_INCPATH"] = [
             task_gen.env["PYEXT_CPPPATH_FMT"] % p
             for p in cpppaths]
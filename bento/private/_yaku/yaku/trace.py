@@ -0,0 +1,177 @@
+"""Timeline of task execution.
+
+When a Tracer instance is attached to a build context (ctx.tracer), the
+runners of yaku.scheduler record, for each task, its start and end times, the
+worker which ran it, its command line and how it was handled (run, restored
+from the task cache, or up to date). The timeline can be written in the trace
+event format understood by chrome://tracing and Perfetto, and summarized as
+text (slowest tasks and critical path).
+"""
+import json
+import time
+import threading
+
+from yaku.task_manager \
+    import \
+        TaskGraph, run_task
+
+# Value of the status of a task which raised an exception
+FAILED = "failed"
+
+class TaskRecord(object):
+    def __init__(self, task, start, end, worker, status, cmd):
+        self.task = task
+        self.start = start
+        self.end = end
+        self.worker = worker
+        self.status = status
+        self.cmd = cmd
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+class Tracer(object):
+    """Records the execution of the tasks of a build (thread-safe)."""
+    def __init__(self):
+        self.records = []
+        self._commands = {}
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+
+    def clock(self):
+        return time.time() - self._t0
+
+    def set_command(self, task, cmd):
+        self._lock.acquire()
+        try:
+            self._commands[task] = cmd[:]
+        finally:
+            self._lock.release()
+
+    def add_task(self, task, start, end, worker, status):
+        self._lock.acquire()
+        try:
+            cmd = self._commands.pop(task, None)
+            self.records.append(TaskRecord(task, start, end, worker, status, cmd))
+        finally:
+            self._lock.release()
+
+    def trace_events(self):
+        """Return the records as a list of trace events (complete events,
+        timestamps in microseconds)."""
+        events = []
+        for r in sorted(self.records, key=lambda r: r.start):
+            args = {"status": r.status,
+                    "inputs": [i.bldpath() for i in r.task.inputs],
+                    "outputs": [o.bldpath() for o in r.task.outputs]}
+            if r.cmd is not None:
+                args["cmd"] = " ".join([str(c) for c in r.cmd])
+            events.append({"name": _task_label(r.task),
+                           "cat": r.status,
+                           "ph": "X",
+                           "ts": int(r.start * 1e6),
+                           "dur": int(r.duration * 1e6),
+                           "pid": 0,
+                           "tid": r.worker,
+                           "args": args})
+        return events
+
+    def write(self, filename):
+        """Write the timeline as a trace event JSON file."""
+        fid = open(filename, "w")
+        try:
+            json.dump({"traceEvents": self.trace_events(),
+                       "displayTimeUnit": "ms"}, fid)
+        finally:
+            fid.close()
+
+    def critical_path(self):
+        """Return the chain of records with the largest total duration,
+        following the producer/consumer dependencies between tasks."""
+        records = dict([(r.task, r) for r in self.records])
+        graph = TaskGraph(list(records.keys()))
+
+        # longest[t] = (duration of the longest chain ending with t, previous
+        # record of the chain)
+        longest = {}
+        def _longest(task):
+            # iterative depth-first traversal, to be safe on deep graphs
+            stack = [task]
+            while stack:
+                t = stack[-1]
+                if t in longest:
+                    stack.pop()
+                    continue
+                missing = [p for p in graph.producers[t] if not p in longest]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                stack.pop()
+                best, previous = 0.0, None
+                for p in graph.producers[t]:
+                    if longest[p][0] > best:
+                        best, previous = longest[p][0], p
+                longest[t] = (best + records[t].duration, previous)
+            return longest[task]
+
+        end, end_length = None, -1.0
+        for t in records:
+            length = _longest(t)[0]
+            if length > end_length:
+                end, end_length = t, length
+
+        path = []
+        while end is not None:
+            path.append(records[end])
+            end = longest[end][1]
+        path.reverse()
+        return path
+
+    def summary(self, n=10):
+        """Return a text summary of the n slowest tasks and of the critical
+        path."""
+        lines = []
+        if not self.records:
+            return "No task recorded"
+
+        start = min([r.start for r in self.records])
+        end = max([r.end for r in self.records])
+        counts = {}
+        for r in self.records:
+            counts[r.status] = counts.get(r.status, 0) + 1
+        lines.append("%d tasks in %.3fs (%s)" % (len(self.records), end - start,
+                     ", ".join(["%d %s" % (counts[k], k) for k in sorted(counts)])))
+
+        lines.append("Slowest tasks:")
+        slowest = sorted(self.records, key=lambda r: -r.duration)[:n]
+        for r in slowest:
+            lines.append("  %8.3fs  %s" % (r.duration, _task_label(r.task)))
+
+        path = self.critical_path()
+        total = sum([r.duration for r in path])
+        lines.append("Critical path (%.3fs):" % total)
+        for r in path:
+            lines.append("  %8.3fs  %s" % (r.duration, _task_label(r.task)))
+        return "\n".join(lines)
+
+def _task_label(task):
+    if task.outputs:
+        return "%s %s" % (task.name, task.outputs[0].bldpath())
+    else:
+        return task.name
+
+def run_traced_task(ctx, task, worker=0):
+    """Run the given task, recording it in ctx.tracer if tracing is
+    enabled."""
+    tracer = getattr(ctx, "tracer", None)
+    if tracer is None:
+        return run_task(ctx, task)
+
+    start = tracer.clock()
+    status = FAILED
+    try:
+        status = run_task(ctx, task)
+        return status
+    finally:
+        tracer.add_task(task, start, tracer.clock(), worker, status)
@@ -0,0 +1,123 @@
+"""Unity (jumbo) builds.
+
+Building many small C sources is dominated by the start-up of the compiler
+and by parsing the same headers (e.g. Python.h) again for every source. In
+unity mode, the sources of a task generator are merged, through #include
+directives, into a few generated translation units, one per parallel job, so
+that the units are still compiled concurrently.
+
+Sources which cannot be merged (static symbols defined in several sources,
+conflicting macros, ...) are given in an exclude list, and compiled on their
+own.
+"""
+import os
+
+from yaku.utils \
+    import \
+        ensure_dir
+
+# Sources with those extensions are merged, separately for each language
+UNITY_EXTENSIONS = [[".c"], [".cxx", ".cpp", ".cc"]]
+
+def unity_count(n_sources, jobs=None):
+    """Return the number of translation units for n_sources sources built
+    with jobs parallel jobs."""
+    if not jobs:
+        jobs = 1
+    return max(1, min(n_sources, jobs))
+
+def split_sources(sources, count):
+    """Split sources in count contiguous batches, whose sizes differ by one at
+    most."""
+    size, extra = divmod(len(sources), count)
+    batches = []
+    start = 0
+    for i in range(count):
+        end = start + size
+        if i < extra:
+            end += 1
+        if end > start:
+            batches.append(sources[start:end])
+        start = end
+    return batches
+
+def unit_code(unit, members):
+    """Return the code of the translation unit node unit, including the
+    source nodes members."""
+    lines = ["/* Unity build unit generated by yaku: do not edit */"]
+    for m in members:
+        path = os.path.relpath(m.abspath(), unit.parent.abspath())
+        lines.append('#include "%s"' % path.replace(os.sep, "/"))
+    return "\n".join(lines) + "\n"
+
+def _write_if_changed(node, code):
+    # The unit is only rewritten when its list of sources changes, so that
+    # it does not look modified to the next build
+    path = node.abspath()
+    if os.path.exists(path) and node.read() == code:
+        return
+    ensure_dir(path)
+    node.write(code)
+
+def all_sources(task_gen):
+    """Return the sources of task_gen, including the sources merged in its
+    units."""
+    sources = list(task_gen.sources)
+    members = getattr(task_gen, "unity_members", {})
+    seen = set(sources)
+    for s in task_gen.sources:
+        for m in members.get(s, []):
+            if not m in seen:
+                seen.add(m)
+                sources.append(m)
+    return sources
+
+def unity_sources(ctx, name, sources, count=None, exclude=None):
+    """Merge sources into translation units generated in the build directory.
+
+    Parameters
+    ----------
+    ctx: BuildContext
+        build context, whose current path is where the units are declared
+    name: str
+        name of the built target, used to name the units
+    sources: list
+        source nodes
+    count: int
+        number of translation units per language. If None, it is chosen
+        from the number of parallel jobs of ctx (see unity_count)
+    exclude: list
+        source nodes which must not be merged
+
+    Returns
+    -------
+    sources: list
+        the sources to compile: the units, followed by the sources which were
+        not merged
+    members: dict
+        unit node -> list of the source nodes it includes"""
+    if exclude is None:
+        exclude = []
+    base = name.replace(".", os.sep)
+
+    units = []
+    members = {}
+    merged = set()
+    for exts in UNITY_EXTENSIONS:
+        mergeable = [s for s in sources
+                     if os.path.splitext(s.name)[1] in exts and not s in exclude]
+        if count is None:
+            n = unity_count(len(mergeable), getattr(ctx, "jobs", None))
+        else:
+            n = min(count, len(mergeable))
+        # nothing to gain if every unit would contain one source
+        if n < 1 or n >= len(mergeable):
+            continue
+        for i, batch in enumerate(split_sources(mergeable, n)):
+            unit = ctx.path.declare("%s_unity%d%s" % (base, i, exts[0]))
+            _write_if_changed(unit, unit_code(unit, batch))
+            units.append(unit)
+            members[unit] = batch
+            merged.update(batch)
+
+    return units + [s for s in sources if not s in merged], members
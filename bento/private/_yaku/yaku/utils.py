@@ -104,6 +104,43 @@ def find_program(program, path_list=None):
 
     return None
 
+def available_memory():
+    """Return the memory available to new processes without swapping, in
+    bytes, or None if it cannot be determined."""
+    try:
+        fid = open("/proc/meminfo")
+        try:
+            for line in fid:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+        finally:
+            fid.close()
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def communicate_with_rusage(p):
+    """Wait for the subprocess.Popen instance p (created with stdout=PIPE),
+    and return its output and its peak resident set size in bytes (None if
+    not available on this platform)."""
+    if not hasattr(os, "wait4"):
+        return p.communicate()[0], None
+    stdout = p.stdout.read()
+    p.stdout.close()
+    pid, status, rusage = os.wait4(p.pid, 0)
+    if os.WIFSIGNALED(status):
+        p.returncode = -os.WTERMSIG(status)
+    else:
+        p.returncode = os.WEXITSTATUS(status)
+    # ru_maxrss is in bytes on darwin, in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return stdout, rusage.ru_maxrss
+    else:
+        return stdout, rusage.ru_maxrss * 1024
+
 if sys.version_info[0] < 3:
     from yaku._utils_py2 import join_bytes, function_code
     def is_string(s):
@@ -14,8 +14,8 @@ from py_compile \
 if sys.version_info[0] < 3:
     from _bytecode_2 \
         import \
-            bcompile
+            bcompile, compile_code, pyc_header
 else:
     from bento.private._bytecode_3 \
         import \
-            bcompile
+            bcompile, compile_code, pyc_header
@@ -1,3 +1,6 @@
+import os
+import sys
+import stat
 import errno
 import shutil
 
@@ -18,3 +21,95 @@ def rename(source, target):
         else:
             raise
 
+if sys.platform.startswith("linux"):
+    # _IOW(0x94, 9, int), clones the data blocks of a file (btrfs, xfs)
+    _FICLONE = 0x40049409
+else:
+    _FICLONE = None
+
+# Errors meaning that the kernel cannot copy between the given files
+_NO_KERNEL_COPY = set([errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EBADF,
+                       errno.ENOTTY, getattr(errno, "ENOTSUP", errno.EINVAL),
+                       getattr(errno, "EOPNOTSUPP", errno.EINVAL)])
+
+def _copy_file_range(fsrc, fdst, count):
+    return os.copy_file_range(fsrc, fdst, count)
+
+def _sendfile(fsrc, fdst, count):
+    return os.sendfile(fdst, fsrc, None, count)
+
+_KERNEL_COPIES = []
+if hasattr(os, "copy_file_range"):
+    _KERNEL_COPIES.append(_copy_file_range)
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    # sendfile only accepts regular files as input on linux
+    _KERNEL_COPIES.append(_sendfile)
+
+def _kernel_copy(fsrc, fdst, size):
+    """Copy size bytes from the current position of the file descriptor fsrc
+    to fdst, without going through user space. Return False if no kernel
+    copy is possible between these files."""
+    for func in _KERNEL_COPIES:
+        copied = 0
+        while copied < size:
+            try:
+                n = func(fsrc, fdst, size - copied)
+            except OSError:
+                e = extract_exception()
+                if copied == 0 and e.errno in _NO_KERNEL_COPY:
+                    break
+                raise
+            if n == 0:
+                # source truncated meanwhile
+                return True
+            copied += n
+        else:
+            return True
+    return False
+
+# (source device, target device) pairs on which cloning failed
+_NO_REFLINK = set()
+
+def _reflink(fsrc, fdst):
+    if _FICLONE is None:
+        return False
+    devices = (os.fstat(fsrc).st_dev, os.fstat(fdst).st_dev)
+    if devices in _NO_REFLINK:
+        return False
+    import fcntl
+    try:
+        fcntl.ioctl(fdst, _FICLONE, fsrc)
+    except (IOError, OSError):
+        _NO_REFLINK.add(devices)
+        return False
+    return True
+
+def remove_if_exists(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        e = extract_exception()
+        if e.errno != errno.ENOENT:
+            raise
+
+def copy_file(source, target, reflink=False):
+    """Copy the content and permission bits of source to target.
+
+    The data is copied by the kernel (copy_file_range, sendfile) when
+    possible, or shared with source (copy-on-write clone) if reflink is True
+    and the file system supports it. An existing target is removed first
+    instead of being overwritten, as it may be a hard link to source."""
+    fsrc = open(source, "rb")
+    try:
+        st = os.fstat(fsrc.fileno())
+        remove_if_exists(target)
+        fdst = open(target, "wb")
+        try:
+            if not (reflink and _reflink(fsrc.fileno(), fdst.fileno())) \
+                    and not _kernel_copy(fsrc.fileno(), fdst.fileno(), st.st_size):
+                shutil.copyfileobj(fsrc, fdst)
+        finally:
+            fdst.close()
+    finally:
+        fsrc.close()
+    os.chmod(target, stat.S_IMODE(st.st_mode))
@@ -22,7 +22,7 @@ from bento.compat.api.moves \
 from bento.utils.utils \
     import subst_vars, to_camel_case, explode_path, same_content, \
         cmd_is_runnable, memoized, comma_list_split, cpu_count, pprint, \
-        virtualenv_prefix
+        virtualenv_prefix, stat_key
 from bento.utils.io2 \
     import \
         safe_write
@@ -247,6 +247,21 @@ class TestVirtualEnvPrefix(unittest.TestCase):
     def test_virtualenv(self):
         self.assertEqual(virtualenv_prefix(), "yoyo")
 
+class TestStatKey(unittest.TestCase):
+    def test_racy(self):
+        fid = NamedTemporaryFile(delete=False)
+        try:
+            fid.close()
+            self.assertEqual(stat_key(os.stat(fid.name)), None)
+
+            old = os.stat(fid.name).st_mtime - 10
+            os.utime(fid.name, (old, old))
+            key = stat_key(os.stat(fid.name))
+            self.assertEqual(key[0], old)
+            self.assertEqual(key, stat_key(os.stat(fid.name)))
+        finally:
+            os.remove(fid.name)
+
 class TestCpuCount(unittest.TestCase):
     def test_native(self):
         self.assertTrue(cpu_count() > 0)
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+
+import os.path as op
+
+from bento.compat.api.moves \
+    import \
+        unittest
+
+from bento.utils.watch \
+    import \
+        PollingWatcher, InotifyWatcher, is_ignored
+
+class _TestWatcher(object):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        os.makedirs(op.join(self.d, "src"))
+        os.makedirs(op.join(self.d, "build"))
+        self.source = op.join(self.d, "src", "foo.c")
+        self._write(self.source, "int foo;\n")
+        self.watcher = self._create_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.d)
+
+    def _create_watcher(self):
+        raise NotImplementedError()
+
+    def _write(self, path, content):
+        fid = open(path, "w")
+        try:
+            fid.write(content)
+        finally:
+            fid.close()
+
+    def test_nothing(self):
+        self.assertEqual(self.watcher.wait(0.1), [])
+
+    def test_changes(self):
+        # a burst of changes is reported at once
+        self._write(self.source, "int foo2;\n")
+        new = op.join(self.d, "src", "bar.c")
+        self._write(new, "int bar;\n")
+        self.assertEqual(self.watcher.wait(5), sorted([self.source, new]))
+
+        os.remove(new)
+        self.assertEqual(self.watcher.wait(5), [new])
+
+    def test_new_directory(self):
+        new = op.join(self.d, "src", "sub", "bar.c")
+        os.makedirs(op.dirname(new))
+        self._write(new, "int bar;\n")
+        self.assertTrue(new in self.watcher.wait(5))
+
+    def test_ignored(self):
+        self._write(op.join(self.d, "build", "foo.o"), "")
+        self._write(op.join(self.d, "src", ".foo.c.swp"), "")
+        self._write(op.join(self.d, "src", "foo.c~"), "")
+        self.assertEqual(self.watcher.wait(0.5), [])
+
+class TestPollingWatcher(_TestWatcher, unittest.TestCase):
+    def _create_watcher(self):
+        return PollingWatcher([self.d], excludes=[op.join(self.d, "build")],
+                              delay=0.05, interval=0.05)
+
+class TestInotifyWatcher(_TestWatcher, unittest.TestCase):
+    def setUp(self):
+        try:
+            InotifyWatcher([]).close()
+        except OSError:
+            raise unittest.SkipTest("inotify not available")
+        super(TestInotifyWatcher, self).setUp()
+
+    def _create_watcher(self):
+        return InotifyWatcher([self.d], excludes=[op.join(self.d, "build")], delay=0.05)
+
+class TestIgnored(unittest.TestCase):
+    def test_ignored(self):
+        for name in [".git", "foo.c~", ".foo.c.swp", "#foo.c#", "foo.pyc", "__pycache__"]:
+            self.assertTrue(is_ignored(name), name)
+        for name in ["foo.c", "foo.py", "bento.info"]:
+            self.assertFalse(is_ignored(name), name)
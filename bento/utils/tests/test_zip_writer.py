@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import zipfile
+import zlib
+
+import os.path as op
+
+from bento.compat.api.moves \
+    import \
+        unittest
+
+from bento.utils.zip_writer \
+    import \
+        ParallelZipFile, DigestCache
+
+class TestParallelZipFile(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.files = {}
+        for i in range(20):
+            name = op.join(self.d, "file%d.txt" % i)
+            content = ("line %d\n" % i).encode("ascii") * (i * 1000)
+            fid = open(name, "wb")
+            try:
+                fid.write(content)
+            finally:
+                fid.close()
+            self.files["foo/file%d.txt" % i] = (name, content)
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def _write(self, filename, jobs):
+        zid = ParallelZipFile(filename, jobs)
+        try:
+            for arcname in sorted(self.files):
+                zid.write(self.files[arcname][0], arcname)
+            zid.writestr("EGG-INFO/PKG-INFO", "Name: foo\n".encode("ascii"))
+        finally:
+            zid.close()
+        return zid
+
+    def test_simple(self):
+        filename = op.join(self.d, "foo.zip")
+        zid = self._write(filename, 4)
+
+        z = zipfile.ZipFile(filename)
+        try:
+            self.assertTrue(z.testzip() is None)
+            self.assertEqual(z.namelist(), sorted(self.files) + ["EGG-INFO/PKG-INFO"])
+            for arcname, (name, content) in self.files.items():
+                self.assertEqual(z.read(arcname), content)
+            self.assertEqual(z.read("EGG-INFO/PKG-INFO"), "Name: foo\n".encode("ascii"))
+        finally:
+            z.close()
+
+        for arcname, sha256, size, crc in zid.members():
+            if arcname in self.files:
+                content = self.files[arcname][1]
+                self.assertEqual(sha256, hashlib.sha256(content).digest())
+                self.assertEqual(size, len(content))
+                self.assertEqual(crc, zlib.crc32(content) & 0xffffffff)
+
+    def test_deterministic(self):
+        serial = op.join(self.d, "serial.zip")
+        parallel = op.join(self.d, "parallel.zip")
+        self._write(serial, 1)
+        self._write(parallel, 8)
+
+        z1, z2 = zipfile.ZipFile(serial), zipfile.ZipFile(parallel)
+        try:
+            self.assertEqual(z1.namelist(), z2.namelist())
+            for name in self.files:
+                self.assertEqual(z1.getinfo(name).CRC, z2.getinfo(name).CRC)
+                self.assertEqual(z1.getinfo(name).compress_size,
+                                 z2.getinfo(name).compress_size)
+        finally:
+            z1.close()
+            z2.close()
+
+    def test_precomputed_digest(self):
+        arcname = "foo/file1.txt"
+        name, content = self.files[arcname]
+        filename = op.join(self.d, "foo.zip")
+        zid = ParallelZipFile(filename, 2)
+        try:
+            zid.write(name, arcname, "dummy".encode("ascii"), zlib.crc32(content) & 0xffffffff)
+        finally:
+            zid.close()
+        self.assertEqual(zid.members()[0][1], "dummy".encode("ascii"))
+
+    def test_missing_file(self):
+        filename = op.join(self.d, "foo.zip")
+        zid = ParallelZipFile(filename, 2)
+        try:
+            self.assertRaises(OSError, lambda: zid.write(op.join(self.d, "nofile"), "nofile"))
+        finally:
+            zid.close()
+
+class TestDigestCache(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.cache_file = op.join(self.d, "build", "digests.bin")
+        self.filename = op.join(self.d, "foo.txt")
+        self._write_old("foo")
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def _write_old(self, content):
+        fid = open(self.filename, "w")
+        try:
+            fid.write(content)
+        finally:
+            fid.close()
+        old = time.time() - 10
+        os.utime(self.filename, (old, old))
+
+    def test_simple(self):
+        cache = DigestCache(self.cache_file)
+        self.assertEqual(cache.get(self.filename), (None, None))
+        cache.set(self.filename, cache.stat(self.filename), "digest", 1)
+        cache.close()
+
+        cache = DigestCache(self.cache_file)
+        self.assertEqual(cache.get(self.filename), ("digest", 1))
+
+        self._write_old("foobar")
+        self.assertEqual(cache.get(self.filename), (None, None))
+
+    def test_racy(self):
+        cache = DigestCache(self.cache_file)
+        os.utime(self.filename, None)
+        cache.set(self.filename, cache.stat(self.filename), "digest", 1)
+        self.assertEqual(cache.get(self.filename), (None, None))
+
+    def test_invalid(self):
+        os.makedirs(op.dirname(self.cache_file))
+        fid = open(self.cache_file, "w")
+        try:
+            fid.write("garbage")
+        finally:
+            fid.close()
+        cache = DigestCache(self.cache_file)
+        self.assertEqual(cache.get(self.filename), (None, None))
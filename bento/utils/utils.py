@@ -1,6 +1,7 @@
 import os
 import sys
 import stat
+import time
 import re
 import glob
 import shutil
@@ -161,6 +162,19 @@ def cpu_count():
         return 1
         #raise NotImplementedError('cannot determine number of cpus')
 
+# Files modified less than RACY_DELAY seconds ago cannot be trusted through
+# their stat: a second modification within the timestamp granularity of the
+# filesystem would leave it unchanged.
+RACY_DELAY = 2
+
+def stat_key(st):
+    """Return a key of the stat result st which changes with the file
+    content, or None if the file was modified less than RACY_DELAY seconds
+    ago."""
+    if st.st_mtime > time.time() - RACY_DELAY:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
 def same_content(f1, f2):
     """Return true if files in f1 and f2 has the same content."""
     fid1 = open(f1, "rb")
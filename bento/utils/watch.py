@@ -0,0 +1,302 @@
+"""
+Watchers of file changes, for bentomaker build --watch.
+
+InotifyWatcher is notified by the kernel of the changes in the watched trees
+(Linux only, through ctypes). PollingWatcher stats every file of the trees at
+a fixed interval, and is used when inotify is not available (other platforms,
+inotify watches limit reached...). Both coalesce bursts of changes (a
+checkout, an editor saving several files...): the changes are only reported
+once no change was seen for some delay.
+"""
+import os
+import re
+import sys
+import time
+import errno
+import select
+import struct
+
+from bento.utils.utils \
+    import \
+        extract_exception
+
+# Seconds without change after which a burst of changes is reported
+DEFAULT_DELAY = 0.2
+# Bursts are reported after this many seconds, even if changes keep coming
+MAX_BURST = 2.0
+# Interval between two scans of PollingWatcher, in seconds
+DEFAULT_INTERVAL = 0.5
+
+# Files written by editors, VCS and python itself, never built from
+_IGNORED = re.compile(r"^(\..*|#.*|.*~|.*\.sw[px]|.*\.py[co]|__pycache__)$")
+
+def is_ignored(name):
+    return _IGNORED.match(name) is not None
+
+def _is_below(path, directory):
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+class _Watcher(object):
+    def __init__(self, roots, excludes=None, delay=DEFAULT_DELAY):
+        self.roots = [os.path.abspath(p) for p in roots]
+        self.excludes = [os.path.abspath(p) for p in (excludes or [])]
+        self.delay = delay
+
+    def is_watched(self, path):
+        for exclude in self.excludes:
+            if _is_below(path, exclude):
+                return False
+        return not is_ignored(os.path.basename(path))
+
+    def wait(self, timeout=None):
+        """Block until some files are created, modified or removed, and
+        return their sorted absolute paths, or [] if nothing changed within
+        timeout seconds (wait forever if timeout is None)."""
+        if timeout is None:
+            end = None
+        else:
+            end = time.time() + timeout
+        while True:
+            if end is None:
+                remaining = None
+            else:
+                remaining = max(end - time.time(), 0)
+            changed = set(self._changes(remaining))
+            if changed:
+                break
+            if end is not None and time.time() >= end:
+                return []
+
+        burst_end = time.time() + MAX_BURST
+        while time.time() < burst_end:
+            more = self._changes(self.delay)
+            if not more:
+                break
+            changed.update(more)
+        return sorted(changed)
+
+    def _changes(self, timeout):
+        """Return the changed paths seen within timeout seconds, without
+        waiting any longer once there is one."""
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+class PollingWatcher(_Watcher):
+    """Watcher comparing the stat of every file of the watched trees at a
+    fixed interval."""
+    def __init__(self, roots, excludes=None, delay=DEFAULT_DELAY, interval=DEFAULT_INTERVAL):
+        super(PollingWatcher, self).__init__(roots, excludes, delay)
+        self.interval = interval
+        self._stats = self._scan()
+
+    def _scan(self):
+        stats = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames
+                               if self.is_watched(os.path.join(dirpath, d))]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if self.is_watched(path):
+                        try:
+                            st = os.stat(path)
+                        except OSError:
+                            continue
+                        stats[path] = (st.st_mtime, st.st_size, st.st_ino)
+        return stats
+
+    def _changes(self, timeout):
+        if timeout is None:
+            end = None
+        else:
+            end = time.time() + timeout
+        while True:
+            if end is None:
+                time.sleep(self.interval)
+            else:
+                time.sleep(max(min(self.interval, end - time.time()), 0))
+            stats = self._scan()
+            old, self._stats = self._stats, stats
+            changed = [p for p in set(stats) | set(old)
+                       if stats.get(p, None) != old.get(p, None)]
+            if changed or (end is not None and time.time() >= end):
+                return changed
+
+#----------------------
+# inotify (Linux only)
+#----------------------
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0x800
+IN_CLOEXEC = 0x80000
+
+_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO \
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+
+_EVENT = struct.Struct("iIII")
+
+_LIBC = []
+
+def _get_libc():
+    """Return the C library if it implements inotify, None otherwise."""
+    if not _LIBC:
+        libc = None
+        if sys.platform.startswith("linux"):
+            try:
+                import ctypes
+                import ctypes.util
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                                   use_errno=True)
+                libc.inotify_init1
+                libc.inotify_add_watch
+            except (ImportError, OSError, AttributeError):
+                libc = None
+        _LIBC.append(libc)
+    return _LIBC[0]
+
+def _fsencode(path):
+    if isinstance(path, bytes):
+        return path
+    return path.encode(sys.getfilesystemencoding())
+
+def _fsdecode(name):
+    if sys.version_info[0] < 3:
+        return name
+    return name.decode(sys.getfilesystemencoding(), "surrogateescape")
+
+class InotifyWatcher(_Watcher):
+    """Watcher notified of the changes by the kernel, through one inotify
+    watch per directory of the watched trees.
+
+    Raises OSError if inotify is not available, or if the watches limit is
+    reached (see /proc/sys/fs/inotify/max_user_watches)."""
+    def __init__(self, roots, excludes=None, delay=DEFAULT_DELAY):
+        super(InotifyWatcher, self).__init__(roots, excludes, delay)
+        self._libc = _get_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            self._raise()
+        # watch descriptor -> watched directory
+        self._dirs = {}
+        try:
+            for root in self.roots:
+                self._add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _raise(self):
+        import ctypes
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+
+    def _add_tree(self, top):
+        """Watch the directory top and its subdirectories, and return the
+        files found in them."""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames
+                           if self.is_watched(os.path.join(dirpath, d))]
+            wd = self._libc.inotify_add_watch(self._fd, _fsencode(dirpath), _WATCH_MASK)
+            if wd < 0:
+                self._raise()
+            self._dirs[wd] = dirpath
+            files.extend([os.path.join(dirpath, name) for name in filenames])
+        return files
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError:
+            e = extract_exception()
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+
+        changed = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = _fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: everything may have changed
+                changed.extend(self.roots)
+                continue
+            directory = self._dirs.get(wd, None)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            if mask & IN_DELETE_SELF:
+                changed.append(directory)
+                continue
+
+            path = os.path.join(directory, name)
+            if not self.is_watched(path):
+                continue
+            changed.append(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # the files created before the watch was added are reported
+                # as well
+                try:
+                    changed.extend([p for p in self._add_tree(path) if self.is_watched(p)])
+                except OSError:
+                    e = extract_exception()
+                    if e.errno != errno.ENOENT:
+                        raise
+        return changed
+
+    def _changes(self, timeout):
+        if timeout is None:
+            end = None
+        else:
+            end = time.time() + timeout
+        while True:
+            if end is None:
+                remaining = None
+            else:
+                remaining = max(end - time.time(), 0)
+            try:
+                ready = select.select([self._fd], [], [], remaining)[0]
+            except (select.error, OSError):
+                e = extract_exception()
+                if e.args[0] != errno.EINTR:
+                    raise
+                ready = []
+            if ready:
+                changed = self._read_events()
+                if changed:
+                    return changed
+            if end is not None and time.time() >= end:
+                return []
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def create_watcher(roots, excludes=None, delay=DEFAULT_DELAY):
+    """Return an inotify watcher of the given trees, or a polling watcher if
+    inotify cannot be used."""
+    try:
+        return InotifyWatcher(roots, excludes, delay)
+    except OSError:
+        return PollingWatcher(roots, excludes, delay)
@@ -0,0 +1,328 @@
+"""Zip archive writer which compresses members in parallel.
+
+Members are deflated by a pool of worker threads (zlib and hashlib release the
+GIL on large buffers), each member being read once: its crc32 and optionally
+its sha256 digest are computed while it is being compressed. Compressed
+members are then appended to the archive in the order in which they were
+added, so that the produced archive does not depend on the number of jobs.
+
+Zip64 extensions are not supported.
+"""
+import os
+import sys
+import time
+import zlib
+import struct
+import shutil
+import hashlib
+import tempfile
+import threading
+import zipfile
+
+from collections \
+    import \
+        deque
+
+from six.moves \
+    import \
+        queue, cPickle
+
+from bento.utils.utils \
+    import \
+        cpu_count, extract_exception, stat_key
+import bento.utils.io2
+import bento.utils.path
+
+# Size of the blocks read from member files
+_BLOCK_SIZE = 1 << 20
+# Compressed members bigger than this are spooled to disk
+_SPOOL_SIZE = 8 << 20
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_LOCAL_MAGIC = "PK\003\004".encode("ascii")
+_CENTRAL_MAGIC = "PK\001\002".encode("ascii")
+_END_MAGIC = "PK\005\006".encode("ascii")
+
+_ZIP_VERSION = 20
+_UTF8_FLAG = 0x800
+_LIMIT = 0xffffffff
+
+if sys.platform == "win32":
+    _CREATE_SYSTEM = 0
+else:
+    _CREATE_SYSTEM = 3
+
+def _dos_date_time(timestamp):
+    t = time.localtime(timestamp)
+    if t[0] < 1980:
+        return (0 << 9) | (1 << 5) | 1, 0
+    date = ((t[0] - 1980) << 9) | (t[1] << 5) | t[2]
+    dostime = (t[3] << 11) | (t[4] << 5) | (t[5] // 2)
+    return date, dostime
+
+def _encode_name(arcname):
+    if not isinstance(arcname, bytes):
+        # Same normalization as zipfile
+        arcname = arcname.replace(os.sep, "/")
+        if os.altsep:
+            arcname = arcname.replace(os.altsep, "/")
+        try:
+            return arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return arcname.encode("utf-8"), _UTF8_FLAG
+    return arcname, 0
+
+class _Member(object):
+    def __init__(self, arcname, filename=None, data=None, sha256=None,
+                 crc=None):
+        self.arcname = arcname
+        self.filename = filename
+        self.data = data
+        if filename is not None:
+            st = os.stat(filename)
+            self.mtime = st.st_mtime
+            self.external_attr = (st.st_mode & 0xFFFF) << 16
+        else:
+            self.mtime = time.time()
+            self.external_attr = (0x180 | 0x8000) << 16
+        # Precomputed digest and crc32: the content is not hashed again
+        self.sha256 = sha256
+        self.crc = crc
+        self.size = 0
+        self.compressed_size = 0
+        self.compressed = None
+        self.error = None
+        self.done = threading.Event()
+
+    def _blocks(self):
+        if self.data is not None:
+            yield self.data
+        else:
+            fid = open(self.filename, "rb")
+            try:
+                while True:
+                    block = fid.read(_BLOCK_SIZE)
+                    if not block:
+                        break
+                    yield block
+            finally:
+                fid.close()
+
+    def compress(self):
+        if self.sha256 is None:
+            h = hashlib.sha256()
+        else:
+            h = None
+        crc = 0
+        size = 0
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                      zlib.DEFLATED, -15)
+        out = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+        try:
+            for block in self._blocks():
+                size += len(block)
+                if self.crc is None:
+                    crc = zlib.crc32(block, crc)
+                if h is not None:
+                    h.update(block)
+                out.write(compressor.compress(block))
+            out.write(compressor.flush())
+        except:
+            out.close()
+            raise
+        self.data = None
+
+        if self.crc is None:
+            self.crc = crc & 0xffffffff
+        if h is not None:
+            self.sha256 = h.digest()
+        self.size = size
+        self.compressed_size = out.tell()
+        out.seek(0)
+        self.compressed = out
+
+class ParallelZipFile(object):
+    """Write-only, deflated zip archive, whose members are compressed in
+    parallel.
+
+    Parameters
+    ----------
+    filename: str
+        archive to create
+    jobs: int or None
+        number of compression threads (number of CPUs if None)
+    """
+    def __init__(self, filename, jobs=None):
+        if jobs is None:
+            jobs = cpu_count()
+        self.jobs = max(1, jobs)
+
+        self._fid = open(filename, "wb")
+        self._entries = []
+        self._members = []
+        self._pending = deque()
+        # Limit the number of compressed members waiting to be written
+        self._window = 2 * self.jobs
+        self._queue = queue.Queue()
+        self._threads = []
+        for i in range(self.jobs):
+            t = threading.Thread(target=self._worker)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            member = self._queue.get()
+            if member is None:
+                break
+            try:
+                member.compress()
+            except Exception:
+                member.error = extract_exception()
+            member.done.set()
+
+    def _add(self, member):
+        if self._fid is None:
+            raise ValueError("Attempt to write to a closed zip archive")
+        self._queue.put(member)
+        self._pending.append(member)
+        while len(self._pending) > self._window:
+            self._write_member(self._pending.popleft())
+        return member
+
+    def write(self, filename, arcname, sha256=None, crc=None):
+        """Add the given file as arcname. If the sha256 digest (raw bytes)
+        and crc32 of the file content are given, they are not computed
+        again."""
+        self._add(_Member(arcname, filename=filename, sha256=sha256, crc=crc))
+
+    def writestr(self, arcname, data):
+        """Add the given bytes as arcname."""
+        self._add(_Member(arcname, data=data))
+
+    def _write_member(self, member):
+        member.done.wait()
+        if member.error is not None:
+            raise member.error
+
+        try:
+            offset = self._fid.tell()
+            if offset > _LIMIT or member.size > _LIMIT \
+                    or member.compressed_size > _LIMIT:
+                raise zipfile.LargeZipFile("Zip64 extensions are not supported")
+            name, flags = _encode_name(member.arcname)
+            date, dostime = _dos_date_time(member.mtime)
+            self._fid.write(_LOCAL_HEADER.pack(_LOCAL_MAGIC,
+                    _ZIP_VERSION, 0, flags, zipfile.ZIP_DEFLATED, dostime, date,
+                    member.crc, member.compressed_size, member.size,
+                    len(name), 0))
+            self._fid.write(name)
+            shutil.copyfileobj(member.compressed, self._fid, _BLOCK_SIZE)
+        finally:
+            member.compressed.close()
+            member.compressed = None
+        self._entries.append((member, name, flags, date, dostime, offset))
+        self._members.append(member)
+
+    def _write_central_directory(self):
+        if len(self._entries) > 0xffff:
+            raise zipfile.LargeZipFile("Zip64 extensions are not supported")
+        start = self._fid.tell()
+        for member, name, flags, date, dostime, offset in self._entries:
+            self._fid.write(_CENTRAL_HEADER.pack(_CENTRAL_MAGIC,
+                    _ZIP_VERSION, _CREATE_SYSTEM, _ZIP_VERSION, 0, flags,
+                    zipfile.ZIP_DEFLATED, dostime, date, member.crc,
+                    member.compressed_size, member.size, len(name), 0, 0, 0, 0,
+                    member.external_attr, offset))
+            self._fid.write(name)
+        end = self._fid.tell()
+        if start > _LIMIT or end - start > _LIMIT:
+            raise zipfile.LargeZipFile("Zip64 extensions are not supported")
+        self._fid.write(_END_RECORD.pack(_END_MAGIC, 0, 0,
+                len(self._entries), len(self._entries), end - start, start, 0))
+
+    def members(self):
+        """Return the list of (arcname, sha256 digest, size, crc32) of the
+        members written so far."""
+        return [(m.arcname, m.sha256, m.size, m.crc) for m in self._members]
+
+    def flush(self):
+        """Wait for every added member, and write it into the archive."""
+        while self._pending:
+            self._write_member(self._pending.popleft())
+
+    def close(self):
+        if self._fid is None:
+            return
+        try:
+            self.flush()
+            self._write_central_directory()
+        finally:
+            self._stop()
+            self._fid.close()
+            self._fid = None
+
+    def _stop(self):
+        # Outstanding members are still compressed by the workers, but their
+        # output is discarded
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        while self._pending:
+            member = self._pending.popleft()
+            if member.compressed is not None:
+                member.compressed.close()
+
+class DigestCache(object):
+    """Persistent {filename: (sha256 digest, crc32)} cache, where an entry is
+    only valid as long as the file mtime and size are unchanged."""
+    __version__ = 1
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._dirty = False
+        self._data = {}
+        if os.path.exists(filename):
+            try:
+                fid = open(filename, "rb")
+                try:
+                    version, data = cPickle.load(fid)
+                finally:
+                    fid.close()
+                if version == self.__version__:
+                    self._data = data
+            except Exception:
+                self._dirty = True
+
+    def get(self, filename):
+        """Return (sha256, crc32) of the given file, or (None, None) if
+        unknown or outdated."""
+        entry = self._data.get(filename, None)
+        if entry is not None and entry[0] == self.stat(filename):
+            return entry[1], entry[2]
+        return None, None
+
+    def stat(self, filename):
+        """Return the key to give to set for the given file. It has to be
+        computed before reading the file content."""
+        # recently modified files are not recorded
+        return stat_key(os.stat(filename))
+
+    def set(self, filename, key, sha256, crc):
+        if key is None:
+            self._data.pop(filename, None)
+        else:
+            self._data[filename] = (key, sha256, crc)
+        self._dirty = True
+
+    def close(self):
+        if self._dirty:
+            def _writer(fid):
+                cPickle.dump((self.__version__, self._data), fid, 2)
+            bento.utils.path.ensure_dir(self.filename)
+            bento.utils.io2.safe_write(self.filename, _writer)
+            self._dirty = False
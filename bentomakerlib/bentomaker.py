@@ -13,36 +13,16 @@ from bento.utils.utils \
         pprint, extract_exception
 from bento._config \
     import \
-        BENTO_SCRIPT, DB_FILE, _SUB_BUILD_DIR
+        BENTO_SCRIPT, DB_FILE, CMD_SIGNATURES, DIR_SNAPSHOT, DAEMON_SOCKET, \
+        _SUB_BUILD_DIR
 from bento.core \
     import \
         PackageDescription
 from bento.compat.api \
     import \
-        defaultdict, input
+        input
 import bento.core.node
 
-from bento.commands.build \
-    import \
-        BuildCommand
-from bento.commands.build_egg \
-    import \
-        BuildEggCommand
-from bento.commands.build_wheel \
-    import \
-        BuildWheelCommand
-from bento.commands.build_pkg_info \
-    import \
-        BuildPkgInfoCommand
-from bento.commands.build_wininst \
-    import \
-        BuildWininstCommand
-from bento.commands.configure \
-    import \
-        ConfigureCommand
-from bento.commands.core \
-    import \
-        HelpCommand
 from bento.commands.dependency \
     import \
         CommandScheduler
@@ -50,27 +30,9 @@ from bento.commands.hooks \
     import \
         find_pre_hooks, find_post_hooks, find_startup_hooks, \
         find_shutdown_hooks, find_options_hooks, find_command_hooks
-from bento.commands.install \
-    import \
-        InstallCommand
-from bento.commands.parse \
-    import \
-        ParseCommand
-from bento.commands.register \
-    import \
-        RegisterPyPI
 from bento.commands.registries \
     import \
         CommandRegistry, ContextRegistry, OptionsRegistry
-from bento.commands.sdist \
-    import \
-        SdistCommand
-from bento.commands.sphinx_command \
-    import \
-        SphinxCommand
-from bento.commands.upload \
-    import \
-        UploadPyPI
 from bento.commands.options \
     import \
         OptionsContext, Option
@@ -78,21 +40,12 @@ from bento.commands.options \
 from bento.backends.utils \
     import \
         load_backend
-from bento.backends.yaku_backend \
-    import \
-        BuildYakuContext, ConfigureYakuContext
-from bento.commands.command_contexts \
-    import \
-        HelpContext, SdistContext, ContextWithBuildDirectory
 from bento.commands.wrapper_utils \
     import \
         set_main, run_with_dependencies
 from bento.commands.contexts \
     import \
         GlobalContext
-from bento.convert \
-    import \
-        ConvertCommand, DetectTypeCommand
 import bento.errors
 
 from bentomakerlib.package_cache \
@@ -112,9 +65,15 @@ SCRIPT_NAME = 'bentomaker'
 # Path relative to build directory
 CMD_DATA_DUMP = os.path.join(_SUB_BUILD_DIR, "cmd_data.db")
 
+class _PackageChanged(Exception):
+    """Raised in watch mode when the bento or hook files changed: everything
+    is set up again from them."""
+    pass
+
 class GlobalOptions(object):
     def __init__(self, cmd_name, cmd_argv, show_usage, build_directory,
-            bento_info, show_version, show_full_version, disable_autoconfigure):
+            bento_info, show_version, show_full_version, disable_autoconfigure,
+            dir_snapshot=False, daemon=False):
         self.cmd_name = cmd_name
         self.cmd_argv = cmd_argv
         self.show_usage = show_usage
@@ -123,48 +82,62 @@ class GlobalOptions(object):
         self.show_version = show_version
         self.show_full_version = show_full_version
         self.disable_autoconfigure = disable_autoconfigure
+        self.dir_snapshot = dir_snapshot
+        self.daemon = daemon
 
 #================================
 #   Create the command line UI
 #================================
+# (command name, import path of the command class, public). Command modules
+# are only imported when the command is run (or listed by help), to keep
+# bentomaker startup fast.
+COMMANDS = [
+    ("help", "bento.commands.core:HelpCommand", True),
+    ("configure", "bento.commands.configure:ConfigureCommand", True),
+    ("build", "bento.commands.build:BuildCommand", True),
+    ("install", "bento.commands.install:InstallCommand", True),
+    ("convert", "bento.convert:ConvertCommand", True),
+    ("sdist", "bento.commands.sdist:SdistCommand", True),
+    ("build_egg", "bento.commands.build_egg:BuildEggCommand", True),
+    ("build_wheel", "bento.commands.build_wheel:BuildWheelCommand", True),
+    ("build_wininst", "bento.commands.build_wininst:BuildWininstCommand", True),
+    ("sphinx", "bento.commands.sphinx_command:SphinxCommand", True),
+    ("register_pypi", "bento.commands.register:RegisterPyPI", True),
+    ("upload_pypi", "bento.commands.upload:UploadPyPI", True),
+
+    ("build_pkg_info", "bento.commands.build_pkg_info:BuildPkgInfoCommand", False),
+    ("parse", "bento.commands.parse:ParseCommand", False),
+    ("detect_type", "bento.convert:DetectTypeCommand", False),
+]
+
+# command name -> import path of its context class (default:
+# ContextWithBuildDirectory)
+_CONTEXT_WITH_BUILD_DIRECTORY = "bento.commands.command_contexts:ContextWithBuildDirectory"
+COMMAND_CONTEXTS = {
+    "configure": "bento.backends.yaku_backend:ConfigureYakuContext",
+    "build": "bento.backends.yaku_backend:BuildYakuContext",
+    "sdist": "bento.commands.command_contexts:SdistContext",
+    "help": "bento.commands.command_contexts:HelpContext",
+}
+
 def register_commands(global_context):
-    global_context.register_command("help", HelpCommand())
-    global_context.register_command("configure", ConfigureCommand())
-    global_context.register_command("build", BuildCommand())
-    global_context.register_command("install", InstallCommand())
-    global_context.register_command("convert", ConvertCommand())
-    global_context.register_command("sdist", SdistCommand())
-    global_context.register_command("build_egg", BuildEggCommand())
-    global_context.register_command("build_wheel", BuildWheelCommand())
-    global_context.register_command("build_wininst", BuildWininstCommand())
-    global_context.register_command("sphinx", SphinxCommand())
-    global_context.register_command("register_pypi", RegisterPyPI())
-    global_context.register_command("upload_pypi", UploadPyPI())
-
-    global_context.register_command("build_pkg_info", BuildPkgInfoCommand(), public=False)
-    global_context.register_command("parse", ParseCommand(), public=False)
-    global_context.register_command("detect_type", DetectTypeCommand(), public=False)
- 
+    for cmd_name, path, public in COMMANDS:
+        global_context.register_lazy_command(cmd_name, path, public=public)
+
     if sys.platform == "darwin":
-        import bento.commands.build_mpkg
-        global_context.register_command("build_mpkg",
-            bento.commands.build_mpkg.BuildMpkgCommand(), public=False)
+        global_context.register_lazy_command("build_mpkg",
+            "bento.commands.build_mpkg:BuildMpkgCommand", public=False)
         global_context.set_before("build_mpkg", "build")
 
     if sys.platform == "win32":
-        from bento.commands.build_msi \
-            import \
-                BuildMsiCommand
-        global_context.register_command("build_msi", BuildMsiCommand())
+        global_context.register_lazy_command("build_msi",
+            "bento.commands.build_msi:BuildMsiCommand")
         global_context.set_before("build_msi", "build")
 
 def register_options(global_context, cmd_name):
-    """Register options for the given command."""
-    cmd = global_context.retrieve_command(cmd_name)
-    context = OptionsContext.from_command(cmd)
-
+    """Register options for the given command (created when first used)."""
     if not global_context.is_options_context_registered(cmd_name):
-        global_context.register_options_context(cmd_name, context)
+        global_context.register_lazy_options_context(cmd_name)
 
 def register_options_special(global_context):
     # Register options for special topics not attached to a "real" command
@@ -184,21 +157,10 @@ def register_options_special(global_context):
     global_context.register_options_context_without_command("globals", context)
 
 def register_command_contexts(global_context):
-   # global_context.register_default_context(CmdContext)
-    default_mapping = defaultdict(lambda: ContextWithBuildDirectory)
-    default_mapping.update(dict([
-            ("configure", ConfigureYakuContext),
-            ("build", BuildYakuContext),
-            ("build_egg", ContextWithBuildDirectory),
-            ("build_wininst", ContextWithBuildDirectory),
-            ("build_mpkg", ContextWithBuildDirectory),
-            ("install", ContextWithBuildDirectory),
-            ("sdist", SdistContext),
-            ("help", HelpContext)]))
-
     for cmd_name in global_context.command_names(public_only=False):
         if not global_context.is_command_context_registered(cmd_name):
-            global_context.register_command_context(cmd_name, default_mapping[cmd_name])
+            path = COMMAND_CONTEXTS.get(cmd_name, _CONTEXT_WITH_BUILD_DIRECTORY)
+            global_context.register_lazy_command_context(cmd_name, path)
 
 # All the global state/registration stuff goes here
 def register_stuff(global_context):
@@ -216,7 +178,12 @@ def main(argv=None):
 
     if argv is None:
         argv = sys.argv[1:]
+    return run_main(argv)
 
+def run_main(argv, use_daemon=True):
+    """Run bentomaker with the given arguments (main without the root user
+    check). The command is run by the daemon of the build directory if
+    --daemon is given, and use_daemon is True."""
     options_context = create_global_options_context()
     popts = parse_global_options(options_context, argv)
 
@@ -233,19 +200,56 @@ def main(argv=None):
     source_root = os.path.join(os.getcwd(), os.path.dirname(popts.bento_info))
     build_root = os.path.join(os.getcwd(), popts.build_directory)
 
+    if popts.daemon and use_daemon:
+        # socket and threads are only imported for the daemon
+        from bentomakerlib.daemon import is_served, run_client
+        if is_served(cmd_name, popts.cmd_argv):
+            status = run_client(os.path.join(build_root, DAEMON_SOCKET), argv)
+            # the command is run here if the daemon cannot be used
+            if status is not None:
+                if status:
+                    sys.exit(status)
+                return
+
     top_node, build_node, run_node = bento.core.node.create_base_nodes(source_root, build_root)
     if run_node != top_node and run_node.is_src():
         raise bento.errors.UsageException("You cannot execute bentomaker in a subdirectory of the source tree !")
     if run_node != build_node and run_node.is_bld():
         raise bento.errors.UsageException("You cannot execute bentomaker in a subdirectory of the build tree !")
 
+    if popts.dir_snapshot:
+        from bento.core.dir_snapshot import DirSnapshot
+        # The build directory is written during the run: only the source tree
+        # is snapshotted
+        snapshot = DirSnapshot(build_node.make_node(DIR_SNAPSHOT).abspath(),
+                               roots=[top_node.abspath()], excludes=[build_node.abspath()])
+        bento.core.node.set_dir_snapshot(snapshot)
+    else:
+        snapshot = None
+    try:
+        while True:
+            try:
+                return _main_with_nodes(options_context, popts, run_node, top_node, build_node)
+            except _PackageChanged:
+                pprint("PINK", "Package description changed, reloading it")
+    finally:
+        if snapshot is not None:
+            bento.core.node.set_dir_snapshot(None)
+            snapshot.close()
+
+def _main_with_nodes(options_context, popts, run_node, top_node, build_node):
+    cmd_name = popts.cmd_name
+
     global_context = GlobalContext(build_node.make_node(CMD_DATA_DUMP),
                                    CommandRegistry(), ContextRegistry(),
-                                   OptionsRegistry(), CommandScheduler())
+                                   OptionsRegistry(), CommandScheduler(),
+                                   build_node.make_node(CMD_SIGNATURES))
     global_context.register_options_context_without_command("", options_context)
 
     if not popts.disable_autoconfigure:
+        from bento.commands.configure import configure_signature
         global_context.set_before("build", "configure")
+        global_context.register_command_signature("configure", configure_signature)
     global_context.set_before("build_egg", "build")
     global_context.set_before("build_wheel", "build")
     global_context.set_before("build_wininst", "build")
@@ -330,6 +334,8 @@ def _wrapped_main(global_context, popts, run_node, top_node, build_node):
     finally:
         if shutdown_hooks:
             shutdown_hooks[0](global_context)
+        if cached_package is not None:
+            cached_package.close()
 
 def create_global_options_context():
     context = OptionsContext(usage="%prog [options] [cmd_name [cmd_options]]")
@@ -349,6 +355,18 @@ def create_global_options_context():
 Do not automatically run configure before build. In this mode, the user is
 expected to know what he is doing. This is mainly useful for developers, to
 avoid running configure everytime (default: '%default')."""))
+    context.add_option(Option("--dir-snapshot", dest="dir_snapshot", action="store_true",
+                              default=False,
+                              help="""\
+Keep a snapshot of the source tree directories in the build directory, so
+that only the directories are stat'ed when looking up files. Useful on slow
+(e.g. network) filesystems (default: '%default')."""))
+    context.add_option(Option("--daemon", dest="daemon", action="store_true",
+                              default=False,
+                              help="""\
+Run the configure, build, sdist and install --list-files commands in a
+bentomaker server process, started if needed, which keeps bento loaded
+between commands, and exits after some idle time (default: '%default')."""))
     context.add_option(Option("-h", "--help", dest="show_help", action="store_true",
                               help="Display help and exit"))
     context.parser.set_defaults(show_version=False, show_full_version=False, show_help=False,
@@ -383,7 +401,7 @@ def parse_global_options(context, argv):
 
     global_options = GlobalOptions(cmd_name, cmd_argv, show_usage,
             build_directory, bento_info, show_version, show_full_version,
-            o.disable_autoconfigure)
+            o.disable_autoconfigure, o.dir_snapshot, o.daemon)
     return global_options
 
 def _main(global_context, cached_package, popts, run_node, top_node, build_node):
@@ -471,13 +489,89 @@ def run_cmd(global_context, cached_package, cmd_name, cmd_argv, run_node, top_no
     if bento_info is None:
         raise bento.errors.UsageException("Error: no %s found !" % os.path.join(top_node.abspath(), BENTO_SCRIPT))
 
+    if is_watch(global_context, cmd_name, cmd_argv):
+        watch_cmd(global_context, cached_package, cmd_name, cmd_argv, run_node, top_node, build_node)
+        return
+
     running_package = get_running_package(global_context, cached_package, bento_info)
     run_with_dependencies(global_context, cmd_name, cmd_argv, run_node, top_node, running_package)
 
     global_context.save_command_argv(cmd_name, cmd_argv)
     global_context.store()
 
+def is_watch(global_context, cmd_name, cmd_argv):
+    p = global_context.retrieve_options_context(cmd_name)
+    o, a = p.parser.parse_args(cmd_argv)
+    return getattr(o, "watch", False) is True
+
+def watch_cmd(global_context, cached_package, cmd_name, cmd_argv, run_node, top_node, build_node):
+    """Run the command, and run it again each time files of the source tree
+    change, until interrupted (bentomaker build --watch).
+
+    The global context, the package and the node trees are kept between runs.
+    The context of the last run handles the changes which cannot alter the
+    package (see BuildContext.rebuild), by only running the tasks affected
+    by the changed files. Build errors are reported without leaving the
+    loop."""
+    from bento.utils.watch import create_watcher
+    from bento.commands.configure import _package_files
+
+    watcher = create_watcher([top_node.abspath()], excludes=[build_node.abspath()])
+    try:
+        try:
+            context = None
+            changed = []
+            package_files = set()
+            while True:
+                try:
+                    if context is None or not context.rebuild(changed):
+                        context = None
+                        bento_info = top_node.find_node(BENTO_SCRIPT)
+                        running_package = get_running_package(global_context, cached_package, bento_info)
+                        package_files = set([top_node.make_node(f).abspath()
+                                             for f in _package_files(running_package)])
+                        cmd, context = run_with_dependencies(global_context, cmd_name, cmd_argv,
+                                                             run_node, top_node, running_package)
+                        global_context.save_command_argv(cmd_name, cmd_argv)
+                        global_context.store()
+                except Exception:
+                    if BENTOMAKER_DEBUG:
+                        traceback.print_exc()
+                    e = extract_exception()
+                    pprint("RED", "%s: %s" % (e.__class__.__name__, e))
+                    # the state of the failed run cannot be trusted: run the
+                    # command again on the next change
+                    context = None
+
+                pprint("PINK", "Watching %s for changes (Ctrl+C to stop)" % top_node.abspath())
+                changed = watcher.wait()
+                if package_files.intersection(changed):
+                    raise _PackageChanged()
+                _forget_removed_nodes(top_node, changed)
+        except KeyboardInterrupt:
+            pass
+    finally:
+        watcher.close()
+
+def _forget_removed_nodes(top_node, paths):
+    snapshot = bento.core.node.get_dir_snapshot()
+    if snapshot is not None:
+        snapshot.refresh()
+    for path in paths:
+        if not os.path.exists(path):
+            node = top_node.search(os.path.relpath(path, top_node.abspath()))
+            if node is not None and node is not top_node:
+                node.evict()
+
 def noexc_main(argv=None):
+    status = run_noexc(main, argv)
+    if status:
+        sys.exit(status)
+
+def run_noexc(func, *args):
+    """Call func with the given arguments, printing the errors, and return
+    the exit status of bentomaker: 2 after a bento error, 1 after a crash and
+    0 otherwise."""
     def _print_debug():
         if BENTOMAKER_DEBUG:
             tb = sys.exc_info()[2]
@@ -489,12 +583,12 @@ def noexc_main(argv=None):
                           "BENTOMAKER_DEBUG=1 environment variable)")
 
     try:
-        main(argv)
+        func(*args)
     except bento.errors.BentoError:
         _print_debug()
         e = extract_exception()
         _print_error(str(e))
-        sys.exit(2)
+        return 2
     except Exception:
         msg = """\
 %s: Error: %s crashed (uncaught exception %s: %s).
@@ -506,7 +600,8 @@ Please report this on bento issue tracker:
             _print_debug()
         e = extract_exception()
         pprint('RED',  msg % (SCRIPT_NAME, SCRIPT_NAME, e.__class__, str(e)))
-        sys.exit(1)
+        return 1
+    return 0
 
 if __name__ == '__main__':
     noexc_main()
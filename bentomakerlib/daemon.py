@@ -0,0 +1,397 @@
+"""
+bentomaker daemon: a server process per build directory, running bentomaker
+commands for thin clients (bentomaker --daemon ...).
+
+Every bentomaker run imports bento, loads the package cache and fills the
+registries before doing anything. The daemon does so once: the modules stay
+imported, and the package cache stays loaded between the requests. It listens
+on a Unix socket in the build directory, runs one request at a time, streams
+its output back to the client, and exits after IDLE_TIMEOUT seconds without
+request (BENTOMAKER_DAEMON_TIMEOUT environment variable).
+
+The protocol is made of JSON lines. The client sends one request:
+
+    {"key": ..., "argv": [...], "cwd": ..., "env": {...}}
+
+and the server answers with {"out": text} and {"err": text} messages, and
+finally {"exit": status}, or {"error": reason} if it refused the request.
+
+The client side is meant to be light: client_main, the entry point of the
+bentomaker script, only imports bentomakerlib.bentomaker for the commands not
+sent to a daemon.
+"""
+import os
+import sys
+import time
+import errno
+import socket
+import threading
+
+try:
+    import json
+except ImportError:
+    from bento.compat.api import json
+
+import bento
+
+from bento._config \
+    import \
+        DAEMON_SOCKET
+
+def extract_exception():
+    # bento.utils.utils is not imported by the client, see module docstring
+    return sys.exc_info()[1]
+
+# Seconds without request after which the daemon exits
+IDLE_TIMEOUT = int(os.environ.get("BENTOMAKER_DAEMON_TIMEOUT", 600))
+# The daemon checks that it still owns its socket at this interval
+_POLL_INTERVAL = 5
+# Seconds given to a new daemon to listen to its socket
+_START_TIMEOUT = 10
+
+# Commands run by the daemon: the other ones are run by the client
+SERVED_COMMANDS = ["configure", "build", "sdist"]
+
+def is_available():
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+def is_served(cmd_name, cmd_argv):
+    """Return True if the daemon can run the given command."""
+    if cmd_argv and "--watch" in cmd_argv:
+        # would keep the daemon busy
+        return False
+    if cmd_name in SERVED_COMMANDS:
+        return True
+    # install only when listing the files
+    return cmd_name == "install" and \
+        len(set(["-n", "--dry-run", "--list-files"]).intersection(cmd_argv or [])) > 0
+
+def _split_argv(argv):
+    """Return the global options, the command name and the command arguments
+    (see bentomakerlib.bentomaker.parse_global_options)."""
+    for i, a in enumerate(argv):
+        if not a.startswith("-"):
+            return argv[:i], a, argv[i+1:]
+    return argv, None, []
+
+def _build_directory(global_args):
+    """Return the --build-directory option, or None if it cannot be found
+    without the full option parser."""
+    build_directory = "build"
+    args = list(global_args)
+    while args:
+        a = args.pop(0)
+        if a == "--build-directory" and args:
+            build_directory = args.pop(0)
+        elif a.startswith("--build-directory="):
+            build_directory = a[len("--build-directory="):]
+        elif a.startswith("--b"):
+            # abbreviated option
+            return None
+    return build_directory
+
+def client_main(argv=None):
+    """Entry point of bentomaker, sending the commands given with --daemon to
+    the daemon of their build directory without importing the rest of
+    bentomaker. The other commands are run by
+    bentomakerlib.bentomaker.noexc_main."""
+    if argv is None:
+        argv = sys.argv[1:]
+    global_args, cmd_name, cmd_argv = _split_argv(argv)
+    # root users are asked for confirmation by noexc_main first
+    is_root = hasattr(os, "getuid") and os.getuid() == 0
+    if "--daemon" in global_args and is_served(cmd_name, cmd_argv) and not is_root:
+        build_directory = _build_directory(global_args)
+        if build_directory is not None:
+            path = os.path.join(os.getcwd(), build_directory, DAEMON_SOCKET)
+            status = run_client(path, argv)
+            if status is not None:
+                sys.exit(status)
+
+    from bentomakerlib.bentomaker import noexc_main
+    noexc_main(argv)
+
+def server_key():
+    """Identify the bento installation and interpreter: a daemon only serves
+    the clients running the same ones."""
+    return "%s\n%s\n%s\n%s" % (bento.__version__, os.path.abspath(bento.__file__),
+                               sys.executable, sys.version)
+
+def _send(conn, message):
+    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+def _messages(conn):
+    fid = conn.makefile("rb")
+    try:
+        while True:
+            line = fid.readline()
+            if not line:
+                return
+            yield json.loads(line.decode("utf-8"))
+    finally:
+        fid.close()
+
+#--------
+# Client
+#--------
+def _connect(path):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except socket.error:
+        conn.close()
+        return None
+    return conn
+
+def run_client(path, argv, stdout=None, stderr=None):
+    """Run bentomaker with the given arguments in the daemon listening on
+    path, which is started if needed.
+
+    Return the exit status of the command, or None if it could not be run
+    by the daemon."""
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+
+    if not is_available():
+        return None
+    conn = _connect(path)
+    if conn is None:
+        try:
+            conn = start_server(path)
+        except (OSError, socket.error):
+            conn = None
+        if conn is None:
+            return None
+
+    try:
+        _send(conn, {"key": server_key(), "argv": list(argv), "cwd": os.getcwd(),
+                     "env": dict(os.environ)})
+        for message in _messages(conn):
+            if "out" in message:
+                stdout.write(message["out"])
+                stdout.flush()
+            elif "err" in message:
+                stderr.write(message["err"])
+                stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+            elif "error" in message:
+                return None
+    finally:
+        conn.close()
+    stderr.write("bentomaker daemon exited while running the command\n")
+    return 1
+
+def start_server(path, idle_timeout=None):
+    """Start a daemon listening on path, detached from the current process,
+    and return a connection to it (None if it did not start)."""
+    log = os.path.splitext(path)[0] + ".log"
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    pid = os.fork()
+    if pid == 0:
+        # Double fork, so that the daemon is not a child of the client
+        status = 0
+        try:
+            try:
+                os.setsid()
+                if os.fork() == 0:
+                    _redirect_fds(log)
+                    server = DaemonServer(path, idle_timeout)
+                    try:
+                        server.serve()
+                    finally:
+                        server.close()
+            except Exception:
+                status = 1
+        finally:
+            os._exit(status)
+    os.waitpid(pid, 0)
+
+    end = time.time() + _START_TIMEOUT
+    while time.time() < end:
+        conn = _connect(path)
+        if conn is not None:
+            return conn
+        time.sleep(0.01)
+    return None
+
+def _redirect_fds(log):
+    null = os.open(os.devnull, os.O_RDONLY)
+    out = os.open(log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 420) # 0644
+    os.dup2(null, 0)
+    os.dup2(out, 1)
+    os.dup2(out, 2)
+    os.close(null)
+    os.close(out)
+
+#--------
+# Server
+#--------
+class _Stream(object):
+    """File-like object sending what is written to the client. The streams
+    of a connection share a lock, as tasks may write from several threads."""
+    encoding = "utf-8"
+
+    def __init__(self, conn, name, lock):
+        self.conn = conn
+        self.name = name
+        self.lock = lock
+        self.broken = False
+
+    def write(self, s):
+        if isinstance(s, bytes):
+            s = s.decode("utf-8", "replace")
+        if s and not self.broken:
+            self.lock.acquire()
+            try:
+                try:
+                    _send(self.conn, {self.name: s})
+                except socket.error:
+                    # the client went away: the command is still completed
+                    self.broken = True
+            finally:
+                self.lock.release()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def _bind_private(sock, path):
+    # Requests run arbitrary hooks: the socket is created accessible to its
+    # owner only, instead of being restricted after bind
+    old_umask = os.umask(63) # 077
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+
+class DaemonServer(object):
+    def __init__(self, path, idle_timeout=None):
+        if idle_timeout is None:
+            idle_timeout = IDLE_TIMEOUT
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self._stop = False
+        self._sock = self._bind(path)
+        self._ino = os.stat(path).st_ino
+
+        from bentomakerlib.package_cache import keep_caches_loaded
+        keep_caches_loaded()
+
+    def _bind(self, path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                _bind_private(sock, path)
+            except socket.error:
+                e = extract_exception()
+                if e.args[0] != errno.EADDRINUSE:
+                    raise
+                conn = _connect(path)
+                if conn is not None:
+                    # another daemon is serving the build directory
+                    conn.close()
+                    raise
+                # left behind by a dead daemon
+                os.remove(path)
+                _bind_private(sock, path)
+            sock.listen(16)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def owns_socket(self):
+        try:
+            return os.stat(self.path).st_ino == self._ino
+        except OSError:
+            return False
+
+    def serve(self):
+        """Serve the requests until the idle timeout expires, or until the
+        socket is removed (e.g. with the build directory)."""
+        deadline = time.time() + self.idle_timeout
+        while not self._stop and self.owns_socket():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self._sock.settimeout(min(remaining, _POLL_INTERVAL))
+            try:
+                conn, address = self._sock.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            try:
+                try:
+                    self.handle(conn)
+                except socket.error:
+                    pass
+            finally:
+                conn.close()
+            deadline = time.time() + self.idle_timeout
+
+    def handle(self, conn):
+        fid = conn.makefile("rb")
+        try:
+            line = fid.readline()
+        finally:
+            fid.close()
+        if not line:
+            return
+        request = json.loads(line.decode("utf-8"))
+        if request.get("key", None) != server_key():
+            # bento or python was changed: make room for a new daemon
+            _send(conn, {"error": "bentomaker daemon of another bento installation"})
+            self._stop = True
+            return
+        lock = threading.Lock()
+        status = self.run(request["argv"], request["cwd"], request["env"],
+                          _Stream(conn, "out", lock), _Stream(conn, "err", lock))
+        _send(conn, {"exit": status})
+
+    def run(self, argv, cwd, env, stdout, stderr):
+        """Run bentomaker with the given arguments, in the given directory and
+        environment, and return its exit status."""
+        from bentomakerlib.bentomaker import run_main, run_noexc
+
+        old_cwd = os.getcwd()
+        old_env = dict(os.environ)
+        old_streams = sys.stdout, sys.stderr
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        sys.stdout, sys.stderr = stdout, stderr
+        try:
+            try:
+                return run_noexc(run_main, argv, False)
+            except SystemExit:
+                e = extract_exception()
+                if e.code is None:
+                    return 0
+                elif isinstance(e.code, int):
+                    return e.code
+                else:
+                    stderr.write("%s\n" % e.code)
+                    return 1
+        finally:
+            sys.stdout, sys.stderr = old_streams
+            os.environ.clear()
+            os.environ.update(old_env)
+            os.chdir(old_cwd)
+
+    def close(self):
+        if self._sock is not None:
+            if self.owns_socket():
+                os.remove(self.path)
+            self._sock.close()
+            self._sock = None
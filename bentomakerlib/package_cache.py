@@ -1,17 +1,32 @@
 """
-Cache version 1
-
-db["version"] : version number
-db["magic"]   : "BENTOMAGIC"
-db["bento_checkums"] : pickled dictionary {filename: checksum(filename)} for
-                       each bento.info (including subentos)
-db["package_description"] : pickled PackageDescription instance
-db["user_flags"] : pickled user_flags dict
-db["parsed_dict"]: pickled raw parsed dictionary (as returned by
-                   raw_parse, before having been seen by the visitor)
+Cache version 5
+
+The file starts with a binary header (magic string followed by the version as
+a little endian 32 bits unsigned int), followed by a pickled dictionary:
+
+db["checksums"] : {filename: ((mtime, size, inode), md5 checksum)} for each
+                  bento.info (including subentos) and hook file. A file is
+                  only rehashed if its stat changed.
+db["parsed_dict"]: pickled raw parsed dictionary (as returned by raw_parse,
+                   before having been seen by the visitor)
+db["options"] : pickled PackageOptions instance
+db["packages"] : {user_flags key: pickled PackageDescription}, one entry per
+                 user flags combination seen so far
+db["subentos"] : SubentoCache data, i.e. {filename: (md5 checksum, pickled
+                 parsing result)} for each subento file
+
+When only subentos or hook files changed, the top bento.info is not parsed
+again: the packages are recomputed from the cached parsed dictionary, and only
+the modified subentos are parsed again.
+
+The db is loaded at most once per CachedPackage instance, and written back
+when the CachedPackage is closed, only if it changed. A long-running process
+(bentomaker daemon) may keep the loaded dbs between its runs, see
+keep_caches_loaded.
 """
 import os
 import sys
+import struct
 import warnings
 
 from bento.parser.misc \
@@ -19,11 +34,11 @@ from bento.parser.misc \
         raw_parse
 from bento.core.package \
     import \
-        raw_to_pkg_kw, PackageDescription
+        raw_to_pkg_kw, PackageDescription, SubentoCache
 from bento.core.options \
     import \
         raw_to_options_kw, PackageOptions
-from bento.utils.utils import extract_exception
+from bento.utils.utils import extract_exception, stat_key
 import bento.utils.path
 import bento.utils.io2
 
@@ -38,64 +53,106 @@ except ImportError:
     from md5 import md5
 
 
+# db location -> loaded db, kept between the runs of a long-running process
+# (None: dbs are loaded by every CachedPackage instance)
+_LOADED = None
+
+def keep_caches_loaded():
+    """Keep the dbs loaded after their CachedPackage is closed, and reuse
+    them in the next CachedPackage instances as long as their file was not
+    written by another process."""
+    global _LOADED
+    if _LOADED is None:
+        _LOADED = {}
+
 class CachedPackage(object):
     def __init__(self, db_node):
         self._db_location = db_node
+        self._cache = None
+
+    def _get_cache(self):
+        if self._cache is None:
+            location = self._db_location.abspath()
+            cache = None
+            if _LOADED is not None:
+                cache = _LOADED.get(location, None)
+            if cache is not None and cache.is_current():
+                # the bento files are checked again in each run
+                cache._checked = False
+            else:
+                cache = _CachedPackageImpl(location)
+            if _LOADED is not None:
+                _LOADED[location] = cache
+            self._cache = cache
+        return self._cache
 
     def get_package(self, bento_info, user_flags=None):
-        cache = _CachedPackageImpl(self._db_location.abspath())
-        try:
-            return cache.get_package(bento_info, user_flags)
-        finally:
-            cache.close()
+        return self._get_cache().get_package(bento_info, user_flags)
 
     def get_options(self, bento_info):
-        cache = _CachedPackageImpl(self._db_location.abspath())
-        try:
-            return cache.get_options(bento_info)
-        finally:
-            cache.close()
+        return self._get_cache().get_options(bento_info)
 
-class _CachedPackageImpl(object):
-    __version__ = "2"
-    __magic__ = "CACHED_PACKAGE_BENTOMAGIC"
+    def close(self):
+        if self._cache is not None:
+            try:
+                self._cache.close()
+            finally:
+                self._cache = None
 
-    def _has_valid_magic(self, db):
-        try:
-            magic = db["magic"]
-            if not magic == self.__magic__:
-                return False
-            else:
-                return True
-        except KeyError:
-            return False
+def _stat_key(filename):
+    # recently modified files are always rehashed
+    return stat_key(os.stat(filename))
+
+def _checksum(filename):
+    fid = open(filename, "rb")
+    try:
+        return md5(fid.read()).hexdigest()
+    finally:
+        fid.close()
+
+def _file_key(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+def _user_flags_key(user_flags):
+    if user_flags is None:
+        return None
+    else:
+        return tuple(sorted(user_flags.items()))
+
+class _CachedPackageImpl(object):
+    __version__ = 5
+    __magic__ = "BENTO_PACKAGE_CACHE".encode("ascii")
 
     def _reset(self):
-        self.db = {}
-        self.db["magic"] = self.__magic__
-        self.db["version"] = self.__version__
-        self._first_time = True
+        self.db = {"checksums": {}, "parsed_dict": None, "options": None,
+                   "packages": {}, "subentos": {}}
+        self._raw = None
+        self._dirty = True
 
     def _load_existing_cache(self, db_location):
+        header_size = len(self.__magic__) + 4
         fid = open(db_location, "rb")
         try:
-            db = pickle.load(fid)
-            if not self._has_valid_magic(db):
-                warnings.warn("Resetting invalid cached db")
-                self._reset()
+            header = fid.read(header_size)
+            if len(header) != header_size or not header.startswith(self.__magic__):
+                raise ValueError("invalid magic")
+            version = struct.unpack("<I", header[len(self.__magic__):])[0]
+            if version != self.__version__:
+                raise ValueError("unsupported version %d" % version)
+            return pickle.load(fid)
         finally:
             fid.close()
 
-        version = db["version"]
-        if version != self.__version__:
-            warnings.warn("Resetting invalid version of cached db")
-            self._reset()
-
-        return db
-
     def __init__(self, db_location):
         self._location = db_location
-        self._first_time = False
+        self._dirty = False
+        self._checked = False
+        self._raw = None
+        self._file_key = _file_key(db_location)
         if not os.path.exists(db_location):
             bento.utils.path.ensure_dir(db_location)
             self._reset()
@@ -107,16 +164,73 @@ class _CachedPackageImpl(object):
                 warnings.warn("Resetting invalid cached db: (reason: %r)" % e)
                 self._reset()
 
-    def _has_invalidated_cache(self):
-        if "bentos_checksums" in self.db:
-            r_checksums = pickle.loads(self.db["bentos_checksums"])
-            for f in r_checksums:
-                checksum = md5(open(f, "rb").read()).hexdigest()
-                if checksum != r_checksums[f]:
-                    return True
-            return False
-        else:
-            return True
+    def _changed_files(self):
+        """Return the list of recorded files which were modified or removed."""
+        changed = []
+        checksums = self.db["checksums"]
+        for f, (key, checksum) in list(checksums.items()):
+            try:
+                new_key = _stat_key(f)
+            except OSError:
+                changed.append(f)
+                continue
+            if new_key is None or new_key != key:
+                if _checksum(f) != checksum:
+                    changed.append(f)
+                else:
+                    # touched but unchanged: only remember the new stat
+                    checksums[f] = (new_key, checksum)
+                    self._dirty = True
+        return changed
+
+    def _record_files(self, files):
+        checksums = self.db["checksums"]
+        for f in files:
+            if not f in checksums:
+                checksums[f] = (_stat_key(f), _checksum(f))
+        self._dirty = True
+
+    def _parse(self, bento_info):
+        filename = bento_info.abspath()
+        info_file = open(filename, 'r')
+        try:
+            raw = raw_parse(info_file.read(), filename)
+        finally:
+            info_file.close()
+
+        self.db["checksums"] = {}
+        self.db["parsed_dict"] = pickle.dumps(raw)
+        self.db["options"] = pickle.dumps(_raw_to_options(raw))
+        self.db["packages"] = {}
+        self._record_files([filename])
+        self._raw = raw
+
+    def _invalidate_packages(self, changed):
+        # Packages are recomputed from the cached parsed dictionary, changed
+        # files are recorded again at that point
+        checksums = self.db["checksums"]
+        for f in changed:
+            del checksums[f]
+        self.db["packages"] = {}
+        self._dirty = True
+
+    def _ensure_uptodate(self, bento_info):
+        # bento files are only checked once per process
+        if not self._checked:
+            if self.db["parsed_dict"] is None:
+                self._parse(bento_info)
+            else:
+                changed = self._changed_files()
+                if bento_info.abspath() in changed:
+                    self._parse(bento_info)
+                elif changed:
+                    self._invalidate_packages(changed)
+            self._checked = True
+
+    def _get_raw(self):
+        if self._raw is None:
+            self._raw = pickle.loads(self.db["parsed_dict"])
+        return self._raw
 
     def get_package(self, bento_info, user_flags=None):
         try:
@@ -125,26 +239,26 @@ class _CachedPackageImpl(object):
             e = extract_exception()
             warnings.warn("Resetting invalid cache (error was %r)" % e)
             self._reset()
+            self._checked = False
             return self._get_package(bento_info, user_flags)
 
     def _get_package(self, bento_info, user_flags=None):
-        if self._first_time:
-            self._first_time = False
-            return _create_package_nocached(bento_info, user_flags, self.db)
+        self._ensure_uptodate(bento_info)
+
+        key = _user_flags_key(user_flags)
+        packages = self.db["packages"]
+        if key in packages:
+            return pickle.loads(packages[key])
         else:
-            if self._has_invalidated_cache():
-                return _create_package_nocached(bento_info, user_flags, self.db)
-            else:
-                r_user_flags = pickle.loads(self.db["user_flags"])
-                if user_flags is None:
-                    # FIXME: this case is wrong
-                    return pickle.loads(self.db["package_description"])
-                elif r_user_flags != user_flags:
-                    return _create_package_nocached(bento_info, user_flags, self.db)
-                else:
-                    raw = pickle.loads(self.db["parsed_dict"])
-                    pkg, files = _raw_to_pkg(raw, user_flags, bento_info)
-                    return pkg
+            subento_cache = SubentoCache(self.db["subentos"])
+            pkg, files = _raw_to_pkg(self._get_raw(), user_flags, bento_info,
+                                     subento_cache)
+            if subento_cache.parsed:
+                subento_cache.prune()
+            d = os.path.dirname(bento_info.abspath())
+            self._record_files([os.path.join(d, f) for f in files])
+            packages[key] = pickle.dumps(pkg)
+            return pkg
 
     def get_options(self, bento_info):
         try:
@@ -153,56 +267,33 @@ class _CachedPackageImpl(object):
             e = extract_exception()
             warnings.warn("Resetting invalid cache (error was %r)" % e)
             self._reset()
+            self._checked = False
             return self._get_options(bento_info)
 
     def _get_options(self, bento_info):
-        if self._first_time:
-            self._first_time = False
-            return _create_options_nocached(bento_info, {}, self.db)
-        else:
-            if self._has_invalidated_cache():
-                return _create_options_nocached(bento_info, {}, self.db)
-            else:
-                raw = pickle.loads(self.db["parsed_dict"])
-                return _raw_to_options(raw)
+        self._ensure_uptodate(bento_info)
+        return pickle.loads(self.db["options"])
 
     def close(self):
-        bento.utils.io2.safe_write(self._location, lambda fd: pickle.dump(self.db, fd))
-
-def _create_package_nocached(bento_info, user_flags, db):
-    pkg, options = _create_objects_no_cached(bento_info, user_flags, db)
-    return pkg
+        if self._dirty:
+            def _writer(fd):
+                fd.write(self.__magic__)
+                fd.write(struct.pack("<I", self.__version__))
+                pickle.dump(self.db, fd, 2)
+            bento.utils.io2.safe_write(self._location, _writer)
+            self._dirty = False
+            self._file_key = _file_key(self._location)
 
-def _create_options_nocached(bento_info, user_flags, db):
-    pkg, options = _create_objects_no_cached(bento_info, user_flags, db)
-    return options
+    def is_current(self):
+        """Return True if the db file was not written by someone else since
+        it was loaded or written back."""
+        return not self._dirty and _file_key(self._location) == self._file_key
 
 def _raw_to_options(raw):
     kw = raw_to_options_kw(raw)
     return PackageOptions(**kw)
 
-def _raw_to_pkg(raw, user_flags, bento_info):
-    kw, files = raw_to_pkg_kw(raw, user_flags, bento_info)
+def _raw_to_pkg(raw, user_flags, bento_info, subento_cache=None):
+    kw, files = raw_to_pkg_kw(raw, user_flags, bento_info, subento_cache)
     pkg = PackageDescription(**kw)
     return pkg, files
-
-def _create_objects_no_cached(bento_info, user_flags, db):
-    d = os.path.dirname(bento_info.abspath())
-    info_file = open(bento_info.abspath(), 'r')
-    try:
-        data = info_file.read()
-        raw = raw_parse(data, bento_info.abspath())
-
-        pkg, files = _raw_to_pkg(raw, user_flags, bento_info)
-        files = [os.path.join(d, f) for f in files]
-        options = _raw_to_options(raw)
-
-        checksums = [md5(open(f, "rb").read()).hexdigest() for f in files]
-        db["bentos_checksums"] = pickle.dumps(dict(zip(files, checksums)))
-        db["package_description"] = pickle.dumps(pkg)
-        db["user_flags"] = pickle.dumps(user_flags)
-        db["parsed_dict"] = pickle.dumps(raw)
-
-        return pkg, options
-    finally:
-        info_file.close()
@@ -29,13 +29,15 @@ from bento.errors \
 
 import bentomakerlib.bentomaker
 import bento.commands.build_yaku
+import bento.utils.watch
 from bento.compat.dist \
     import \
         DistributionMetadata
 
 from bentomakerlib.bentomaker \
     import \
-        main, noexc_main, _wrapped_main, parse_global_options, create_global_options_context
+        main, run_main, noexc_main, _wrapped_main, parse_global_options, \
+        create_global_options_context
 
 # FIXME: nose is broken - needed to make it happy
 if sys.platform == "darwin":
@@ -146,6 +148,75 @@ Name: foo
     def test_mpkg(self):
         main(["build_mpkg"])
 
+class _ScriptedWatcher(object):
+    """Watcher returning the changes made by the given functions, one per
+    call of wait, and interrupting the watch session after the last one."""
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.closed = False
+
+    def wait(self, timeout=None):
+        if not self.changes:
+            raise KeyboardInterrupt()
+        return self.changes.pop(0)()
+
+    def close(self):
+        self.closed = True
+
+class TestWatch(Common):
+    def setUp(self):
+        super(TestWatch, self).setUp()
+
+        bento_info = """\
+Name: foo
+
+Library:
+    Modules: foo, bar
+"""
+        self.top_node.make_node("bento.info").write(bento_info)
+        self.top_node.make_node("foo.py").write("")
+        self.top_node.make_node("bar.py").write("")
+
+        self._old_create_watcher = bento.utils.watch.create_watcher
+        self._old_run = bentomakerlib.bentomaker.run_with_dependencies
+        self.runs = []
+        def _run(*a, **kw):
+            try:
+                ret = self._old_run(*a, **kw)
+            except Exception:
+                self.runs.append(False)
+                raise
+            self.runs.append(True)
+            return ret
+        bentomakerlib.bentomaker.run_with_dependencies = _run
+
+    def tearDown(self):
+        bento.utils.watch.create_watcher = self._old_create_watcher
+        bentomakerlib.bentomaker.run_with_dependencies = self._old_run
+        super(TestWatch, self).tearDown()
+
+    def _watch(self, changes):
+        watcher = _ScriptedWatcher(changes)
+        bento.utils.watch.create_watcher = lambda *a, **kw: watcher
+        run_main(["build", "--watch"])
+        self.assertTrue(watcher.closed)
+
+    def test_removed_source(self):
+        bar = op.join(self.d, "bar.py")
+        def _remove():
+            os.remove(bar)
+            return [bar]
+        def _restore():
+            self.top_node.make_node("bar.py").write("")
+            return [bar]
+        def _edit():
+            self.top_node.make_node("bar.py").write("a = 1\n")
+            return [bar]
+        self._watch([_remove, _restore, _edit])
+        # the build fails without bar.py, and the command is run again once
+        # it is back. The edit is handled by the context of the last run
+        self.assertEqual(self.runs, [True, False, True])
+
 # Add SubprocessTestCase mixin as convert depends on distutils which uses
 # globals
 class TestConvertCommand(Common, SubprocessTestCase):
@@ -0,0 +1,94 @@
+import os
+import stat
+import shutil
+import tempfile
+import threading
+
+import os.path as op
+
+from bento.compat.api.moves \
+    import \
+        unittest
+from six.moves \
+    import \
+        StringIO
+
+import bentomakerlib.package_cache
+from bentomakerlib.daemon \
+    import \
+        DaemonServer, run_client, is_available, is_served, _split_argv, \
+        _build_directory
+
+class TestClientArguments(unittest.TestCase):
+    def test_is_served(self):
+        self.assertTrue(is_served("build", ["-j", "4"]))
+        self.assertTrue(is_served("install", ["--list-files"]))
+        self.assertFalse(is_served("install", []))
+        self.assertFalse(is_served("build", ["--watch"]))
+        self.assertFalse(is_served("build_egg", []))
+
+    def test_split_argv(self):
+        self.assertEqual(_split_argv(["--daemon", "build", "-j", "4"]),
+                         (["--daemon"], "build", ["-j", "4"]))
+        self.assertEqual(_split_argv(["--version"]), (["--version"], None, []))
+
+    def test_build_directory(self):
+        self.assertEqual(_build_directory(["--daemon"]), "build")
+        self.assertEqual(_build_directory(["--build-directory", "bld"]), "bld")
+        self.assertEqual(_build_directory(["--build-directory=bld"]), "bld")
+        self.assertEqual(_build_directory(["--build-dir=bld"]), None)
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        if not is_available():
+            raise unittest.SkipTest("Unix sockets not available")
+        self.d = tempfile.mkdtemp()
+        self.old = os.getcwd()
+        os.chdir(self.d)
+
+        self._write("bento.info", "Name: foo\nVersion: 1.0\n\nLibrary:\n    Modules: foo\n")
+        self._write("foo.py", "")
+        self.path = op.join(self.d, "build", "bento", "daemon.sock")
+        os.makedirs(op.dirname(self.path))
+        self.server = DaemonServer(self.path, idle_timeout=0.5)
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        self.thread.join()
+        self.server.close()
+        bentomakerlib.package_cache._LOADED = None
+        os.chdir(self.old)
+        shutil.rmtree(self.d)
+
+    def _write(self, path, content):
+        fid = open(path, "w")
+        try:
+            fid.write(content)
+        finally:
+            fid.close()
+
+    def _run(self, argv):
+        stdout, stderr = StringIO(), StringIO()
+        status = run_client(self.path, argv, stdout, stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_commands(self):
+        status, out, err = self._run(["--daemon", "configure"])
+        self.assertEqual(status, 0)
+        self.assertTrue(op.exists(op.join(self.d, "build", "build.config.py")))
+        status, out, err = self._run(["--daemon", "install", "--list-files"])
+        self.assertEqual(status, 0)
+        self.assertTrue("foo.py" in out, out)
+
+    def test_error(self):
+        status, out, err = self._run(["--daemon", "floupi"])
+        self.assertEqual(status, 2)
+        self.assertTrue("unknown command" in err, err)
+
+    def test_private_socket(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode) & 63, 0)
+
+    def test_idle_timeout(self):
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
@@ -0,0 +1,201 @@
+import os
+import tempfile
+import shutil
+
+import os.path as op
+
+from bento.compat.api.moves \
+    import \
+        unittest
+from bento.core.node \
+    import \
+        create_base_nodes
+
+import bento.core.package
+import bentomakerlib.package_cache
+from bentomakerlib.package_cache \
+    import \
+        CachedPackage
+
+BENTO_INFO = """\
+Name: foo
+Version: %s
+
+Flag: bundle
+    Description: bundle stuff
+    Default: true
+
+Library:
+    if flag(bundle):
+        Packages: bundled
+"""
+
+class TestCachedPackage(unittest.TestCase):
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.old = os.getcwd()
+        os.chdir(self.d)
+        try:
+            self.top_node, self.build_node, self.run_node = \
+                create_base_nodes(self.d, op.join(self.d, "build"), self.d)
+            self.bento_info = self.top_node.make_node("bento.info")
+            self._write_bento_info("1.0")
+            self.db_node = self.build_node.make_node("cache.db")
+        except:
+            os.chdir(self.old)
+            shutil.rmtree(self.d)
+            raise
+        self._old_raw_parse = bentomakerlib.package_cache.raw_parse
+        self._old_subento_raw_parse = bento.core.package.raw_parse
+
+    def tearDown(self):
+        bentomakerlib.package_cache.raw_parse = self._old_raw_parse
+        bento.core.package.raw_parse = self._old_subento_raw_parse
+        os.chdir(self.old)
+        shutil.rmtree(self.d)
+
+    def _write_bento_info(self, version):
+        self.bento_info.safe_write(BENTO_INFO % version)
+        # make the file old enough for its stat to be trusted
+        old = os.stat(self.bento_info.abspath()).st_mtime - 10
+        os.utime(self.bento_info.abspath(), (old, old))
+
+    def _forbid_parsing(self):
+        def _raw_parse(*a, **kw):
+            raise AssertionError("bento.info should not be parsed")
+        bentomakerlib.package_cache.raw_parse = _raw_parse
+
+    def _write_old(self, node, content):
+        node.parent.mkdir()
+        node.safe_write(content)
+        old = os.stat(node.abspath()).st_mtime - 10
+        os.utime(node.abspath(), (old, old))
+
+    def test_subento_invalidation(self):
+        self.bento_info.safe_write("Name: foo\nRecurse: bar, fubar\n")
+        old = os.stat(self.bento_info.abspath()).st_mtime - 10
+        os.utime(self.bento_info.abspath(), (old, old))
+        for name in ["bar", "fubar"]:
+            self._write_old(self.top_node.make_node(name).make_node("bento.info"),
+                            "Library:\n    Packages: %s\n" % name)
+
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info)
+        finally:
+            cached.close()
+        self.assertEqual(pkg.subpackages["fubar/bento.info"].packages, ["fubar"])
+
+        self._write_old(self.top_node.find_node("fubar/bento.info"),
+                        "Library:\n    Packages: fubar2\n")
+        # Only the modified subento is parsed again
+        parsed = []
+        def _raw_parse(data, filename=None):
+            parsed.append(filename)
+            return self._old_subento_raw_parse(data, filename)
+        self._forbid_parsing()
+        bento.core.package.raw_parse = _raw_parse
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info)
+        finally:
+            cached.close()
+        self.assertEqual(parsed, [op.join(self.d, "fubar", "bento.info")])
+        self.assertEqual(pkg.subpackages["bar/bento.info"].packages, ["bar"])
+        self.assertEqual(pkg.subpackages["fubar/bento.info"].packages, ["fubar2"])
+
+    def test_simple(self):
+        cached = CachedPackage(self.db_node)
+        try:
+            options = cached.get_options(self.bento_info)
+            pkg = cached.get_package(self.bento_info, {"bundle": True})
+        finally:
+            cached.close()
+        self.assertEqual(pkg.name, "foo")
+        self.assertEqual(pkg.packages, ["bundled"])
+        self.assertTrue("bundle" in options.flag_options)
+
+        self._forbid_parsing()
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info, {"bundle": True})
+        finally:
+            cached.close()
+        self.assertEqual(pkg.packages, ["bundled"])
+
+    def test_user_flags(self):
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info, {"bundle": True})
+            self.assertEqual(pkg.packages, ["bundled"])
+            pkg = cached.get_package(self.bento_info, {"bundle": False})
+            self.assertEqual(pkg.packages, [])
+        finally:
+            cached.close()
+
+        # Both flags combinations are cached
+        self._forbid_parsing()
+        cached = CachedPackage(self.db_node)
+        try:
+            self.assertEqual(cached.get_package(self.bento_info, {"bundle": False}).packages, [])
+            self.assertEqual(cached.get_package(self.bento_info, {"bundle": True}).packages, ["bundled"])
+        finally:
+            cached.close()
+
+    def test_invalidation(self):
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info)
+        finally:
+            cached.close()
+        self.assertEqual(pkg.version, "1.0")
+
+        self._write_bento_info("2.0")
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info)
+        finally:
+            cached.close()
+        self.assertEqual(pkg.version, "2.0")
+
+    def test_invalid_db(self):
+        self.db_node.parent.mkdir()
+        self.db_node.write("garbage")
+        cached = CachedPackage(self.db_node)
+        try:
+            pkg = cached.get_package(self.bento_info)
+        finally:
+            cached.close()
+        self.assertEqual(pkg.version, "1.0")
+
+    def test_keep_loaded(self):
+        bentomakerlib.package_cache.keep_caches_loaded()
+        try:
+            cached = CachedPackage(self.db_node)
+            try:
+                cached.get_package(self.bento_info)
+                impl = cached._cache
+            finally:
+                cached.close()
+
+            # the loaded db is reused, and the bento files checked again
+            cached = CachedPackage(self.db_node)
+            try:
+                self._write_bento_info("2.0")
+                self.assertEqual(cached.get_package(self.bento_info).version, "2.0")
+                self.assertTrue(cached._cache is impl)
+            finally:
+                cached.close()
+
+            # the db written by another process is loaded again
+            other = bentomakerlib.package_cache._CachedPackageImpl(self.db_node.abspath())
+            other._dirty = True
+            other.close()
+            cached = CachedPackage(self.db_node)
+            try:
+                cached.get_package(self.bento_info)
+                self.assertFalse(cached._cache is impl)
+            finally:
+                cached.close()
+        finally:
+            bentomakerlib.package_cache._LOADED = None
@@ -0,0 +1,143 @@
+"""
+Benchmark of Node.ant_glob, on a synthetic tree of data files.
+
+The tree has --dirs directories of --files files each, spread over two levels
+(assets/dN/sM/fK.ext). Its files are resolved as bento would resolve many
+DataFiles sections: one pattern per directory, plus a few recursive patterns.
+The per pattern walk of the previous implementation is run as a reference.
+
+Usage: python tools/bench_ant_glob.py [-n REPEAT] [--dirs N] [--files N]
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+import os.path as op
+
+ROOT = op.abspath(op.join(op.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from bento.core.node \
+    import \
+        Node, exclude_regs, to_list
+
+EXTENSIONS = [".png", ".txt", ".json", ".dat"]
+
+def make_tree(top, n_dirs, n_files):
+    """Create the tree, and return the list of its leaf directories."""
+    dirs = []
+    for d in range(n_dirs):
+        path = op.join("assets", "d%d" % (d // 20), "s%d" % d)
+        os.makedirs(op.join(top, path))
+        for f in range(n_files):
+            open(op.join(top, path, "f%d%s" % (f, EXTENSIONS[f % len(EXTENSIONS)])), "w").close()
+        dirs.append(path)
+    return dirs
+
+def make_patterns(dirs):
+    patterns = ["%s/*.png" % d.replace(os.sep, "/") for d in dirs]
+    patterns.extend(["**/*.json", "assets/**/f1*.txt", "assets/d0/**"])
+    return patterns
+
+def legacy_ant_glob(node, incl, excl=exclude_regs):
+    """ant_glob as implemented before the compiled matcher: every pattern
+    segment is matched against every entry, and every entry is stat'ed."""
+    def to_pat(s):
+        ret = []
+        for x in to_list(s):
+            x = x.replace('\\', '/').replace('//', '/')
+            if x.endswith('/'):
+                x += '**'
+            accu = []
+            for k in x.split('/'):
+                if k == '**':
+                    accu.append(k)
+                else:
+                    k = k.replace('.', '[.]').replace('*', '.*').replace('?', '.').replace('+', '\\+')
+                    accu.append(re.compile('^%s$' % k))
+            ret.append(accu)
+        return ret
+
+    def filtre(name, nn):
+        ret = []
+        for lst in nn:
+            if not lst:
+                pass
+            elif lst[0] == '**':
+                ret.append(lst)
+                if len(lst) > 1:
+                    if lst[1].match(name):
+                        ret.append(lst[2:])
+                else:
+                    ret.append([])
+            elif lst[0].match(name):
+                ret.append(lst[1:])
+        return ret
+
+    def accept(name, pats):
+        nacc = filtre(name, pats[0])
+        nrej = filtre(name, pats[1])
+        if [] in nrej:
+            nacc = []
+        return [nacc, nrej]
+
+    def ant_iter(node, pats, maxdepth, ret):
+        for name in sorted(node.listdir()):
+            npats = accept(name, pats)
+            if npats and npats[0]:
+                child = node.make_node([name])
+                isdir = os.path.isdir(child.abspath())
+                if [] in npats[0] and not isdir:
+                    ret.append(child)
+                if isdir and maxdepth:
+                    ant_iter(child, npats, maxdepth - 1, ret)
+
+    ret = []
+    ant_iter(node, [to_pat(incl), to_pat(excl)], 25, ret)
+    return ret
+
+def _best(f, repeat):
+    timings = []
+    for i in range(repeat):
+        t0 = time.time()
+        f()
+        timings.append(time.time() - t0)
+    return min(timings)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("-n", "--repeat", type="int", default=3,
+                      help="Number of runs for each benchmark (default: %default)")
+    parser.add_option("--dirs", type="int", default=500,
+                      help="Number of directories (default: %default)")
+    parser.add_option("--files", type="int", default=40,
+                      help="Number of files per directory (default: %default)")
+    o, a = parser.parse_args(argv)
+
+    d = tempfile.mkdtemp()
+    try:
+        dirs = make_tree(d, o.dirs, o.files)
+        patterns = make_patterns(dirs)
+        top = Node("", None).find_dir(d)
+
+        def _compiled():
+            return top.ant_glob_many(patterns)
+        def _legacy():
+            return [legacy_ant_glob(top, p) for p in patterns]
+
+        if [[n.abspath() for n in r] for r in _compiled()] != \
+           [[n.abspath() for n in r] for r in _legacy()]:
+            raise AssertionError("compiled and legacy ant_glob differ")
+
+        print("%d files, %d patterns" % (o.dirs * o.files, len(patterns)))
+        print("compiled (one walk): %8.1f ms" % (_best(_compiled, o.repeat) * 1e3))
+        print("legacy (per pattern): %7.1f ms" % (_best(_legacy, 1) * 1e3))
+    finally:
+        shutil.rmtree(d)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the bento.info parser, on a corpus made of every bento.info file
+found under examples/.
+
+Usage: python tools/bench_parser.py [-n REPEAT]
+"""
+import os
+import sys
+import time
+import optparse
+
+import os.path as op
+
+ROOT = op.abspath(op.join(op.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import bento
+from bento.parser.lexer \
+    import \
+        BentoLexer
+from bento.parser.fast_lexer \
+    import \
+        FastBentoLexer
+from bento.parser.parser \
+    import \
+        Parser
+
+def corpus():
+    """Return the content of every bento.info (including subentos) found
+    under examples/."""
+    ret = []
+    for root, dirs, files in os.walk(op.join(ROOT, "examples")):
+        dirs.sort()
+        for f in sorted(files):
+            if f == "bento.info":
+                fid = open(op.join(root, f))
+                try:
+                    ret.append(fid.read())
+                finally:
+                    fid.close()
+    return ret
+
+def _best(f, repeat):
+    timings = []
+    for i in range(repeat):
+        t0 = time.time()
+        f()
+        timings.append(time.time() - t0)
+    return min(timings)
+
+def bench_lexer(klass, data, repeat):
+    def _lex():
+        for d in data:
+            lexer = klass()
+            lexer.input(d)
+            for t in lexer:
+                pass
+    return _best(_lex, repeat)
+
+def bench_parser(fast, data, repeat):
+    def _parse():
+        parser = Parser(fast=fast)
+        for d in data:
+            parser.reset()
+            parser.parse(d)
+    return _best(_parse, repeat)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("-n", "--repeat", type="int", default=20,
+                      help="Number of runs for each benchmark (default: %default)")
+    o, a = parser.parse_args(argv)
+
+    data = corpus()
+    print("Corpus: %d files, %d bytes" % (len(data), sum(len(d) for d in data)))
+
+    for name, t in [
+            ("PLY lexer", bench_lexer(BentoLexer, data, o.repeat)),
+            ("fast lexer", bench_lexer(FastBentoLexer, data, o.repeat)),
+            ("parser (pickled tables)", bench_parser(False, data, o.repeat)),
+            ("parser (fast)", bench_parser(True, data, o.repeat))]:
+        print("%-25s %8.2f ms" % (name, t * 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measure bentomaker startup time, for 'bentomaker --version' and for a no-op
+'bentomaker build' in the given project directory.
+
+Usage: python tools/bench_startup.py [-n REPEAT] [project_dir]
+"""
+import os
+import sys
+import time
+import optparse
+import subprocess
+
+import os.path as op
+
+ROOT = op.abspath(op.join(op.dirname(__file__), os.pardir))
+
+def _run(argv, cwd):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    cmd = [sys.executable, "-m", "bentomakerlib.bentomaker"] + argv
+    t0 = time.time()
+    p = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    # answer the confirmation prompt when running as root
+    out = p.communicate("y\n".encode("ascii"))[0]
+    elapsed = time.time() - t0
+    if p.returncode != 0:
+        raise RuntimeError("%s failed:\n%s" % (" ".join(argv), out.decode("latin-1")))
+    return elapsed
+
+def bench(name, argv, cwd, repeat):
+    timings = sorted(_run(argv, cwd) for i in range(repeat))
+    print("%-20s min: %6.1f ms  median: %6.1f ms" % \
+          (name, timings[0] * 1e3, timings[len(timings) // 2] * 1e3))
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options] [project_dir]")
+    parser.add_option("-n", "--repeat", type="int", default=10,
+                      help="Number of runs for each command (default: %default)")
+    o, a = parser.parse_args(argv)
+
+    t0 = time.time()
+    subprocess.check_call([sys.executable, "-c", "pass"])
+    print("%-20s %6.1f ms" % ("python startup", (time.time() - t0) * 1e3))
+
+    bench("--version", ["--version"], os.getcwd(), o.repeat)
+    if a:
+        project_dir = op.abspath(a[0])
+        # first build is not a no-op
+        _run(["build"], project_dir)
+        bench("no-op build", ["build"], project_dir, o.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark of the ordering of yaku tasks (TaskManager), on synthetic builds of
+1k, 10k and 50k tasks.
+
+Each build looks like a project with many code generators: every generator
+class turns .idlN files into .cN files, which are compiled into .o files, and
+one link task per generator class consumes all the .o files. The pairwise
+ordering of the previous implementation is run as a reference up to
+--legacy-max tasks.
+
+Usage: python tools/bench_task_ordering.py [-n REPEAT] [--legacy-max N] [SIZES...]
+"""
+import os
+import sys
+import time
+import optparse
+
+import os.path as op
+
+ROOT = op.abspath(op.join(op.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import bento
+from yaku.task \
+    import \
+        task_factory
+from yaku.task_manager \
+    import \
+        TaskManager, hash_task
+
+class _Node(object):
+    def __init__(self, name):
+        self.name = name
+
+def make_tasks(n, tasks_per_generator=20):
+    """Return a list of about n tasks."""
+    n_generators = max(1, n // (2 * tasks_per_generator + 1))
+    tasks = []
+    for g in range(n_generators):
+        gen = task_factory("gen%d" % g)
+        objects = []
+        for i in range(tasks_per_generator):
+            source = _Node("f%d_%d.c%d" % (g, i, g))
+            tasks.append(gen([source], [_Node("f%d_%d.idl%d" % (g, i, g))]))
+            obj = _Node("f%d_%d.o" % (g, i))
+            tasks.append(task_factory("cc")([obj], [source]))
+            objects.append(obj)
+        tasks.append(task_factory("link%d" % g)([_Node("lib%d.so" % g)], objects))
+    return tasks
+
+class LegacyTaskManager(TaskManager):
+    """Pairwise ordering of the groups, as done before the indexed ordering."""
+    def set_order(self, a, b):
+        if not a in self.order:
+            self.order[a] = set()
+        self.order[a].add(b)
+
+    def make_order(self):
+        keys = list(self.groups.keys())
+        max = len(keys)
+        for i in range(max):
+            t1 = self.groups[keys[i]][0]
+            for j in range(i + 1, max):
+                t2 = self.groups[keys[j]][0]
+
+                if t2.__class__.__name__ in t1.before:
+                    self.set_order(keys[j], keys[i])
+                elif t1.__class__.__name__ in t2.before:
+                    self.set_order(keys[i], keys[j])
+                else:
+                    val = self.compare_exts(t1, t2)
+                    if val > 0:
+                        self.set_order(keys[i], keys[j])
+                    elif val < 0:
+                        self.set_order(keys[j], keys[i])
+
+    def make_groups(self):
+        groups = self.groups
+        for t in self.tasks:
+            h = hash_task(t)
+            if h in groups:
+                groups[h].append(t)
+            else:
+                groups[h] = [t]
+
+    def next_set(self):
+        keys = self.groups.keys()
+
+        unconnected = []
+        remainder = []
+        for u in keys:
+            for k in self.order.values():
+                if u in k:
+                    remainder.append(u)
+                    break
+            else:
+                unconnected.append(u)
+
+        toreturn = []
+        for y in unconnected:
+            toreturn.extend(self.groups[y])
+        for y in unconnected:
+            self.order.pop(y, None)
+            del self.groups[y]
+
+        if not toreturn and remainder:
+            raise Exception("circular order constraint detected %r" % remainder)
+        return toreturn
+
+    def compare_exts(self, t1, t2):
+        def _get_in(t):
+            return [os.path.splitext(s.name)[1] for s in t.inputs]
+        def _get_out(t):
+            return [os.path.splitext(s.name)[1] for s in t.outputs]
+
+        in_ = _get_in(t1)
+        out_ = _get_out(t2)
+        for k in in_:
+            if k in out_:
+                return -1
+        in_ = _get_in(t2)
+        out_ = _get_out(t1)
+        for k in in_:
+            if k in out_:
+                return 1
+        return 0
+
+def order_tasks(klass, tasks):
+    manager = klass(tasks)
+    sets = []
+    grp = manager.next_set()
+    while grp:
+        sets.append(grp)
+        grp = manager.next_set()
+    return sets
+
+def _best(f, repeat):
+    timings = []
+    for i in range(repeat):
+        t0 = time.time()
+        f()
+        timings.append(time.time() - t0)
+    return min(timings)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options] [SIZES...]")
+    parser.add_option("-n", "--repeat", type="int", default=3,
+                      help="Number of runs for each benchmark (default: %default)")
+    parser.add_option("--legacy-max", type="int", default=10000,
+                      help="Largest build ordered with the pairwise ordering (default: %default)")
+    o, a = parser.parse_args(argv)
+
+    sizes = [int(s) for s in a] or [1000, 10000, 50000]
+    print("%8s %8s %8s %14s %14s" % ("tasks", "groups", "sets", "indexed (ms)", "pairwise (ms)"))
+    for n in sizes:
+        tasks = make_tasks(n)
+        sets = order_tasks(TaskManager, tasks)
+        n_groups = len(TaskManager(tasks).groups)
+        indexed = _best(lambda: order_tasks(TaskManager, tasks), o.repeat)
+        if len(tasks) <= o.legacy_max:
+            if order_tasks(LegacyTaskManager, tasks) != sets:
+                raise AssertionError("indexed and pairwise ordering differ")
+            legacy = "%14.1f" % (_best(lambda: order_tasks(LegacyTaskManager, tasks), 1) * 1e3)
+        else:
+            legacy = "%14s" % "-"
+        print("%8d %8d %8d %14.1f %s" % (len(tasks), n_groups, len(sets), indexed * 1e3, legacy))
+
+if __name__ == "__main__":
+    main()